@@ -0,0 +1,279 @@
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from engine.data_loader import (
+    dataset_digest,
+    is_append,
+    load_data,
+    read_appended,
+    source_path,
+)
+from engine.profiling import profiled
+
+METRICS = ["Hybrid_EM", "PEG", "Debt_Equity", "Return"]
+
+# Composite industry stress score used on the overview and stress pages
+STRESS_WEIGHTS = {"Hybrid_EM": 0.4, "PEG": 0.3, "Debt_Equity": 0.3}
+
+# Row-level flags counted per cell; pages report them as shares of rows
+FLAGS = {
+    "distress": lambda df: df["Return"] < -0.30,
+    "high_em": lambda df: df["Hybrid_EM"] > 2,
+}
+
+# Fixed, data-independent histogram edges so sketches from different
+# batches of rows can be merged by adding counts. sinh spacing gives fine
+# bins near zero and roughly constant relative width further out.
+SKETCH_EDGES = 0.05 * np.sinh(np.linspace(-8, 8, 129))
+
+_CELL = ["Industry", "Year"]
+
+
+def stress_score(frame):
+    return sum(w * frame[col] for col, w in STRESS_WEIGHTS.items())
+
+
+def _stats(df):
+    grouped = df.groupby(_CELL, observed=True)
+    parts = {"rows": grouped.size()}
+    for metric in METRICS:
+        col = grouped[metric]
+        parts[metric + "_sum"] = col.sum()
+        parts[metric + "_count"] = col.count()
+        parts[metric + "_min"] = col.min()
+        parts[metric + "_max"] = col.max()
+        parts[metric + "_sumsq"] = (
+            (df[metric].astype(float) ** 2)
+            .groupby([df[c] for c in _CELL], observed=True)
+            .sum()
+        )
+    for name, flag in FLAGS.items():
+        parts[name] = (
+            flag(df).groupby([df[c] for c in _CELL], observed=True).sum()
+        )
+    stats = pd.DataFrame(parts)
+    stats.index = stats.index.set_levels(
+        [stats.index.levels[0].astype(str), stats.index.levels[1].astype(int)]
+    )
+    return stats
+
+
+def _sketches(df, cells):
+    cell_id = df.groupby(_CELL, observed=True).ngroup().to_numpy()
+    n_bins = len(SKETCH_EDGES) + 1
+    sketches = {}
+    for metric in METRICS:
+        values = df[metric].to_numpy(dtype=float)
+        ok = ~np.isnan(values)
+        bins = np.searchsorted(SKETCH_EDGES, values[ok])
+        counts = np.bincount(
+            cell_id[ok] * n_bins + bins,
+            minlength=len(cells) * n_bins,
+        ).reshape(len(cells), n_bins)
+        sketches[metric] = pd.DataFrame(counts, index=cells)
+    return sketches
+
+
+class IndustryCube:
+    """Mergeable sum/count/min/max/sketch aggregates per Industry x Year."""
+
+    def __init__(self, stats, sketches):
+        self.stats = stats
+        self.sketches = sketches
+
+    @classmethod
+    def from_panel(cls, df):
+        stats = _stats(df)
+        return cls(stats, _sketches(df, stats.index))
+
+    def update(self, new_rows):
+        # Only the appended rows are scanned; their partial cube is merged in
+        other = IndustryCube.from_panel(new_rows)
+        additive = [
+            c for c in self.stats.columns
+            if not c.endswith(("_min", "_max"))
+        ]
+        stats = self.stats[additive].add(
+            other.stats[additive], fill_value=0
+        )
+        for metric in METRICS:
+            lo = metric + "_min"
+            hi = metric + "_max"
+            a = self.stats.reindex(stats.index)
+            b = other.stats.reindex(stats.index)
+            stats[lo] = np.fmin(a[lo], b[lo])
+            stats[hi] = np.fmax(a[hi], b[hi])
+        # add() with fill_value turns the integer counts into floats
+        stats = stats[self.stats.columns].astype(self.stats.dtypes)
+
+        sketches = {
+            metric: self.sketches[metric]
+            .add(other.sketches[metric], fill_value=0)
+            .astype(np.int64)
+            for metric in METRICS
+        }
+        return IndustryCube(stats, sketches)
+
+    @property
+    def years(self):
+        return sorted(self.stats.index.get_level_values("Year").unique())
+
+    @property
+    def latest_year(self):
+        return self.years[-1]
+
+    def _means(self, stats, metrics):
+        return pd.DataFrame({
+            m: stats[m + "_sum"] / stats[m + "_count"] for m in metrics
+        })
+
+    def industry_year(self, metrics=METRICS):
+        return self._means(self.stats, metrics).reset_index()
+
+    def industry(self, year, metrics=METRICS):
+        return self._means(self.stats.xs(year, level="Year"), metrics)
+
+    def trend(self, metrics=METRICS):
+        # Row-weighted: the same as averaging the raw panel per year
+        by_year = self.stats.groupby(level="Year").sum()
+        return self._means(by_year, metrics).reset_index()
+
+    def totals(self, year):
+        cells = self.stats.xs(year, level="Year").sum()
+        out = {m: cells[m + "_sum"] / cells[m + "_count"] for m in METRICS}
+        for name in FLAGS:
+            out[name] = cells[name] / cells["rows"]
+        return pd.Series(out)
+
+    def quantiles(self, metric, year, q=(0.0, 0.25, 0.5, 0.75, 1.0)):
+        counts = self.sketches[metric].xs(year, level="Year")
+        stats = self.stats.xs(year, level="Year")
+        lo = stats[metric + "_min"].to_numpy()
+        hi = stats[metric + "_max"].to_numpy()
+
+        # Bin i spans SKETCH_EDGES[i-1]..SKETCH_EDGES[i]; the open end bins
+        # and every bin are clamped to the cell's observed min/max
+        left = np.concatenate([[-np.inf], SKETCH_EDGES])
+        right = np.concatenate([SKETCH_EDGES, [np.inf]])
+        cum = np.cumsum(counts.to_numpy(), axis=1)
+        total = cum[:, -1:]
+
+        out = {}
+        for quantile in q:
+            target = quantile * total
+            idx = (cum < target).sum(axis=1)
+            idx = np.minimum(idx, cum.shape[1] - 1)
+            rows = np.arange(len(idx))
+            before = np.where(idx > 0, cum[rows, np.maximum(idx - 1, 0)], 0)
+            in_bin = counts.to_numpy()[rows, idx]
+            frac = np.divide(
+                target[:, 0] - before,
+                in_bin,
+                out=np.zeros(len(idx)),
+                where=in_bin > 0,
+            )
+            a = np.clip(left[idx], lo, hi)
+            b = np.clip(right[idx], lo, hi)
+            out[quantile] = a + frac * (b - a)
+        return pd.DataFrame(out, index=counts.index)
+
+
+# Cubes are shared by every page and session in the server process, one
+# per dataset content. The budget caps their total in-memory size, evicting
+# the least recently used first, as engine.data_loader does for panels.
+CUBE_BUDGET_BYTES = 256 * 1024 ** 2
+
+_cubes = OrderedDict()
+_cube_bytes = 0
+# path -> (digest, size in bytes, rows) of the last cube built from it, so a
+# panel file that only had rows appended is updated instead of rebuilt
+_sources = {}
+_lock = threading.Lock()
+
+
+def _cube_size(cube):
+    size = int(cube.stats.memory_usage(index=True, deep=True).sum())
+    for sketch in cube.sketches.values():
+        size += int(sketch.memory_usage(index=True, deep=True).sum())
+    return size
+
+
+def _lookup(key):
+    with _lock:
+        entry = _cubes.get(key)
+        if entry is None:
+            return None
+        _cubes.move_to_end(key)
+        return entry[0]
+
+
+def _store(key, cube):
+    global _cube_bytes
+    size = _cube_size(cube)
+    if size > CUBE_BUDGET_BYTES:
+        return
+    with _lock:
+        if key in _cubes:
+            return
+        _cubes[key] = (cube, size)
+        _cube_bytes += size
+        while _cube_bytes > CUBE_BUDGET_BYTES:
+            _, (_, evicted) = _cubes.popitem(last=False)
+            _cube_bytes -= evicted
+        for path, (digest, _, _) in list(_sources.items()):
+            if digest not in _cubes:
+                del _sources[path]
+
+
+def _appended(path, end):
+    # (cube, rows) for the file's previous contents updated with the rows
+    # appended since, parsing only the new bytes; None when the file
+    # changed in any other way
+    with _lock:
+        known = _sources.get(path)
+    if known is None:
+        return None
+    digest, size, rows = known
+    base = _lookup(digest)
+    if base is None or not is_append(path, digest, size):
+        return None
+    new_rows = read_appended(path, size, end)
+    if new_rows.empty:
+        return base, rows
+    return base.update(new_rows), rows + len(new_rows)
+
+
+@profiled
+def get_cube(file=None):
+    key = dataset_digest(file)
+    cube = _lookup(key)
+    if cube is not None:
+        return cube
+
+    path = source_path(file)
+    size = None if path is None else os.stat(path).st_size
+    appended = None if path is None else _appended(path, size)
+    if appended is None:
+        df = load_data(file)
+        cube, rows = IndustryCube.from_panel(df), len(df)
+    else:
+        cube, rows = appended
+
+    _store(key, cube)
+    if path is not None:
+        with _lock:
+            if key in _cubes:
+                _sources[path] = (key, size, rows)
+    return cube
+
+
+def clear_cubes():
+    global _cube_bytes
+    with _lock:
+        _cubes.clear()
+        _sources.clear()
+        _cube_bytes = 0
@@ -0,0 +1,207 @@
+"""Walk-forward backtest of the crash model over the Year dimension.
+
+For every year t after the first min_train_years, a model is trained on
+years < t and scores year t, so each prediction only uses information
+that was available at the time. Run from the repository root:
+
+    python -m engine.backtest data/housing_crisis_2008.csv
+    python -m engine.backtest panel.csv --backend hist --top-k 50 --workers 8
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from engine.crash_model import crash_labels, predict, train_model
+from engine.data_loader import DEFAULT_PATH, load_data
+from engine.feature_engineering import build_features
+from engine.parallel import parallel_map
+
+# Probability at or above which a firm counts as flagged
+FLAG_THRESHOLD = 0.5
+
+
+def _run_fold(year, df, X, backend, use_store):
+    years = df["Year"].to_numpy()
+    train = years < year
+    test = np.flatnonzero(years == year)
+
+    # Fold models go through the model store, whose key fingerprints the
+    # training rows, labels and hyperparameters; unchanged folds are
+    # loaded instead of refitted on the next run
+    model = train_model(
+        df[train],
+        X[train],
+        backend=backend,
+        use_store=use_store,
+    )
+    prob = np.asarray(predict(model, X.iloc[test]), dtype=float)
+    return year, int(train.sum()), test, prob
+
+
+def _fold_auc(fold, prob, label, n_folds):
+    # Mann-Whitney AUC per fold from one lexsort: average ranks of tied
+    # scores, then sum the ranks of the positives in each fold
+    order = np.lexsort((prob, fold))
+    f, p, y = fold[order], prob[order], label[order]
+
+    n = len(f)
+    fold_start = np.searchsorted(f, np.arange(n_folds))
+    new_tie = np.ones(n, dtype=bool)
+    new_tie[1:] = (f[1:] != f[:-1]) | (p[1:] != p[:-1])
+    tie_id = np.cumsum(new_tie) - 1
+    tie_start = np.flatnonzero(new_tie)
+    tie_end = np.append(tie_start[1:], n)
+    # 1-based rank within the fold, averaged over the tie group
+    avg_rank = (tie_start + tie_end + 1) / 2 - fold_start[f[tie_start]]
+    ranks = avg_rank[tie_id]
+
+    pos = np.bincount(f, weights=y, minlength=n_folds)
+    neg = np.bincount(f, minlength=n_folds) - pos
+    rank_sum = np.bincount(f, weights=ranks * y, minlength=n_folds)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        auc = (rank_sum - pos * (pos + 1) / 2) / (pos * neg)
+    return np.where((pos > 0) & (neg > 0), auc, np.nan)
+
+
+def _precision_at_k(fold, prob, label, n_folds, k):
+    order = np.lexsort((-prob, fold))
+    f, y = fold[order], label[order]
+    fold_start = np.searchsorted(f, np.arange(n_folds))
+    top = (np.arange(len(f)) - fold_start[f]) < k
+    sizes = np.bincount(f, minlength=n_folds)
+    hits = np.bincount(f, weights=y * top, minlength=n_folds)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return hits / np.minimum(sizes, k)
+
+
+def _lead_times(firm, year, flagged):
+    # Years a firm had been flagged without interruption when its crash
+    # year arrived; 0 means flagged only in the crash year itself and NaN
+    # means not flagged then at all. Computed on one (firm, year) sort.
+    order = np.lexsort((year, firm))
+    fm, yr, fl = firm[order], year[order], flagged[order]
+
+    breaks = np.ones(len(fm), dtype=bool)
+    breaks[1:] = (fm[1:] != fm[:-1]) | (yr[1:] != yr[:-1] + 1) | ~fl[:-1]
+    run_start = np.maximum.accumulate(
+        np.where(breaks, np.arange(len(fm)), 0)
+    )
+    # A flagged row that starts its own run has lead time 0
+    lead = np.where(fl, yr - yr[run_start], np.nan)
+
+    out = np.empty(len(fm))
+    out[order] = lead
+    return out
+
+
+def walk_forward(
+    df,
+    backend="hist",
+    min_train_years=1,
+    top_k=10,
+    threshold=FLAG_THRESHOLD,
+    workers=None,
+    use_store=True,
+):
+    """Train on years < t, score year t, for every eligible year t.
+
+    Fold models are fitted in parallel. Returns (folds, scores): folds has
+    one row per test year with hit rate (share of crashes flagged),
+    precision among the top_k scored firms, AUC and mean lead time;
+    scores holds every out-of-sample prediction.
+    """
+    years = np.sort(df["Year"].astype(int).unique())
+    test_years = [int(y) for y in years[min_train_years:]]
+    if not test_years:
+        raise ValueError("walk_forward needs more years than min_train_years")
+
+    X = build_features(df)
+    results = list(parallel_map(
+        _run_fold,
+        test_years,
+        workers=workers,
+        shared=(df, X, backend, use_store),
+    ))
+
+    rows = np.concatenate([test for _, _, test, _ in results])
+    prob = np.concatenate([p for _, _, _, p in results])
+    fold = np.repeat(
+        np.arange(len(results)),
+        [len(test) for _, _, test, _ in results],
+    )
+    label = crash_labels(df).to_numpy()[rows]
+    year = df["Year"].to_numpy().astype(int)[rows]
+    firm = df["Firm"].astype(str).to_numpy()[rows]
+    flagged = prob >= threshold
+    n_folds = len(results)
+
+    def per_fold(weights):
+        return np.bincount(fold, weights=weights, minlength=n_folds)
+
+    crashes = per_fold(label)
+    lead = _lead_times(firm, year, flagged)
+    caught = label.astype(bool) & flagged
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        folds = pd.DataFrame(
+            {
+                "Train_Rows": [n for _, n, _, _ in results],
+                "Test_Rows": np.bincount(fold, minlength=n_folds),
+                "Crashes": crashes.astype(int),
+                "Flagged": per_fold(flagged).astype(int),
+                "Hit_Rate": per_fold(caught) / crashes,
+                "Precision_at_k": _precision_at_k(
+                    fold, prob, label, n_folds, top_k
+                ),
+                "AUC": _fold_auc(fold, prob, label, n_folds),
+                "Mean_Lead_Time": (
+                    per_fold(np.where(caught, lead, 0)) / per_fold(caught)
+                ),
+            },
+            index=pd.Index(test_years, name="Year"),
+        )
+
+    scores = pd.DataFrame({
+        "Firm": firm,
+        "Industry": df["Industry"].astype(str).to_numpy()[rows],
+        "Year": year,
+        "Crash_Probability": prob,
+        "Crashed": label.astype(bool),
+        "Lead_Time": lead,
+    })
+    return folds, scores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("panel", nargs="?", default=DEFAULT_PATH)
+    parser.add_argument("--backend", choices=["gbm", "hist"], default="hist")
+    parser.add_argument("--min-train-years", type=int, default=1)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--threshold", type=float, default=FLAG_THRESHOLD)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--scores", help="write out-of-sample scores here (CSV)")
+    parser.add_argument(
+        "--no-model-reuse",
+        action="store_true",
+        help="always refit fold models instead of using the model store",
+    )
+    args = parser.parse_args()
+
+    folds, scores = walk_forward(
+        load_data(args.panel),
+        backend=args.backend,
+        min_train_years=args.min_train_years,
+        top_k=args.top_k,
+        threshold=args.threshold,
+        workers=args.workers,
+        use_store=not args.no_model_reuse,
+    )
+    print(folds.to_string(float_format=lambda v: f"{v:.3f}"))
+    if args.scores:
+        scores.to_csv(args.scores, index=False)
+
+
+if __name__ == "__main__":
+    main()
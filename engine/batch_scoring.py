@@ -0,0 +1,295 @@
+"""Headless batch scoring: load -> features -> train -> predict -> recommend.
+
+Run from the repository root:
+
+    python -m engine.batch_scoring data/large_panel_dataset.csv \\
+        --output scores.csv
+    python -m engine.batch_scoring panel.csv --output scores.parquet \\
+        --all-years --workers 8 --chunk-size 500000
+
+The panel is streamed twice. The first pass collects a bounded random
+training sample and the latest year. The second scores chunks in a
+process pool and spills each one, sorted, to a temporary run file. The
+runs are then merged batch by batch into the ranked output, so memory
+is bounded by chunk size rather than panel size.
+"""
+import argparse
+import os
+import pickle
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from engine.compiled_model import CompiledEnsemble
+from engine.crash_model import (
+    compile_model,
+    fallback_score,
+    predict,
+    train_model,
+)
+from engine.data_loader import CHUNK_ROWS, DEFAULT_PATH, iter_chunks
+from engine.feature_engineering import build_features
+from engine.parallel import parallel_map
+from engine.recommendation_engine import recommend_batch
+
+OUTPUT_COLUMNS = [
+    "Rank",
+    "Firm",
+    "Industry",
+    "Year",
+    "Crash_Probability",
+    "Recommendation",
+    "Hybrid_EM",
+    "PEG",
+    "Debt_Equity",
+]
+
+TRAIN_ROWS = 2_000_000
+
+# Rows read from each sorted run per merge step
+MERGE_BATCH = 65_536
+
+
+def sample_panel(file, chunksize, train_rows, seed=0):
+    """Uniform random sample of at most train_rows rows plus the max Year."""
+    rng = np.random.default_rng(seed)
+    sample = None
+    keys = np.empty(0)
+    latest = None
+
+    for chunk in iter_chunks(file, chunksize):
+        year = int(chunk["Year"].max())
+        latest = year if latest is None else max(latest, year)
+
+        # Bottom-k of uniform keys is a uniform sample without replacement
+        chunk_keys = rng.random(len(chunk))
+        if sample is None:
+            sample, keys = chunk, chunk_keys
+        else:
+            sample = pd.concat([sample, chunk], ignore_index=True)
+            keys = np.concatenate([keys, chunk_keys])
+        if len(sample) > train_rows:
+            keep = np.sort(np.argpartition(keys, train_rows)[:train_rows])
+            sample = sample.iloc[keep].reset_index(drop=True)
+            keys = keys[keep]
+
+    return sample, latest
+
+
+def _score_chunk(chunk, model, year):
+    if year is not None:
+        chunk = chunk[chunk["Year"] == year]
+    if chunk.empty:
+        return None
+
+    X = build_features(chunk)
+    # The heuristic fallback is normalised by its global maximum at merge
+    # time, so chunks report the raw score here
+    if model is None:
+        prob = fallback_score(X).to_numpy()
+    else:
+        prob = predict(model, X)
+
+    scored = pd.DataFrame({
+        "Firm": chunk["Firm"].astype(str).to_numpy(),
+        "Industry": chunk["Industry"].astype(str).to_numpy(),
+        "Year": chunk["Year"].to_numpy(),
+        "Crash_Probability": prob,
+        "Hybrid_EM": chunk["Hybrid_EM"].to_numpy(),
+        "PEG": chunk["PEG"].to_numpy(),
+        "Debt_Equity": chunk["Debt_Equity"].to_numpy(),
+    })
+    return scored.sort_values(
+        "Crash_Probability", ascending=False, kind="stable"
+    )
+
+
+def _iter_run(path):
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=MERGE_BATCH):
+        yield batch.to_pandas()
+
+
+def merge_runs(paths):
+    """Yield rows of several descending-sorted runs in global order.
+
+    Each step emits every buffered row that is at least the largest
+    "last seen" value across runs; nothing still unread can beat them.
+    """
+    runs = [_iter_run(p) for p in paths]
+    buffers = [next(r, None) for r in runs]
+
+    while True:
+        active = [i for i, b in enumerate(buffers) if b is not None]
+        if not active:
+            return
+
+        bound = max(buffers[i]["Crash_Probability"].iloc[-1] for i in active)
+        ready = []
+        for i in active:
+            buf = buffers[i]
+            take = buf["Crash_Probability"].to_numpy() >= bound
+            ready.append(buf[take])
+            rest = buf[~take]
+            buffers[i] = rest if len(rest) else next(runs[i], None)
+
+        out = pd.concat(ready, ignore_index=True)
+        yield out.sort_values(
+            "Crash_Probability", ascending=False, kind="stable"
+        )
+
+
+class _Writer:
+    def __init__(self, path):
+        self.path = path
+        self.parquet = path.endswith(".parquet")
+        self.handle = None
+
+    def write(self, df):
+        if self.parquet:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self.handle is None:
+                self.handle = pq.ParquetWriter(self.path, table.schema)
+            self.handle.write_table(table)
+        else:
+            header = self.handle is None
+            if header:
+                self.handle = open(self.path, "w", newline="")
+            df.to_csv(self.handle, header=header, index=False)
+
+    def close(self):
+        if self.handle is not None:
+            self.handle.close()
+
+
+def score_panel(
+    file,
+    output,
+    all_years=False,
+    chunksize=CHUNK_ROWS,
+    workers=None,
+    backend="hist",
+    train_rows=TRAIN_ROWS,
+    model=None,
+    reuse_model=True,
+):
+    """Score a panel end to end and write ranked output; returns the model."""
+    sample, latest = sample_panel(file, chunksize, train_rows)
+
+    if model is None:
+        model = train_model(
+            sample,
+            build_features(sample),
+            backend=backend,
+            use_store=reuse_model,
+        )
+    del sample
+
+    tmp = tempfile.mkdtemp(prefix="batch_scoring_")
+    try:
+        paths = []
+        raw_max = 0.0
+        for n, scored in enumerate(parallel_map(
+            _score_chunk,
+            iter_chunks(file, chunksize),
+            workers=workers,
+            shared=(model, None if all_years else latest),
+        )):
+            if scored is None:
+                continue
+            raw_max = max(raw_max, float(scored["Crash_Probability"].iloc[0]))
+            path = os.path.join(tmp, f"run-{n:05d}.parquet")
+            scored.to_parquet(path, index=False)
+            paths.append(path)
+
+        scale = raw_max if model is None and raw_max > 0 else 1.0
+        writer = _Writer(output)
+        rank = 0
+        try:
+            for batch in merge_runs(paths):
+                batch["Crash_Probability"] = batch["Crash_Probability"] / scale
+                batch["Recommendation"] = recommend_batch(
+                    batch["Crash_Probability"]
+                )
+                batch["Rank"] = np.arange(rank + 1, rank + len(batch) + 1)
+                rank += len(batch)
+                writer.write(batch[OUTPUT_COLUMNS])
+        finally:
+            writer.close()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    return model
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("panel", nargs="?", default=DEFAULT_PATH)
+    parser.add_argument(
+        "--output",
+        required=True,
+        help="ranked scores; .parquet writes Parquet, anything else CSV",
+    )
+    parser.add_argument(
+        "--all-years",
+        action="store_true",
+        help="score every firm-year instead of the latest year only",
+    )
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--backend", choices=["gbm", "hist"], default="hist")
+    parser.add_argument("--train-rows", type=int, default=TRAIN_ROWS)
+    parser.add_argument(
+        "--model",
+        help="score with this model instead of training one: a pickle, "
+        "or a compiled .npz",
+    )
+    parser.add_argument(
+        "--save-model",
+        help="save the model used here; .npz writes the compiled arrays, "
+        "anything else a pickle",
+    )
+    parser.add_argument(
+        "--no-model-reuse",
+        action="store_true",
+        help="always refit instead of reusing the on-disk model store",
+    )
+    args = parser.parse_args()
+
+    model = None
+    if args.model and args.model.endswith(".npz"):
+        model = CompiledEnsemble.load(args.model)
+    elif args.model:
+        with open(args.model, "rb") as fh:
+            model = pickle.load(fh)
+
+    model = score_panel(
+        args.panel,
+        args.output,
+        all_years=args.all_years,
+        chunksize=args.chunk_size,
+        workers=args.workers,
+        backend=args.backend,
+        train_rows=args.train_rows,
+        model=model,
+        reuse_model=not args.no_model_reuse,
+    )
+
+    if args.save_model and args.save_model.endswith(".npz"):
+        if model is None:
+            parser.error("no model was trained (single-class panel)")
+        if not isinstance(model, CompiledEnsemble):
+            model = compile_model(model)
+        model.save(args.save_model)
+    elif args.save_model:
+        with open(args.save_model, "wb") as fh:
+            pickle.dump(model, fh, protocol=pickle.HIGHEST_PROTOCOL)
+
+    print("Scores written to", args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+# Figures are built from summaries of the data, never from every row, so
+# the payload sent to the browser stays bounded whatever the panel size
+HIST_BINS = 20
+MAX_SCATTER_POINTS = 5_000
+
+# Above this many markers scatters are drawn with WebGL instead of SVG
+WEBGL_THRESHOLD = 1_000
+
+# Share of a downsampled scatter reserved for the highest-priority rows, so
+# the extremes the charts are about are always drawn
+PRIORITY_SHARE = 0.2
+
+
+def histogram(values, bins=HIST_BINS, value_range=None, title=None, x_title=None):
+    """Bar chart of pre-binned counts; ships bins, not rows."""
+    values = np.asarray(values, dtype=float)
+    values = values[np.isfinite(values)]
+    counts, edges = np.histogram(values, bins=bins, range=value_range)
+    fig = go.Figure(go.Bar(
+        x=(edges[:-1] + edges[1:]) / 2,
+        y=counts,
+        width=np.diff(edges),
+        customdata=np.column_stack([edges[:-1], edges[1:]]),
+        hovertemplate="%{customdata[0]:.3f} - %{customdata[1]:.3f}: %{y}<extra></extra>",
+    ))
+    fig.update_layout(
+        title=title,
+        xaxis_title=x_title,
+        yaxis_title="count",
+        bargap=0,
+    )
+    return fig
+
+
+def box_from_quantiles(quantiles, title=None, x_title=None, y_title=None):
+    """Box plot from per-group quantiles (IndustryCube.quantiles output).
+
+    quantiles is indexed by group with columns 0, 0.25, 0.5, 0.75 and 1.
+    Whiskers stop at the observed min/max or 1.5 IQR, whichever is closer.
+    """
+    q1, median, q3 = quantiles[0.25], quantiles[0.5], quantiles[0.75]
+    iqr = q3 - q1
+    fig = go.Figure(go.Box(
+        x=quantiles.index.astype(str),
+        q1=q1,
+        median=median,
+        q3=q3,
+        lowerfence=np.maximum(quantiles[0.0], q1 - 1.5 * iqr),
+        upperfence=np.minimum(quantiles[1.0], q3 + 1.5 * iqr),
+    ))
+    fig.update_layout(title=title, xaxis_title=x_title, yaxis_title=y_title)
+    return fig
+
+
+def downsample(df, max_points=MAX_SCATTER_POINTS, priority=None, seed=0):
+    """At most max_points rows: the top rows by `priority`, then a uniform sample."""
+    if len(df) <= max_points:
+        return df
+
+    keep = np.zeros(len(df), dtype=bool)
+    if priority is not None:
+        n_top = int(max_points * PRIORITY_SHARE)
+        top = np.argpartition(-df[priority].to_numpy(), n_top)[:n_top]
+        keep[top] = True
+
+    rest = np.flatnonzero(~keep)
+    rng = np.random.default_rng(seed)
+    keep[rng.choice(rest, max_points - keep.sum(), replace=False)] = True
+    return df[keep]
+
+
+def scatter(df, x, y, max_points=MAX_SCATTER_POINTS, priority=None, **kwargs):
+    """px.scatter over a bounded sample, drawn with WebGL when it is large."""
+    frame = downsample(df, max_points, priority)
+    if len(frame) < len(df) and kwargs.get("title"):
+        kwargs["title"] += f" ({len(frame):,} of {len(df):,} points)"
+    render_mode = "webgl" if len(frame) > WEBGL_THRESHOLD else "auto"
+    return px.scatter(frame, x=x, y=y, render_mode=render_mode, **kwargs)
@@ -0,0 +1,156 @@
+"""Boosted tree ensembles as flat arrays, scored without sklearn.
+
+Every node of every tree lives in one set of parallel arrays (feature,
+threshold, missing direction, left child, leaf value). Nodes are numbered
+breadth-first within each tree so a node's right child is always its left
+child + 1, and leaves point at themselves with an infinite threshold and
+missing values sent left, so one step is node = left[node] + (x >
+threshold[node]), plus the missing direction for NaN inputs. Ensembles
+compiled from an estimator that rejects NaN (GradientBoostingClassifier)
+reject it here too, so a row scores the same way on either path. A batch is scored
+by stepping all (tree, row) pairs one level at a time; trees are stored
+deepest first, so each level only touches the prefix still descending.
+
+Models are compiled by engine.crash_model.compile_model. save() writes a
+single .npz file, and CompiledEnsemble.load() reads it back with NumPy
+alone; this module never imports sklearn.
+"""
+import numpy as np
+
+# Bump when the array layout changes; load() refuses other versions
+FORMAT_VERSION = 3
+
+# (tree, row) pairs stepped at once. Large batches are cut into blocks
+# whose node and input arrays stay in cache across levels; much bigger
+# blocks are up to 3x slower per row
+BLOCK_PAIRS = 1 << 16
+
+_ARRAYS = ("feature", "threshold", "missing_left", "left", "value", "roots", "depth")
+
+
+class CompiledEnsemble:
+    """Binary boosted ensemble: sigmoid(init + sum of one leaf per tree)."""
+
+    def __init__(
+        self,
+        feature,
+        threshold,
+        missing_left,
+        left,
+        value,
+        roots,
+        depth,
+        init,
+        feature_names,
+        input_dtype,
+        allow_missing=True,
+    ):
+        self.feature = np.asarray(feature, dtype=np.intp)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.missing_left = np.asarray(missing_left, dtype=bool)
+        self.left = np.asarray(left, dtype=np.intp)
+        self.value = np.asarray(value, dtype=np.float64)
+        self.roots = np.asarray(roots, dtype=np.intp)
+        self.depth = np.asarray(depth, dtype=np.intp)
+        self.init = float(init)
+        self.feature_names = [str(name) for name in feature_names]
+        # Inputs are rounded to the dtype the trees were fitted on before
+        # comparing, so every split goes the same way as in the original
+        self.input_dtype = np.dtype(input_dtype)
+        self.allow_missing = bool(allow_missing)
+
+        # Trees still descending at each level (depth is non-increasing)
+        self._active = [
+            int(np.count_nonzero(self.depth > level))
+            for level in range(int(self.depth.max(initial=0)))
+        ]
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def steps_per_row(self):
+        # Traversal steps one row costs: the sum of the tree depths
+        return int(self.depth.sum())
+
+    def _inputs(self, X):
+        columns = getattr(X, "columns", None)
+        if columns is None:
+            x = np.asarray(X, dtype=self.input_dtype)
+        else:
+            if self.feature_names and list(columns) != self.feature_names:
+                X = X[self.feature_names]
+            # DataFrame.to_numpy, not np.asarray: far cheaper on small frames
+            x = X.to_numpy(dtype=self.input_dtype)
+        return np.asarray(x, dtype=np.float64)
+
+    def decision_function(self, X):
+        """Raw margin (log-odds) per row."""
+        x = self._inputs(X)
+        n_rows = len(x)
+        missing = bool(np.isnan(x).any())
+        if missing and not self.allow_missing:
+            raise ValueError("Input X contains NaN.")
+        margin = np.empty(n_rows)
+        step = max(1, BLOCK_PAIRS // max(self.n_trees, 1))
+
+        for lo in range(0, n_rows, step):
+            block = x[lo:lo + step]
+            rows = len(block)
+            # Feature-major, so node (t, r) reads flat[feature * rows + r]
+            flat = np.ascontiguousarray(block.T).ravel()
+            cols = np.arange(rows)
+            node = np.repeat(self.roots[:, None], rows, axis=1)
+
+            for active in self._active:
+                cur = node[:active]
+                x_node = flat[self.feature[cur] * rows + cols]
+                go_right = x_node > self.threshold[cur]
+                if missing:
+                    go_right |= np.isnan(x_node) & ~self.missing_left[cur]
+                np.add(self.left[cur], go_right, out=cur)
+
+            margin[lo:lo + rows] = self.value[node].sum(axis=0)
+
+        return margin + self.init
+
+    def predict_proba(self, X):
+        """(n_rows, 2) class probabilities, like the sklearn classifiers."""
+        prob = 1.0 / (1.0 + np.exp(-self.decision_function(X)))
+        return np.column_stack([1.0 - prob, prob])
+
+    def save(self, path):
+        # Uncompressed: the arrays are small and load stays a plain read
+        np.savez(
+            path,
+            format_version=FORMAT_VERSION,
+            init=self.init,
+            feature_names=np.array(self.feature_names, dtype=str),
+            input_dtype=self.input_dtype.str,
+            allow_missing=self.allow_missing,
+            feature=self.feature.astype(np.int32),
+            threshold=self.threshold,
+            missing_left=self.missing_left,
+            left=self.left.astype(np.int32),
+            value=self.value,
+            roots=self.roots.astype(np.int32),
+            depth=self.depth.astype(np.int32),
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            version = int(data["format_version"])
+            if version != FORMAT_VERSION:
+                raise ValueError(
+                    f"{path}: compiled model format {version}, "
+                    f"expected {FORMAT_VERSION}"
+                )
+            return cls(
+                init=float(data["init"]),
+                feature_names=data["feature_names"].tolist(),
+                input_dtype=str(data["input_dtype"]),
+                allow_missing=bool(data["allow_missing"]),
+                **{name: data[name] for name in _ARRAYS},
+            )
@@ -1,8 +1,155 @@
+import numpy as np
+import pandas as pd
+
+from engine.crash_model import crash_labels, make_estimator, predict
+from engine.feature_engineering import MODEL_FEATURES, firm_layout
+from engine.parallel import parallel_map
+from engine.profiling import profiled
+
+# (minimum years of history, label), checked top-down like the
+# recommendation tiers
+CONFIDENCE_TIERS = [
+    (7, "High"),
+    (4, "Medium"),
+    (None, "Low"),
+]
+
+# Raw columns whose gaps count against a firm's coverage
+RAW_INPUTS = ["Hybrid_EM", "PEG", "F_Score", "Debt_Equity", "CFO_Growth"]
+
+# Redraws of a single-class firm resample before that model is skipped
+MAX_REDRAWS = 10
+
+
+def _confidence_label(years):
+    years = np.asarray(years)
+    labels = [label for _, label in CONFIDENCE_TIERS]
+    conditions = [years >= t for t, _ in CONFIDENCE_TIERS if t is not None]
+    codes = np.select(conditions, np.arange(len(conditions)), len(conditions))
+    return pd.Categorical.from_codes(codes, categories=labels)
+
+
 def confidence_score(df):
     years = df["Year"].nunique()
-    if years >= 7:
-        return "High"
-    elif years >= 4:
-        return "Medium"
+    return _confidence_label([years])[0]
+
+
+@profiled
+def firm_coverage(df):
+    """Per-firm data coverage from one (Firm, Year) sort.
+
+    Returns one row per firm with the years observed, first/last year,
+    share of the panel's years covered, share of missing model inputs
+    and a High/Medium/Low label from CONFIDENCE_TIERS.
+    """
+    order, start, _ = firm_layout(df)
+    n = len(order)
+    seg = np.flatnonzero(start == np.arange(n))
+    year = df["Year"].to_numpy().astype(np.int64)[order]
+
+    # Distinct years per firm: a sorted row starts a new year unless it
+    # repeats the previous row's firm and year
+    new_year = np.ones(n, dtype=bool)
+    new_year[1:] = (start[1:] != start[:-1]) | (year[1:] != year[:-1])
+    years = np.add.reduceat(new_year.astype(np.int64), seg)
+
+    inputs = [c for c in RAW_INPUTS if c in df.columns]
+    missing = np.zeros(n)
+    for col in inputs:
+        missing += df[col].isna().to_numpy()[order]
+    missing_share = np.add.reduceat(missing, seg) / (
+        np.diff(np.r_[seg, n]) * max(len(inputs), 1)
+    )
+
+    panel_years = df["Year"].nunique()
+    return pd.DataFrame(
+        {
+            "Years": years,
+            "First_Year": year[seg],
+            "Last_Year": np.maximum.reduceat(year, seg),
+            "Coverage": years / panel_years,
+            "Missing_Share": missing_share,
+            "Confidence": _confidence_label(years),
+        },
+        index=pd.Index(df["Firm"].to_numpy()[order[seg]], name="Firm"),
+    )
+
+
+def _fit_and_score(seed, X, y, codes, X_score, backend):
+    rng = np.random.default_rng(seed)
+
+    # Firm-level bootstrap: a firm drawn k times enters with weight k, so
+    # within-firm dependence is kept and no rows are materialised. A
+    # resample with a single class cannot be fitted, so it is redrawn;
+    # mixing in heuristic scores would put two scales in one interval
+    n_firms = codes.max() + 1
+    for _ in range(MAX_REDRAWS):
+        draws = np.bincount(rng.integers(n_firms, size=n_firms), minlength=n_firms)
+        weight = draws[codes].astype(np.float64)
+        if len(np.unique(y[weight > 0])) == 2:
+            break
     else:
-        return "Low"
+        return None
+
+    model = make_estimator(backend)
+    model.fit(X, y, sample_weight=weight)
+    return np.asarray(predict(model, X_score), dtype=np.float32)
+
+
+@profiled
+def bootstrap_intervals(
+    df,
+    X,
+    X_score=None,
+    n_models=20,
+    alpha=0.10,
+    backend="hist",
+    workers=None,
+    seed=0,
+):
+    """Bootstrap (1 - alpha) intervals on every scored row's crash probability.
+
+    n_models models are fitted in parallel on firm-level resamples of the
+    panel; each worker scores X_score (default X) in the same task, so the
+    whole universe comes back as one (n_models, rows) matrix. Resamples
+    that stay single-class after MAX_REDRAWS are skipped; the number of
+    models actually used is in the result's attrs["n_models"].
+    """
+    y = crash_labels(df).to_numpy()
+    if len(np.unique(y)) < 2:
+        raise ValueError("bootstrap_intervals needs both crash classes")
+
+    X_score = X if X_score is None else X_score
+    codes = pd.factorize(df["Firm"])[0]
+    seeds = np.random.SeedSequence(seed).spawn(n_models)
+
+    results = parallel_map(
+        _fit_and_score,
+        seeds,
+        workers=workers,
+        shared=(
+            X[MODEL_FEATURES],
+            y,
+            codes,
+            X_score[MODEL_FEATURES],
+            backend,
+        ),
+    )
+    fitted = [probs for probs in results if probs is not None]
+    if not fitted:
+        raise ValueError("every bootstrap resample was single-class")
+    probs = np.vstack(fitted)
+
+    lower, upper = np.quantile(probs, [alpha / 2, 1 - alpha / 2], axis=0)
+    intervals = pd.DataFrame(
+        {
+            "Mean": probs.mean(axis=0),
+            "Std": probs.std(axis=0),
+            "Lower": lower,
+            "Upper": upper,
+            "Width": upper - lower,
+        },
+        index=X_score.index,
+    )
+    intervals.attrs["n_models"] = len(fitted)
+    return intervals
@@ -1,26 +1,424 @@
-from sklearn.ensemble import GradientBoostingClassifier
+from collections import OrderedDict, namedtuple
+import json
+import math
+import os
+import threading
+import weakref
+
+from sklearn.ensemble import (
+    GradientBoostingClassifier,
+    HistGradientBoostingClassifier,
+)
 import numpy as np
+import pandas as pd
+
+from engine.compiled_model import CompiledEnsemble
+from engine.model_store import (
+    STORE_DIR,
+    fingerprint,
+    load_model,
+    model_digest,
+    save_model,
+)
+from engine.profiling import profiled
+
+# "gbm" is the exact-split reference estimator. "hist" bins features and
+# fits on all cores, which is what panels beyond ~100k rows need. Early
+# stopping on "auto" switches on above 10k samples, where a held-out
+# validation split is large enough to be meaningful.
+BACKENDS = {
+    "gbm": lambda: GradientBoostingClassifier(),
+    "hist": lambda: HistGradientBoostingClassifier(
+        early_stopping="auto",
+        random_state=0,
+    ),
+}
+
+# Winning hyperparameters from engine.tuning, per backend. They are layered
+# over the BACKENDS defaults; the store fingerprint includes them, so a new
+# configuration never reuses models fitted under the old one.
+TUNED_PARAMS_PATH = os.path.join(STORE_DIR, "tuned_params.json")
+
+def load_tuned_params(backend):
+    try:
+        with open(TUNED_PARAMS_PATH) as fh:
+            return json.load(fh).get(backend, {})
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_tuned_params(backend, params):
+    try:
+        with open(TUNED_PARAMS_PATH) as fh:
+            tuned = json.load(fh)
+    except (FileNotFoundError, json.JSONDecodeError):
+        tuned = {}
+    tuned[backend] = params
+    os.makedirs(STORE_DIR, exist_ok=True)
+    tmp = TUNED_PARAMS_PATH + ".%d.tmp" % os.getpid()
+    with open(tmp, "w") as fh:
+        json.dump(tuned, fh, indent=2, sort_keys=True)
+    os.replace(tmp, TUNED_PARAMS_PATH)
+
+def make_estimator(backend="gbm"):
+    return BACKENDS[backend]().set_params(**load_tuned_params(backend))
+
+def crash_labels(df):
+    return (df["Return"] < -0.30).astype(int)
 
-def train_model(df, X):
-    y = (df["Return"] < -0.30).astype(int)
+@profiled
+def train_model(df, X, backend="gbm", use_store=True):
+    y = crash_labels(df)
 
     # If only one class exists, ML cannot be trained
     if len(np.unique(y)) < 2:
         return None
 
-    model = GradientBoostingClassifier()
+    model = make_estimator(backend)
+
+    # Identical data, features and hyperparameters give an identical fit,
+    # so reuse the stored model instead of refitting on every rerun
+    if use_store:
+        key = fingerprint(X, y, model)
+        stored = load_model(key)
+        if stored is not None:
+            return stored
+
     model.fit(X, y)
+
+    if use_store:
+        save_model(key, model)
     return model
 
+# Batches up to this many traversal steps (rows x summed tree depth) are
+# scored with the compiled flat-array ensemble, which skips sklearn's
+# per-call validation and per-estimator loop. Larger batches go to sklearn,
+# whose native tree walk wins once that overhead is amortised.
+COMPILED_MAX_STEPS = 200_000
+
+# Weights of the heuristic used when no model can be trained
+FALLBACK_WEIGHTS = {
+    "Hybrid_EM": 0.4,
+    "PEG": 0.3,
+    "High_Leverage": 0.2,
+    "Weak_Cashflow": 0.1,
+}
+
+def fallback_score(X):
+    # Unnormalised heuristic; predict scales it by its maximum
+    return sum(weight * X[col] for col, weight in FALLBACK_WEIGHTS.items())
+
+@profiled
 def predict(model, X):
     # Fallback scoring when ML is not trainable
     if model is None:
-        score = (
-            0.4 * X["Hybrid_EM"]
-            + 0.3 * X["PEG"]
-            + 0.2 * X["High_Leverage"]
-            + 0.1 * X["Weak_Cashflow"]
-        )
+        score = fallback_score(X)
         return score / score.max()
 
+    if isinstance(model, CompiledEnsemble):
+        return model.predict_proba(X)[:, 1]
+
+    compiled = compile_model(model)
+    if len(X) * compiled.steps_per_row <= COMPILED_MAX_STEPS:
+        return compiled.predict_proba(X)[:, 1]
     return model.predict_proba(X)[:, 1]
+
+# Attributions are in log-odds: per row, Base plus the feature columns sum
+# to the model's raw margin. "exact" is path-dependent TreeSHAP, computed
+# by enumerating the subsets of the features each tree splits on with a
+# cover-weighted expectation over the rest. "approx" (Saabas) credits each
+# split on the row's path with the change in expected value it causes; it
+# is one vectorized step per tree level, for universes too big for exact.
+EXACT_MAX_ROWS = 5_000
+
+# Memory for one tree's (nodes, subsets, rows) weight block in exact mode
+EXACT_BLOCK_BYTES = 64 * 1024 ** 2
+
+# Exact mode costs 2^k work per node for a tree splitting on k distinct
+# features, so trees over more features than this are attributed with the
+# approx path instead (the current feature set has fewer columns than this)
+EXACT_MAX_TREE_FEATURES = 12
+
+# Models whose per firm-year attributions stay cached, least recent first out
+ATTRIBUTION_MODELS = 8
+
+Tree = namedtuple(
+    "Tree",
+    "feature threshold missing_left left right leaf value cover",
+)
+
+_attributions = OrderedDict()
+
+# Weak keys: a compiled copy lives exactly as long as its model
+_compiled = weakref.WeakKeyDictionary()
+_attribution_lock = threading.Lock()
+
+def iter_trees(model):
+    # Leaf values are on the margin scale, learning rate already applied
+    if isinstance(model, HistGradientBoostingClassifier):
+        for (predictor,) in model._predictors:
+            nodes = predictor.nodes
+            yield Tree(
+                nodes["feature_idx"].astype(np.intp),
+                nodes["num_threshold"],
+                nodes["missing_go_to_left"].astype(bool),
+                nodes["left"].astype(np.intp),
+                nodes["right"].astype(np.intp),
+                nodes["is_leaf"].astype(bool),
+                nodes["value"],
+                nodes["count"].astype(np.float64),
+            )
+        return
+
+    for estimator in model.estimators_[:, 0]:
+        tree = estimator.tree_
+        yield Tree(
+            tree.feature,
+            tree.threshold,
+            tree.missing_go_to_left.astype(bool),
+            tree.children_left,
+            tree.children_right,
+            tree.children_left < 0,
+            tree.value[:, 0, 0] * model.learning_rate,
+            tree.weighted_n_node_samples,
+        )
+
+def init_margin(model):
+    # Prior log-odds every tree is added to
+    if isinstance(model, HistGradientBoostingClassifier):
+        return float(model._baseline_prediction.ravel()[0])
+    return float(
+        model._raw_predict_init(np.zeros((1, model.n_features_in_)))[0, 0]
+    )
+
+def _input_dtype(model):
+    # Exact trees compare float32 inputs, histogram trees float64
+    if isinstance(model, HistGradientBoostingClassifier):
+        return np.float64
+    return np.float32
+
+def _tree_input(model, X):
+    return np.asarray(X, dtype=_input_dtype(model))
+
+def _breadth_first(tree):
+    # Old node ids in breadth-first order, children of a node adjacent
+    order = [0]
+    for node in order:
+        if not tree.leaf[node]:
+            order += [tree.left[node], tree.right[node]]
+    order = np.array(order, dtype=np.intp)
+    new_id = np.empty(len(order), dtype=np.intp)
+    new_id[order] = np.arange(len(order))
+    return order, new_id
+
+def compile_model(model):
+    """CompiledEnsemble scoring exactly like a fitted boosted classifier."""
+    compiled = _compiled.get(model)
+    if compiled is not None:
+        return compiled
+
+    trees = []
+    for tree in iter_trees(model):
+        order, new_id = _breadth_first(tree)
+        leaf = tree.leaf[order]
+        own = np.arange(len(order))
+        depth = np.zeros(len(order), dtype=np.intp)
+        for node in np.flatnonzero(~leaf):
+            child = new_id[tree.left[order[node]]]
+            depth[child:child + 2] = depth[node] + 1
+
+        # Leaves loop back to themselves (x > inf is never true, and NaN
+        # "goes left" to the leaf itself), so every tree can be stepped the
+        # same number of levels
+        trees.append((
+            int(depth.max()),
+            np.where(leaf, 0, tree.feature[order]),
+            np.where(leaf, np.inf, tree.threshold[order]),
+            tree.missing_left[order] | leaf,
+            np.where(leaf, own, new_id[tree.left[order]]),
+            np.where(leaf, tree.value[order], 0.0),
+        ))
+
+    # Deepest first, so each level steps a prefix of the trees
+    trees.sort(key=lambda parts: -parts[0])
+    sizes = np.array([len(parts[1]) for parts in trees], dtype=np.intp)
+    roots = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.intp)
+    columns = list(zip(*trees))
+
+    compiled = CompiledEnsemble(
+        feature=np.concatenate(columns[1]),
+        threshold=np.concatenate(columns[2]),
+        missing_left=np.concatenate(columns[3]),
+        left=np.concatenate(columns[4]) + np.repeat(roots, sizes),
+        value=np.concatenate(columns[5]),
+        roots=roots,
+        depth=np.array(columns[0], dtype=np.intp),
+        init=init_margin(model),
+        feature_names=getattr(model, "feature_names_in_", []),
+        input_dtype=_input_dtype(model),
+        # sklearn only scores NaN with the histogram backend
+        allow_missing=isinstance(model, HistGradientBoostingClassifier),
+    )
+    _compiled[model] = compiled
+    return compiled
+
+def _go_left(tree, nodes, x):
+    return np.where(
+        np.isnan(x), tree.missing_left[nodes], x <= tree.threshold[nodes]
+    )
+
+def _expectations(tree):
+    # Cover-weighted mean leaf value under every node; children follow
+    # their parent in both tree layouts, so one reverse pass suffices
+    expected = np.where(tree.leaf, tree.value, 0.0)
+    for node in np.flatnonzero(~tree.leaf)[::-1]:
+        left, right = tree.left[node], tree.right[node]
+        expected[node] = (
+            tree.cover[left] * expected[left]
+            + tree.cover[right] * expected[right]
+        ) / tree.cover[node]
+    return expected
+
+def _approx_tree(tree, X, phi):
+    expected = _expectations(tree)
+    node = np.zeros(len(X), dtype=np.intp)
+    rows = np.flatnonzero(~tree.leaf[node])
+    while len(rows):
+        cur = node[rows]
+        feature = tree.feature[cur]
+        left = _go_left(tree, cur, X[rows, feature])
+        child = np.where(left, tree.left[cur], tree.right[cur])
+        phi[rows, feature] += expected[child] - expected[cur]
+        node[rows] = child
+        rows = rows[~tree.leaf[child]]
+    return expected[0]
+
+def _exact_tree(tree, X, phi):
+    internal = np.flatnonzero(~tree.leaf)
+    used = np.unique(tree.feature[internal])
+    k = len(used)
+    if k == 0:
+        return tree.value[0]
+    if k > EXACT_MAX_TREE_FEATURES:
+        return _approx_tree(tree, X, phi)
+
+    # Subset s holds used[j] when bit j is set. Shapley weight of a subset
+    # of size m that excludes the feature is m! (k - m - 1)! / k!
+    member = (np.arange(2 ** k)[:, None] >> np.arange(k)) & 1 == 1
+    size = member.sum(axis=1)
+    fact = np.array([math.factorial(m) for m in range(k + 1)], dtype=float)
+    weight = np.append(fact[:k] * fact[k - 1::-1] / fact[k], 0.0)
+    coef = np.where(member, weight[size - 1][:, None], -weight[size][:, None])
+
+    slot = np.searchsorted(used, tree.feature[internal])
+    leaves = np.flatnonzero(tree.leaf)
+    n_nodes = len(tree.value)
+    step = max(1, EXACT_BLOCK_BYTES // (n_nodes * 2 ** k * 8))
+
+    for lo in range(0, len(X), step):
+        x = X[lo:lo + step]
+
+        # w[node, s, row]: probability that the row reaches node when only
+        # the features in subset s are known; unknown features follow the
+        # training cover down both branches
+        w = np.empty((n_nodes, 2 ** k, len(x)))
+        w[0] = 1.0
+        for node, j in zip(internal, slot):
+            left = _go_left(tree, node, x[:, tree.feature[node]])
+            share = tree.cover[tree.left[node]] / tree.cover[node]
+
+            # Viewed as (high bits, bit j, low bits, rows), [:, 1] are the
+            # subsets that know this split's feature and [:, 0] the rest
+            shape = (2 ** (k - j - 1), 2, 2 ** j, len(x))
+            parent = w[node].reshape(shape)
+            for child, goes, prior in (
+                (tree.left[node], left, share),
+                (tree.right[node], ~left, 1.0 - share),
+            ):
+                out = w[child].reshape(shape)
+                np.multiply(parent[:, 1], goes, out=out[:, 1])
+                np.multiply(parent[:, 0], prior, out=out[:, 0])
+
+        value = np.einsum("l,lsr->sr", tree.value[leaves], w[leaves])
+        phi[lo:lo + step, used] += (coef.T @ value).T
+
+    return _expectations(tree)[0]
+
+def _tree_attributions(model, X, method):
+    x = _tree_input(model, X)
+    phi = np.zeros(x.shape)
+    attribute = _exact_tree if method == "exact" else _approx_tree
+    base = init_margin(model)
+    for tree in iter_trees(model):
+        base += attribute(tree, x, phi)
+    return phi, base
+
+def _fallback_attributions(X):
+    # The heuristic is linear, so each term's deviation from its batch mean
+    # is its exact share of the deviation from the mean score
+    scale = fallback_score(X).max()
+    phi = np.zeros(X.shape)
+    for j, col in enumerate(X.columns):
+        if col in FALLBACK_WEIGHTS:
+            values = X[col].to_numpy(dtype=np.float64)
+            phi[:, j] = FALLBACK_WEIGHTS[col] * (values - values.mean()) / scale
+    return phi, float((fallback_score(X) / scale).mean())
+
+def _attribution_frame(model, X, method):
+    if model is None:
+        phi, base = _fallback_attributions(X)
+    else:
+        phi, base = _tree_attributions(model, X, method)
+    frame = pd.DataFrame(phi, columns=X.columns, index=X.index)
+    frame["Base"] = base
+    return frame
+
+@profiled
+def explain(model, X, keys=None, method="auto"):
+    """Per-feature contributions to each row's crash score.
+
+    Returns a frame indexed like X with one column per feature plus Base.
+    For fitted models the values are log-odds; for the heuristic fallback
+    they are on the score scale. method is "exact", "approx" or "auto"
+    (exact up to EXACT_MAX_ROWS rows). With keys, a (Firm, Year) frame
+    aligned with X, results are cached per model digest and firm-year, so
+    rows explained on an earlier rerun are looked up, not recomputed.
+    """
+    if method == "auto":
+        method = "exact" if len(X) <= EXACT_MAX_ROWS else "approx"
+
+    # The heuristic depends on the batch it is scaled by, so never cache it
+    if keys is None or model is None:
+        return _attribution_frame(model, X, method)
+
+    index = pd.MultiIndex.from_arrays(
+        [keys[col].to_numpy() for col in keys.columns]
+    )
+    cache_key = (model_digest(model), method)
+    with _attribution_lock:
+        cached = _attributions.get(cache_key)
+        if cached is not None:
+            _attributions.move_to_end(cache_key)
+
+    missing = (
+        np.ones(len(X), dtype=bool)
+        if cached is None
+        else ~index.isin(cached.index)
+    )
+    if missing.any():
+        fresh = _attribution_frame(model, X[missing], method)
+        fresh.index = index[missing]
+        fresh = fresh[~fresh.index.duplicated()]
+        cached = fresh if cached is None else pd.concat([cached, fresh])
+        with _attribution_lock:
+            _attributions[cache_key] = cached
+            _attributions.move_to_end(cache_key)
+            while len(_attributions) > ATTRIBUTION_MODELS:
+                _attributions.popitem(last=False)
+
+    result = cached.reindex(index)
+    result.index = X.index
+    return result
+
+def main_driver(attributions):
+    # Feature pushing each row's score up the most
+    return attributions.drop(columns="Base").idxmax(axis=1)
@@ -1,7 +1,389 @@
+import hashlib
+import io
+import itertools
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from pandas.api.types import (
+    is_float_dtype,
+    is_integer_dtype,
+    is_numeric_dtype,
+    union_categoricals,
+)
+
+from engine.profiling import profiled
+
+DEFAULT_PATH = "data/large_panel_dataset.csv"
+
+# Panels are parsed in chunks of this many rows and downcast chunk by
+# chunk, so peak memory is one raw chunk plus the compact frame.
+CHUNK_ROWS = 250_000
+
+# Return feeds the crash label (Return < -0.30); float32 would move values
+# sitting exactly on the threshold across it, so it keeps full precision.
+FULL_PRECISION_COLUMNS = {"Return"}
+
+# Columnar copies of each panel, one Parquet dataset per content digest,
+# partitioned by Year and Industry so slices only open matching files.
+STORE_ROOT = ".panel_store"
+PARTITIONING = ds.partitioning(
+    pa.schema([("Year", pa.int16()), ("Industry", pa.string())]),
+    flavor="hive",
+)
+
+# Parsed panels are shared by every rerun and every session in the server
+# process. The budget caps the total in-memory size of cached frames.
+CACHE_BUDGET_BYTES = 2 * 1024 ** 3
+
+# Cached frames are handed out as shallow copies. pandas 3 always
+# copies on write, which keeps page-level edits such as df["Year"] = ...
+# off the shared parsed copy; requirements.txt pins pandas>=3 for this.
+
+_cache = OrderedDict()
+_cache_bytes = 0
+_path_digests = {}
+_lock = threading.Lock()
+
+
+def _digest_bytes(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _digest_path(path):
+    # Hashing a large file on every rerun is itself costly, so the digest is
+    # memoized on (size, mtime) and only recomputed when the file changes.
+    stat = os.stat(path)
+    stamp = (stat.st_size, stat.st_mtime_ns)
+    known = _path_digests.get(path)
+    if known is not None and known[0] == stamp:
+        return known[1]
+
+    digest = _hash_file(path)
+    _path_digests[path] = (stamp, digest)
+    return digest
+
+
+def _hash_file(path, size=None):
+    # Digest of the whole file, or of only its first `size` bytes
+    h = hashlib.blake2b(digest_size=16)
+    remaining = sys.maxsize if size is None else size
+    with open(path, "rb") as fh:
+        while remaining > 0:
+            block = fh.read(min(1 << 20, remaining))
+            if not block:
+                break
+            h.update(block)
+            remaining -= len(block)
+    return h.hexdigest()
+
+
+def _read_source(file):
+    # Returns (content digest, object pd.read_csv can parse).
+    if file is None:
+        file = DEFAULT_PATH
+    if isinstance(file, (str, os.PathLike)):
+        return _digest_path(os.fspath(file)), file
+
+    # Uploaded files (streamlit UploadedFile, BytesIO)
+    data = file.getvalue()
+    file.seek(0)
+    return _digest_bytes(data), file
+
+
+def dataset_digest(file=None):
+    return _read_source(file)[0]
+
+
+def source_path(file=None):
+    # Filesystem path behind `file`, or None for in-memory uploads
+    if file is None:
+        return DEFAULT_PATH
+    if isinstance(file, (str, os.PathLike)):
+        return os.fspath(file)
+    return None
+
+
+def read_appended(path, size, end):
+    """Compact frame of the CSV rows between byte offsets size and end.
+
+    The header is taken from the file's first line, so only the rows
+    appended after the first `size` bytes are parsed.
+    """
+    with open(path, "rb") as fh:
+        header = fh.readline()
+        fh.seek(size)
+        body = fh.read(end - size)
+    return _compact(pd.read_csv(io.BytesIO(header + body)))
+
+
+def is_append(path, digest, size):
+    """True when the file at `path` is a `size`-byte file hashing to
+    `digest` with rows appended after it (or is that file unchanged)."""
+    try:
+        if os.stat(path).st_size < size:
+            return False
+        return _hash_file(path, size) == digest
+    except OSError:
+        return False
+
+
+def _frame_bytes(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def _compact(chunk):
+    out = {}
+    for col in chunk.columns:
+        values = chunk[col]
+        if col == "Year":
+            out[col] = values.astype(np.int16)
+        elif not is_numeric_dtype(values):
+            out[col] = values.astype("category")
+        elif col in FULL_PRECISION_COLUMNS:
+            out[col] = values
+        elif is_integer_dtype(values):
+            out[col] = pd.to_numeric(values, downcast="integer")
+        elif is_float_dtype(values):
+            out[col] = values.astype(np.float32)
+        else:
+            out[col] = values
+    return pd.DataFrame(out, index=chunk.index)
+
+
+def iter_chunks(file=None, chunksize=CHUNK_ROWS):
+    """Yield the panel as compact-dtype chunks without holding all of it."""
+    if file is None:
+        file = DEFAULT_PATH
+    with pd.read_csv(file, chunksize=chunksize) as reader:
+        for chunk in reader:
+            yield _compact(chunk)
+
+
+def _concat_chunks(chunks):
+    columns = {}
+    for col in chunks[0].columns:
+        parts = [chunk[col] for chunk in chunks]
+        if isinstance(parts[0].dtype, pd.CategoricalDtype):
+            # Chunks see different category sets; union instead of letting
+            # concat fall back to object/str columns
+            columns[col] = pd.Series(union_categoricals(parts), name=col)
+        else:
+            columns[col] = pd.Series(
+                np.concatenate([part.to_numpy() for part in parts]),
+                name=col,
+            )
+    return pd.DataFrame(columns)
+
+
+def _read_compact(source, chunksize):
+    raw_bytes = 0
+    chunks = []
+    with pd.read_csv(source, chunksize=chunksize) as reader:
+        for chunk in reader:
+            raw_bytes += _frame_bytes(chunk)
+            chunks.append(_compact(chunk))
+
+    df = _concat_chunks(chunks)
+    df.attrs["memory_report"] = {
+        "rows": len(df),
+        "raw_bytes": raw_bytes,
+        "compact_bytes": _frame_bytes(df),
+    }
+    return df
+
+
+def _store(key, df):
+    global _cache_bytes
+    size = _frame_bytes(df)
+    if size > CACHE_BUDGET_BYTES:
+        return
+    with _lock:
+        if key in _cache:
+            return
+        _cache[key] = (df, size)
+        _cache_bytes += size
+        while _cache_bytes > CACHE_BUDGET_BYTES:
+            _, (_, evicted) = _cache.popitem(last=False)
+            _cache_bytes -= evicted
+
+
+def _lookup(key):
+    with _lock:
+        entry = _cache.get(key)
+        if entry is None:
+            return None
+        _cache.move_to_end(key)
+        return entry[0]
+
+
+def clear_cache():
+    global _cache_bytes
+    with _lock:
+        _cache.clear()
+        _cache_bytes = 0
+        _path_digests.clear()
+
+
+def cache_info():
+    with _lock:
+        return {
+            "entries": len(_cache),
+            "bytes": _cache_bytes,
+            "budget_bytes": CACHE_BUDGET_BYTES,
+        }
+
+
+def _arrow_batches(chunks):
+    # Categorical codes change width with the number of categories, so
+    # text columns go to Arrow as plain strings; Parquet dictionary-encodes
+    # them on disk anyway.
+    for chunk in chunks:
+        plain = {
+            col: chunk[col].astype(str)
+            if isinstance(chunk[col].dtype, pd.CategoricalDtype)
+            else chunk[col]
+            for col in chunk.columns
+        }
+        yield pa.RecordBatch.from_pandas(
+            pd.DataFrame(plain), preserve_index=False
+        )
+
+
+@profiled
+def build_store(file=None, chunksize=CHUNK_ROWS):
+    digest, source = _read_source(file)
+    path = os.path.join(STORE_ROOT, digest)
+    if os.path.isdir(path):
+        return path
+
+    batches = _arrow_batches(iter_chunks(source, chunksize))
+    first = next(batches)
+    columns = first.schema.names
+
+    # A private directory per call: sessions are threads of one process,
+    # so a pid-based name would let concurrent builders share (and
+    # rmtree) each other's half-written partitions
+    os.makedirs(STORE_ROOT, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=STORE_ROOT, prefix=digest + ".", suffix=".tmp")
+    try:
+        for n, batch in enumerate(itertools.chain([first], batches)):
+            ds.write_dataset(
+                [batch],
+                tmp,
+                format="parquet",
+                partitioning=PARTITIONING,
+                basename_template="part-%d-{i}.parquet" % n,
+                existing_data_behavior="overwrite_or_ignore",
+                max_partitions=1_000_000,
+            )
+
+        # Files starting with "_" are skipped by dataset discovery
+        with open(os.path.join(tmp, "_columns.json"), "w") as fh:
+            json.dump(columns, fh)
+
+        os.replace(tmp, path)
+    except OSError:
+        # Another session published the same panel first; its store is
+        # complete, so ours is dropped
+        if not os.path.isdir(path):
+            raise
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return path
+
+
+def _open_store(file):
+    path = build_store(file)
+    with open(os.path.join(path, "_columns.json")) as fh:
+        columns = json.load(fh)
+    dataset = ds.dataset(path, format="parquet", partitioning=PARTITIONING)
+    return dataset, columns
+
+
+@profiled
+def panel_partitions(file=None):
+    # Year/Industry pairs straight from the directory layout, no data read
+    dataset, _ = _open_store(file)
+    keys = [
+        ds.get_partition_keys(fragment.partition_expression)
+        for fragment in dataset.get_fragments()
+    ]
+    return (
+        pd.DataFrame(keys, columns=["Year", "Industry"])
+        .drop_duplicates()
+        .sort_values(["Year", "Industry"])
+        .reset_index(drop=True)
+    )
+
+
+@profiled
+def load_slice(
+    file=None,
+    years=None,
+    industries=None,
+    columns=None,
+    latest=False,
+):
+    if latest:
+        years = [int(panel_partitions(file)["Year"].max())]
+
+    digest, _ = _read_source(file)
+    key = (
+        "slice",
+        digest,
+        None if years is None else tuple(sorted(int(y) for y in years)),
+        None if industries is None else tuple(sorted(industries)),
+        None if columns is None else tuple(columns),
+    )
+    df = _lookup(key)
+    if df is not None:
+        return df.copy(deep=False)
+
+    dataset, all_columns = _open_store(file)
+
+    condition = None
+    if years is not None:
+        condition = ds.field("Year").isin([int(y) for y in years])
+    if industries is not None:
+        in_industry = ds.field("Industry").isin(list(industries))
+        condition = in_industry if condition is None else condition & in_industry
+
+    if columns is None:
+        columns = all_columns
+
+    # Only files under matching Year=/Industry= directories are opened, and
+    # only the projected columns are decoded, across all cores
+    table = dataset.to_table(
+        columns=list(columns),
+        filter=condition,
+        use_threads=True,
+    )
+    df = _compact(table.to_pandas())
+    _store(key, df)
+    return df.copy(deep=False)
+
+
+@profiled
+def load_data(file=None, compact=True, chunksize=CHUNK_ROWS):
+    digest, source = _read_source(file)
+    key = (digest, compact)
 
-def load_data(file=None):
-    if file is not None:
-        return pd.read_csv(file)
-    return pd.read_csv("data/large_panel_dataset.csv")
+    df = _lookup(key)
+    if df is None:
+        if compact:
+            df = _read_compact(source, chunksize)
+        else:
+            df = pd.read_csv(source)
+        _store(key, df)
 
+    # Shallow copy: shares the parsed columns, never mutates the cached frame
+    return df.copy(deep=False)
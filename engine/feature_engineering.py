@@ -1,10 +1,178 @@
-def build_features(df):
-    df = df.copy()
-    df["Low_Quality"] = 9 - df["F_Score"]
-    df["High_Leverage"] = df["Debt_Equity"]
-    df["Weak_Cashflow"] = -df["CFO_Growth"]
-    return df[
-        ["Hybrid_EM", "PEG", "Low_Quality", "High_Leverage", "Weak_Cashflow"]
-    ]
+import weakref
 
+import numpy as np
+import pandas as pd
 
+from engine.profiling import profiled
+
+# name -> (version, fn). fn maps a panel to one column of values; bump the
+# version whenever its definition changes so stored copies are not reused.
+FEATURES = {}
+
+# Inputs of the crash model, in column order
+MODEL_FEATURES = [
+    "Hybrid_EM",
+    "PEG",
+    "Low_Quality",
+    "High_Leverage",
+    "Weak_Cashflow",
+]
+
+
+def feature(name, version=1):
+    def register(fn):
+        FEATURES[name] = (version, fn)
+        return fn
+    return register
+
+
+@feature("Hybrid_EM")
+def _hybrid_em(df):
+    return df["Hybrid_EM"]
+
+
+@feature("PEG")
+def _peg(df):
+    return df["PEG"]
+
+
+@feature("Low_Quality")
+def _low_quality(df):
+    return 9 - df["F_Score"]
+
+
+@feature("High_Leverage")
+def _high_leverage(df):
+    return df["Debt_Equity"]
+
+
+@feature("Weak_Cashflow")
+def _weak_cashflow(df):
+    return -df["CFO_Growth"]
+
+
+# Per-firm history features are built from these raw inputs over a
+# trailing window of this many observations
+TEMPORAL_INPUTS = ["Hybrid_EM", "PEG", "Debt_Equity", "CFO_Growth"]
+WINDOW = 3
+
+# Opt-in: build_features(df, MODEL_FEATURES + TEMPORAL_FEATURES). They need
+# the whole history of each firm in the frame, so chunked scoring cannot
+# use them.
+TEMPORAL_FEATURES = [
+    f"{col}_{kind}"
+    for col in TEMPORAL_INPUTS
+    for kind in ("Lag1", "YoY", f"Mean{WINDOW}", f"Vol{WINDOW}")
+]
+
+# (weakref to the last frame seen, its layout), read and replaced as one
+# tuple so concurrent sessions never pair one panel with another's layout
+_layout = (None, None)
+
+
+def firm_layout(df):
+    """Sort order of the panel by (Firm, Year) plus per-row segment offsets.
+
+    Returns (order, start, prev_ok), the last two in sorted order: start[j]
+    is the position where sorted row j's firm begins and prev_ok[j] is True
+    when row j - 1 is the same firm one year earlier. The layout of the last frame
+    seen is cached, so every temporal feature of a frame shares one sort.
+    """
+    global _layout
+    ref, value = _layout
+    if ref is not None and ref() is df:
+        return value
+
+    firm = df["Firm"]
+    codes = (
+        firm.cat.codes.to_numpy()
+        if isinstance(firm.dtype, pd.CategoricalDtype)
+        else pd.factorize(firm)[0]
+    )
+    year = df["Year"].to_numpy().astype(np.int64)
+
+    order = np.lexsort((year, codes))
+    c, y = codes[order], year[order]
+    n = len(order)
+    new_firm = np.ones(n, dtype=bool)
+    new_firm[1:] = c[1:] != c[:-1]
+    start = np.maximum.accumulate(np.where(new_firm, np.arange(n), 0))
+    prev_ok = ~new_firm
+    prev_ok[1:] &= y[1:] == y[:-1] + 1
+
+    # Weak reference: the cache never keeps a panel alive
+    value = (order, start, prev_ok)
+    _layout = (weakref.ref(df), value)
+    return value
+
+
+def _sorted_values(df, col):
+    order, start, prev_ok = firm_layout(df)
+    return df[col].to_numpy(dtype=np.float64)[order], order, start, prev_ok
+
+
+def _unsort(values, order):
+    out = np.empty_like(values)
+    out[order] = values
+    return out
+
+
+def _lag(df, col):
+    x, order, _, prev_ok = _sorted_values(df, col)
+    lag = np.full_like(x, np.nan)
+    lag[1:] = np.where(prev_ok[1:], x[:-1], np.nan)
+    return _unsort(lag, order)
+
+
+def _yoy(df, col):
+    return df[col].to_numpy(dtype=np.float64) - _lag(df, col)
+
+
+def _rolling(df, col, stat):
+    x, order, start, _ = _sorted_values(df, col)
+    # Row i's window is rows i-WINDOW+1..i of the sorted panel, cut at the
+    # firm's first row; lag k of the window is x shifted by k rows
+    n = len(x)
+    depth = np.arange(n) - start
+    window = np.zeros((WINDOW, n))
+    valid = np.zeros((WINDOW, n), dtype=bool)
+    for k in range(WINDOW):
+        window[k, k:] = x[:n - k]
+        valid[k, k:] = depth[k:] >= k
+    valid &= ~np.isnan(window)
+    window[~valid] = 0.0
+
+    count = valid.sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = window.sum(axis=0) / count
+        if stat == "mean":
+            out = mean
+        else:
+            dev = np.where(valid, window - mean, 0.0)
+            out = np.sqrt((dev ** 2).sum(axis=0) / (count - 1))
+            out[count < 2] = np.nan
+    return _unsort(out, order)
+
+
+for _col in TEMPORAL_INPUTS:
+    feature(f"{_col}_Lag1")(lambda df, c=_col: _lag(df, c))
+    feature(f"{_col}_YoY")(lambda df, c=_col: _yoy(df, c))
+    feature(f"{_col}_Mean{WINDOW}")(lambda df, c=_col: _rolling(df, c, "mean"))
+    feature(f"{_col}_Vol{WINDOW}")(lambda df, c=_col: _rolling(df, c, "std"))
+
+
+def compute_feature(df, name):
+    """One registered feature as a contiguous float32 array."""
+    return np.ascontiguousarray(FEATURES[name][1](df), dtype=np.float32)
+
+
+@profiled
+def build_features(df, names=None):
+    # Only the derived columns are materialised; the input frame is never
+    # copied
+    names = MODEL_FEATURES if names is None else names
+    return pd.DataFrame(
+        {name: compute_feature(df, name) for name in names},
+        index=df.index,
+        copy=False,
+    )
@@ -0,0 +1,102 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from engine.data_loader import dataset_digest, load_data, load_slice
+from engine.feature_engineering import FEATURES, MODEL_FEATURES, compute_feature
+
+# Total size of stored feature columns across all datasets and slices.
+# Least recently used stores are dropped first.
+FEATURE_BUDGET_BYTES = 1024 ** 3
+
+_stores = OrderedDict()
+_lock = threading.Lock()
+
+
+class FeatureStore:
+    """Registered features of one panel, each computed once on first use.
+
+    Columns are float32 arrays keyed by (name, version), so registering a
+    new feature or bumping one version leaves the others in place. Row
+    positions refer to the frame load_data/load_slice returns for the same
+    arguments.
+    """
+
+    def __init__(self, loader):
+        self._loader = loader
+        self._columns = {}
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        return sum(col.nbytes for col in self._columns.values())
+
+    def _ensure(self, names):
+        keys = [(name, FEATURES[name][0]) for name in names]
+        with self._lock:
+            missing = [key for key in keys if key not in self._columns]
+            if missing:
+                # One frame for every missing column, so features that
+                # share work on a frame (the temporal ones) do it once
+                df = self._loader()
+                for key in missing:
+                    self._columns[key] = compute_feature(df, key[0])
+        if missing:
+            _evict()
+        return [self._columns[key] for key in keys]
+
+    def column(self, name):
+        return self._ensure([name])[0]
+
+    def matrix(self, names=None, rows=None):
+        """Feature frame for the given row positions (or mask), all rows if None.
+
+        The frame is indexed by row position, which lines up with the
+        RangeIndex of the loaded panel and of any boolean-filtered subset.
+        """
+        names = MODEL_FEATURES if names is None else names
+        stored = self._ensure(names)
+        index = None
+        if rows is not None:
+            rows = np.asarray(rows)
+            if rows.dtype == bool:
+                rows = np.flatnonzero(rows)
+            stored = [col[rows] for col in stored]
+            index = pd.Index(rows)
+        return pd.DataFrame(dict(zip(names, stored)), index=index, copy=False)
+
+
+def feature_store(file=None, years=None, industries=None):
+    """The shared FeatureStore for a dataset, or for one load_slice of it."""
+    key = (
+        dataset_digest(file),
+        None if years is None else tuple(sorted(int(y) for y in years)),
+        None if industries is None else tuple(sorted(industries)),
+    )
+    with _lock:
+        store = _stores.get(key)
+        if store is None:
+            if years is None and industries is None:
+                store = FeatureStore(lambda: load_data(file))
+            else:
+                store = FeatureStore(
+                    lambda: load_slice(file, years=years, industries=industries)
+                )
+            _stores[key] = store
+        _stores.move_to_end(key)
+    return store
+
+
+def _evict():
+    with _lock:
+        total = sum(store.nbytes for store in _stores.values())
+        while total > FEATURE_BUDGET_BYTES and len(_stores) > 1:
+            _, store = _stores.popitem(last=False)
+            total -= store.nbytes
+
+
+def clear_features():
+    with _lock:
+        _stores.clear()
@@ -0,0 +1,80 @@
+import hashlib
+import json
+import threading
+
+from engine.crash_model import load_tuned_params, train_model
+from engine.data_loader import dataset_digest, load_data
+from engine.feature_engineering import build_features
+from engine.model_store import load_model, save_model
+from engine.parallel import parallel_map
+from engine.profiling import profiled
+
+_lock = threading.Lock()
+_collections = {}
+# One lock per collection key, created under _lock
+_key_locks = {}
+
+
+def _fit_industry(task, backend):
+    industry, frame = task
+    # None for single-class industries, which predict() scores with the
+    # heuristic fallback
+    model = train_model(
+        frame,
+        build_features(frame),
+        backend=backend,
+        use_store=False,
+    )
+    return industry, model
+
+
+def train_industry_models(df, backend="gbm", workers=None):
+    """Fit one crash model per Industry across a process pool.
+
+    Returns {industry: model or None}.
+    """
+    tasks = [
+        (str(industry), frame)
+        for industry, frame in df.groupby("Industry", observed=True, sort=True)
+    ]
+    return dict(parallel_map(
+        _fit_industry,
+        tasks,
+        workers=workers,
+        shared=(backend,),
+    ))
+
+
+def _collection_key(digest, backend):
+    h = hashlib.blake2b(digest_size=16)
+    h.update(b"industry_models")
+    h.update(digest.encode())
+    h.update(backend.encode())
+    # A new tuned configuration invalidates the whole collection
+    h.update(json.dumps(load_tuned_params(backend), sort_keys=True).encode())
+    return h.hexdigest()
+
+
+@profiled
+def industry_models(file=None, backend="gbm", workers=None):
+    """Per-industry models for a dataset, trained once and then looked up.
+
+    The collection is kept in memory for this process and in the model
+    store on disk, keyed by dataset content and backend, so restarts and
+    other sessions reuse it instead of refitting.
+    """
+    key = _collection_key(dataset_digest(file), backend)
+    # Held across the fit so concurrent sessions on the same dataset wait
+    # for one pool run instead of each starting their own; sessions on
+    # other datasets hold other locks and are never blocked
+    with _lock:
+        key_lock = _key_locks.setdefault(key, threading.Lock())
+    with key_lock:
+        models = _collections.get(key)
+        if models is None:
+            models = load_model(key)
+        if models is None:
+            models = train_industry_models(load_data(file), backend, workers)
+            save_model(key, models)
+        _collections[key] = models
+    return models
@@ -0,0 +1,122 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+
+# Fitted models live on local disk so they survive server restarts.
+# When the store grows past the budget, least recently used files go first.
+STORE_DIR = ".model_store"
+STORE_BUDGET_BYTES = 512 * 1024 ** 2
+
+_lock = threading.Lock()
+
+# Weak keys: memoised digests never keep a model alive
+_digests = weakref.WeakKeyDictionary()
+
+
+def fingerprint(X, y, estimator):
+    h = hashlib.blake2b(digest_size=16)
+    h.update(type(estimator).__name__.encode())
+    h.update(repr(sorted(estimator.get_params().items())).encode())
+    h.update(repr(list(X.columns)).encode())
+    h.update(pd.util.hash_pandas_object(X, index=False).to_numpy().tobytes())
+    h.update(np.ascontiguousarray(y, dtype=np.int8).tobytes())
+    return h.hexdigest()
+
+
+def model_digest(model):
+    """Content digest of a fitted model, memoised per model object."""
+    digest = _digests.get(model)
+    if digest is None:
+        digest = hashlib.blake2b(
+            pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL),
+            digest_size=16,
+        ).hexdigest()
+        _digests[model] = digest
+    return digest
+
+
+def _path(key):
+    return os.path.join(STORE_DIR, key + ".pkl")
+
+
+def load_model(key):
+    path = _path(key)
+    try:
+        with open(path, "rb") as fh:
+            model = pickle.load(fh)
+        # Touch on read so eviction order follows last use, not creation
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    except (
+        OSError,
+        EOFError,
+        pickle.UnpicklingError,
+        AttributeError,
+        ImportError,
+    ):
+        # Evicted mid-read, truncated, or pickled by another library
+        # version: treat as a miss and drop the entry so it is refitted
+        _discard(path)
+        return None
+    return model
+
+
+def _discard(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def save_model(key, model):
+    os.makedirs(STORE_DIR, exist_ok=True)
+    # A private temp file per call: sessions are threads of one process,
+    # so a pid-based name would be shared by concurrent writers
+    fd, tmp = tempfile.mkstemp(dir=STORE_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            pickle.dump(model, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        # Atomic rename so concurrent sessions never read a half-written file
+        os.replace(tmp, _path(key))
+    except BaseException:
+        _discard(tmp)
+        raise
+    _evict()
+
+
+def _evict():
+    with _lock:
+        entries = []
+        for name in os.listdir(STORE_DIR):
+            if not name.endswith(".pkl"):
+                continue
+            try:
+                stat = os.stat(os.path.join(STORE_DIR, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= STORE_BUDGET_BYTES:
+                break
+            try:
+                os.remove(os.path.join(STORE_DIR, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+def clear_store():
+    if not os.path.isdir(STORE_DIR):
+        return
+    for name in os.listdir(STORE_DIR):
+        if name.endswith(".pkl"):
+            os.remove(os.path.join(STORE_DIR, name))
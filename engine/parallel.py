@@ -0,0 +1,63 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Inputs shared by every task of the pool this worker process belongs to.
+# Only pool workers ever set it: each runs one task at a time, whereas the
+# calling process may be serving several Streamlit sessions on threads.
+_shared = ()
+
+
+def default_workers():
+    return max(1, (os.cpu_count() or 1) - 1)
+
+
+def _init_worker(shared):
+    global _shared
+    _shared = shared
+
+
+def _call(fn, task):
+    return fn(task, *_shared)
+
+
+def parallel_map(
+    fn,
+    tasks,
+    workers=None,
+    shared=(),
+    max_pending=None,
+):
+    """Map fn over tasks in a process pool, yielding results in task order.
+
+    fn must be a module-level function and is called as fn(task, *shared).
+    Large read-only inputs shared by every task go in shared, which is
+    shipped to each worker once instead of once per task; in-process it is
+    passed straight through, so concurrent callers never see each other's
+    inputs. tasks may be a lazy iterator; at most max_pending (default
+    2 x workers) are in flight at a time, so streamed inputs are never
+    read far ahead. workers=1 runs in-process.
+    """
+    shared = tuple(shared)
+    workers = default_workers() if workers is None else workers
+    if hasattr(tasks, "__len__"):
+        workers = min(workers, len(tasks))
+
+    if workers <= 1:
+        for task in tasks:
+            yield fn(task, *shared)
+        return
+
+    max_pending = max_pending or 2 * workers
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(shared,),
+    ) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(_call, fn, task))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from engine.profiling import profiled
+
+# Same constants the portfolio page uses for a single portfolio
+LOSS_GIVEN_CRASH = 0.40
+HIGH_RISK_THRESHOLD = 0.6
+
+
+@profiled
+def weight_matrix(holdings, firms):
+    """Sparse (n_portfolios, n_firms) weights from long-format holdings.
+
+    holdings has Portfolio, Firm and Weight columns; firms is the scored
+    universe in row order. Holdings outside the universe are dropped, as
+    the single-portfolio page drops firms without market data.
+    """
+    firms = pd.Index(firms)
+    col = firms.get_indexer(holdings["Firm"])
+    known = col >= 0
+
+    portfolios = pd.Index(pd.unique(holdings["Portfolio"]))
+    row = portfolios.get_indexer(holdings["Portfolio"])
+
+    weights = sparse.csr_matrix(
+        (
+            holdings["Weight"].to_numpy(dtype=float)[known],
+            (row[known], col[known]),
+        ),
+        shape=(len(portfolios), len(firms)),
+    )
+    # Repeated (portfolio, firm) lines add up to one position
+    weights.sum_duplicates()
+    return weights, portfolios
+
+
+@profiled
+def score_portfolios(weights, probs, portfolios, firms, top_n=5):
+    """Risk summary and top contributors for every portfolio at once.
+
+    All metrics are sparse matrix-vector products against one vector of
+    universe crash probabilities.
+    """
+    probs = np.asarray(probs, dtype=float)
+    weights = sparse.csr_matrix(weights)
+
+    held = weights.copy()
+    held.data = np.ones_like(held.data)
+    n_held = np.asarray(held.sum(axis=1)).ravel()
+
+    crash_risk = weights @ probs
+    high_risk = held @ (probs > HIGH_RISK_THRESHOLD).astype(float)
+
+    summary = pd.DataFrame(
+        {
+            "Holdings": n_held.astype(int),
+            "Crash_Risk": crash_risk,
+            "Expected_Drawdown": crash_risk * LOSS_GIVEN_CRASH,
+            "High_Risk_Exposure": np.divide(
+                high_risk,
+                n_held,
+                out=np.zeros_like(high_risk),
+                where=n_held > 0,
+            ),
+        },
+        index=pd.Index(portfolios, name="Portfolio"),
+    )
+
+    # Per-holding contributions share the CSR layout, so ranking inside
+    # each portfolio is a single lexsort over (row, -contribution)
+    rows = np.repeat(np.arange(weights.shape[0]), np.diff(weights.indptr))
+    contrib = weights.data * probs[weights.indices]
+    order = np.lexsort((-contrib, rows))
+    rank = np.arange(len(order)) - weights.indptr[rows[order]]
+    keep = order[rank < top_n]
+
+    contributors = pd.DataFrame({
+        "Portfolio": np.asarray(portfolios)[rows[keep]],
+        "Rank": rank[rank < top_n] + 1,
+        "Firm": np.asarray(firms)[weights.indices[keep]],
+        "Weight": weights.data[keep],
+        "Weighted_Risk": contrib[keep],
+    })
+    return summary, contributors
@@ -0,0 +1,176 @@
+"""Per-rerun stage timing for the pages and engine functions.
+
+A page opts in with start_page(...) at the top and finish_page() at the
+bottom, and marks its sections with section("..."). Engine functions
+wrapped with @profiled show up nested under the section that called them.
+Each stage records wall time, CPU time and the change in process RSS.
+Finished runs are shown in a sidebar panel and logged as one JSON line
+on the "engine.profiling" logger.
+
+Profiling is off unless the sidebar toggle is on (its default comes from
+the BUBBLE_PROFILE environment variable). When off, section() and
+@profiled cost one context-variable lookup.
+"""
+import functools
+import json
+import logging
+import os
+import resource
+import sys
+import time
+from contextvars import ContextVar
+
+DEFAULT_ENABLED = os.environ.get("BUBBLE_PROFILE", "") not in ("", "0")
+
+# JSON lines go to stderr, or appended to this file when it is set
+LOG_PATH = os.environ.get("BUBBLE_PROFILE_LOG")
+
+logger = logging.getLogger(__name__)
+
+# Streamlit runs every rerun in its own thread, and a new thread starts
+# with an empty context, so runs from different sessions never mix
+_run = ContextVar("profiling_run", default=None)
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _rss_bytes():
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        # Non-Linux fallback: lifetime peak, in KiB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class _Run:
+    def __init__(self, page):
+        self.page = page
+        self.started = time.time()
+        self.t0 = time.perf_counter()
+        self.records = []
+        self.depth = 0
+        self.section = None
+
+    def open(self, name):
+        self.depth += 1
+        return (
+            name,
+            self.depth,
+            time.perf_counter(),
+            time.process_time(),
+            _rss_bytes(),
+        )
+
+    def close(self, frame):
+        name, depth, wall, cpu, rss = frame
+        self.depth -= 1
+        self.records.append({
+            "stage": name,
+            "depth": depth,
+            "start_ms": round((wall - self.t0) * 1000, 3),
+            "wall_ms": round((time.perf_counter() - wall) * 1000, 3),
+            "cpu_ms": round((time.process_time() - cpu) * 1000, 3),
+            "mem_delta_mb": round((_rss_bytes() - rss) / 1024 ** 2, 2),
+        })
+
+
+def start_run(page):
+    """Begin recording a run of `page` in the current context."""
+    _run.set(_Run(page))
+
+
+def section(name):
+    """End the current page section, if any, and start a new one."""
+    run = _run.get()
+    if run is None:
+        return
+    if run.section is not None:
+        run.close(run.section)
+    run.section = run.open(name)
+
+
+def _ensure_handler():
+    if logger.handlers:
+        return
+    if LOG_PATH:
+        handler = logging.FileHandler(LOG_PATH)
+    else:
+        handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def finish_run():
+    """Stop recording; log the run as JSON and return its stage records."""
+    run = _run.get()
+    if run is None:
+        return None
+    if run.section is not None:
+        run.close(run.section)
+        run.section = None
+    _run.set(None)
+    records = sorted(run.records, key=lambda r: r["start_ms"])
+
+    _ensure_handler()
+    logger.info(json.dumps({
+        "event": "page_profile",
+        "page": run.page,
+        "started": run.started,
+        "stages": records,
+    }))
+    return records
+
+
+def profiled(fn):
+    """Record calls of fn as a stage while a run is active."""
+    name = f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__qualname__}"
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        run = _run.get()
+        if run is None:
+            return fn(*args, **kwargs)
+        frame = run.open(name)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            run.close(frame)
+
+    return wrapper
+
+
+def start_page(page):
+    """Sidebar toggle plus start_run(page) when it is on."""
+    import streamlit as st
+
+    if st.sidebar.toggle(
+        "Profile this page",
+        value=DEFAULT_ENABLED,
+        key="profile_stages",
+    ):
+        start_run(page)
+
+
+def finish_page():
+    """finish_run() and show the stage table in the sidebar."""
+    import pandas as pd
+    import streamlit as st
+
+    records = finish_run()
+    if not records:
+        return
+    table = pd.DataFrame(records)
+    table["stage"] = [
+        "  " * (depth - 1) + stage
+        for stage, depth in zip(table["stage"], table["depth"])
+    ]
+    with st.sidebar.expander("Stage timings", expanded=True):
+        st.dataframe(
+            table.drop(columns="depth"),
+            hide_index=True,
+            use_container_width=True,
+        )
@@ -1,7 +1,55 @@
+import numpy as np
+import pandas as pd
+
+from engine.profiling import profiled
+
+# Tier tables run from the most to the least severe tier. A probability
+# falls into the first tier whose threshold it strictly exceeds; the last
+# tier has no threshold and catches everything else.
+FIRM_TIERS = [
+    (0.70, "🔴 Exit / Short"),
+    (0.40, "🟠 Reduce / Hedge"),
+    (None, "🟢 Monitor"),
+]
+
+INDUSTRY_TIERS = [
+    (0.60, "Reduce Exposure"),
+    (0.40, "Hedge Selectively"),
+    (None, "Maintain Exposure"),
+]
+
+ACTION_TIERS = [
+    (0.75, "Immediate Exit"),
+    (0.50, "Hedge or Reduce"),
+    (None, "Monitor Closely"),
+]
+
+
+def assign_tiers(p, table=FIRM_TIERS):
+    p = np.asarray(p, dtype=float)
+    conditions = [p > threshold for threshold, _ in table[:-1]]
+    codes = np.select(
+        conditions,
+        np.arange(len(conditions), dtype=np.int8),
+        default=len(conditions),
+    ).astype(np.int8)
+    return pd.Categorical.from_codes(
+        codes,
+        categories=[label for _, label in table],
+    )
+
+
+@profiled
+def recommend_batch(p):
+    return assign_tiers(p, FIRM_TIERS)
+
+
+def industry_action(p):
+    return assign_tiers(p, INDUSTRY_TIERS)
+
+
 def recommend(p):
-    if p > 0.70:
-        return "🔴 Exit / Short"
-    elif p > 0.40:
-        return "🟠 Reduce / Hedge"
-    else:
-        return "🟢 Monitor"
+    for threshold, label in FIRM_TIERS[:-1]:
+        if p > threshold:
+            return label
+    return FIRM_TIERS[-1][1]
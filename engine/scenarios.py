@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+
+from engine.crash_model import fallback_score, predict
+from engine.profiling import profiled
+
+# Shock vectors are (valuation, leverage, liquidity)
+SCENARIOS = {
+    "Mild Correction (Valuation Reset)": (0.10, 0.05, 0.00),
+    "Severe Market Crash (Leverage Unwind)": (0.25, 0.20, 0.10),
+    "Liquidity Freeze (2008-style)": (0.30, 0.30, 0.25),
+    "Sector Bubble Burst": (0.35, 0.15, 0.10),
+}
+
+# Feature each shock channel acts on: valuation scales PEG, leverage scales
+# Debt_Equity, liquidity scales weak cash flow (-CFO_Growth)
+SHOCK_FEATURES = ["PEG", "High_Leverage", "Weak_Cashflow"]
+
+# Upper bound on stacked rows handed to one predict call
+MAX_PREDICT_ROWS = 2_000_000
+
+# A shock sweep scores every grid point for every firm; its average is
+# taken over a fixed random sample of at most this many firms, which keeps
+# a 50x50 sweep near one second (the full 20k-firm universe took ~90 s)
+# with a standard error well under a percentage point
+SWEEP_MAX_FIRMS = 500
+
+
+def scenario_matrix(names=None):
+    names = list(SCENARIOS) if names is None else names
+    return np.array([SCENARIOS[n] for n in names], dtype=float)
+
+
+def shock_grid(valuation, leverage, liquidity=0.0):
+    # Every (valuation, leverage) pair at a fixed liquidity shock
+    v, l = np.meshgrid(valuation, leverage, indexing="ij")
+    return np.column_stack([
+        v.ravel(),
+        l.ravel(),
+        np.full(v.size, liquidity, dtype=float),
+    ])
+
+
+@profiled
+def evaluate_scenarios(model, X, shocks):
+    """Total stress and crash probability for every (scenario, firm) pair.
+
+    Each shock adds its stress contribution to the feature it targets
+    (e.g. PEG + PEG * valuation shock) and all scenarios are scored with
+    stacked predict calls. Returns two (n_scenarios, n_firms) arrays.
+    """
+    shocks = np.atleast_2d(np.asarray(shocks, dtype=float))
+    base = X.to_numpy(dtype=float)
+    idx = [X.columns.get_loc(c) for c in SHOCK_FEATURES]
+    exposure = base[:, idx]
+
+    stress = shocks @ exposure.T
+
+    n_scen, n_firms = len(shocks), len(base)
+    probs = np.empty((n_scen, n_firms))
+    per_call = max(1, MAX_PREDICT_ROWS // max(n_firms, 1))
+    for start in range(0, n_scen, per_call):
+        block = shocks[start:start + per_call]
+        stacked = np.repeat(base[None, :, :], len(block), axis=0)
+        stacked[:, :, idx] += block[:, None, :] * exposure[None, :, :]
+        frame = pd.DataFrame(
+            stacked.reshape(-1, base.shape[1]),
+            columns=X.columns,
+        )
+        scores = fallback_score(frame) if model is None else predict(model, frame)
+        probs[start:start + len(block)] = np.asarray(scores).reshape(
+            len(block), n_firms
+        )
+
+    # Without a trained model the heuristic is normalised once over every
+    # scenario and firm, so a firm's score never depends on which block it
+    # was stacked into and scenarios stay comparable
+    if model is None:
+        probs /= probs.max()
+
+    return stress, probs
+
+
+@profiled
+def sweep_grid(
+    model,
+    X,
+    valuation,
+    leverage,
+    liquidity=0.0,
+    max_firms=SWEEP_MAX_FIRMS,
+    seed=0,
+):
+    """Average crash probability over a (valuation x leverage) shock grid.
+
+    Returns a (len(valuation), len(leverage)) array. Universes larger than
+    max_firms are averaged over a seeded random sample of firms, so reruns
+    and sessions see the same sample.
+    """
+    if len(X) > max_firms:
+        rows = np.sort(
+            np.random.default_rng(seed).choice(len(X), max_firms, replace=False)
+        )
+        X = X.iloc[rows]
+    _, probs = evaluate_scenarios(
+        model, X, shock_grid(valuation, leverage, liquidity)
+    )
+    return probs.mean(axis=1).reshape(len(valuation), len(leverage))
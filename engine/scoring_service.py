@@ -0,0 +1,281 @@
+"""Local HTTP scoring service with a resident model and micro-batching.
+
+Run from the repository root:
+
+    python -m engine.scoring_service --panel data/large_panel_dataset.csv
+    curl -s localhost:8765/score -d '{"firms": [{"Firm": "NVIDIA"}]}'
+    curl -s localhost:8765/metrics
+
+POST /score takes {"firms": [...]}. Each record either carries the raw
+inputs (Hybrid_EM, PEG, F_Score, Debt_Equity, CFO_Growth) or only a Firm
+name, which is looked up in the latest year of the panel. Concurrent
+requests are coalesced into one build_features/predict call per batch.
+"""
+import argparse
+import json
+import pickle
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from engine.compiled_model import CompiledEnsemble
+from engine.crash_model import fallback_score, predict, train_model
+from engine.data_loader import DEFAULT_PATH, load_data
+from engine.feature_engineering import build_features
+from engine.recommendation_engine import recommend_batch
+
+INPUT_COLUMNS = ["Hybrid_EM", "PEG", "F_Score", "Debt_Equity", "CFO_Growth"]
+
+# A batch is flushed when it reaches MAX_BATCH_ROWS or MAX_WAIT_S after
+# its first request arrived, whichever comes first
+MAX_WAIT_S = 0.002
+MAX_BATCH_ROWS = 4096
+
+# Latencies kept for the percentile metrics
+LATENCY_WINDOW = 10_000
+
+
+class _Request:
+    def __init__(self, frame):
+        self.frame = frame
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class MicroBatcher:
+    """Coalesces concurrent scoring requests into single predict calls."""
+
+    def __init__(self, model, scale=1.0):
+        self.model = model
+        # Heuristic scores are divided by a fixed panel-wide maximum so a
+        # firm's score does not depend on which batch it lands in
+        self.scale = scale
+        self.queue = deque()
+        self.cond = threading.Condition()
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.batch_sizes = deque(maxlen=LATENCY_WINDOW)
+        self.requests = 0
+        self.started = time.perf_counter()
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def score(self, frame):
+        start = time.perf_counter()
+        request = _Request(frame)
+        with self.cond:
+            self.queue.append(request)
+            self.cond.notify()
+        request.done.wait()
+        with self.cond:
+            self.latencies.append(time.perf_counter() - start)
+            self.requests += 1
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _take_batch(self):
+        with self.cond:
+            while self.running and not self.queue:
+                self.cond.wait()
+            if not self.running:
+                return []
+            deadline = time.perf_counter() + MAX_WAIT_S
+            batch, rows = [], 0
+            while True:
+                while self.queue and rows < MAX_BATCH_ROWS:
+                    request = self.queue.popleft()
+                    batch.append(request)
+                    rows += len(request.frame)
+                remaining = deadline - time.perf_counter()
+                if rows >= MAX_BATCH_ROWS or remaining <= 0:
+                    return batch
+                self.cond.wait(remaining)
+
+    def _run(self):
+        while self.running:
+            batch = self._take_batch()
+            if not batch:
+                continue
+            try:
+                frame = pd.concat([r.frame for r in batch], ignore_index=True)
+                X = build_features(frame)
+                if self.model is None:
+                    prob = np.minimum(fallback_score(X).to_numpy() / self.scale, 1.0)
+                else:
+                    prob = predict(self.model, X)
+                labels = np.asarray(recommend_batch(prob))
+                offset = 0
+                for request in batch:
+                    n = len(request.frame)
+                    request.result = (
+                        prob[offset:offset + n],
+                        labels[offset:offset + n],
+                    )
+                    offset += n
+            except Exception as exc:
+                for request in batch:
+                    request.error = exc
+            self.batch_sizes.append(len(batch))
+            for request in batch:
+                request.done.set()
+
+    def metrics(self):
+        with self.cond:
+            latencies = np.array(self.latencies)
+            sizes = np.array(self.batch_sizes)
+            requests = self.requests
+        elapsed = time.perf_counter() - self.started
+        ms = latencies * 1000 if len(latencies) else np.zeros(1)
+        return {
+            "requests": requests,
+            "throughput_rps": requests / elapsed if elapsed > 0 else 0.0,
+            "latency_p50_ms": float(np.percentile(ms, 50)),
+            "latency_p99_ms": float(np.percentile(ms, 99)),
+            "batches": int(len(sizes)),
+            "mean_requests_per_batch": float(sizes.mean()) if len(sizes) else 0.0,
+        }
+
+    def close(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        self.thread.join()
+
+
+class _Server(ThreadingHTTPServer):
+    # Bursts of concurrent clients overflow the default listen backlog of 5
+    request_queue_size = 128
+    daemon_threads = True
+
+
+def _make_handler(batcher, lookup):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status, body):
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            if self.path == "/metrics":
+                self._send(200, batcher.metrics())
+            elif self.path == "/health":
+                self._send(200, {"status": "ok"})
+            else:
+                self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path != "/score":
+                self._send(404, {"error": "not found"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                records = json.loads(self.rfile.read(length))["firms"]
+                frame = _resolve(records, lookup)
+            except (KeyError, ValueError, TypeError) as exc:
+                self._send(400, {"error": str(exc)})
+                return
+
+            try:
+                prob, labels = batcher.score(frame)
+            except Exception as exc:
+                # A failed batch must still answer its callers, not drop
+                # the connection without a response
+                self._send(500, {"error": str(exc)})
+                return
+            self._send(200, {
+                "scores": [
+                    {
+                        "Firm": firm,
+                        "Crash_Probability": float(p),
+                        "Recommendation": label,
+                    }
+                    for firm, p, label in zip(frame["Firm"], prob, labels)
+                ]
+            })
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def _resolve(records, lookup):
+    # TypeError and KeyError here become a 400 for the client
+    if not isinstance(records, list):
+        raise TypeError("firms must be a list of records")
+    rows = []
+    for record in records:
+        if not isinstance(record, dict):
+            raise TypeError(f"firm record must be an object: {record!r}")
+        if all(c in record for c in INPUT_COLUMNS):
+            rows.append({"Firm": record.get("Firm"), **{
+                c: float(record[c]) for c in INPUT_COLUMNS
+            }})
+        elif record.get("Firm") in lookup.index:
+            rows.append({"Firm": record["Firm"], **lookup.loc[record["Firm"]]})
+        else:
+            raise KeyError(f"unknown firm without inputs: {record.get('Firm')}")
+    return pd.DataFrame(rows, columns=["Firm"] + INPUT_COLUMNS)
+
+
+def create_server(panel=None, model=None, host="127.0.0.1", port=8765):
+    """Build (server, batcher) with the model resident; port=0 picks one."""
+    df = load_data(panel)
+    X = build_features(df)
+    if model is None:
+        model = train_model(df, X)
+
+    latest = df[df["Year"] == df["Year"].max()]
+    lookup = (
+        latest.assign(Firm=latest["Firm"].astype(str))
+        .drop_duplicates("Firm", keep="last")
+        .set_index("Firm")[INPUT_COLUMNS]
+        .astype(float)
+    )
+
+    scale = float(fallback_score(X).max()) if model is None else 1.0
+    batcher = MicroBatcher(model, scale=scale)
+    server = _Server((host, port), _make_handler(batcher, lookup))
+    return server, batcher
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--panel", default=DEFAULT_PATH)
+    parser.add_argument(
+        "--model",
+        help="model to serve: a pickle, or a compiled .npz",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    model = None
+    if args.model and args.model.endswith(".npz"):
+        model = CompiledEnsemble.load(args.model)
+    elif args.model:
+        with open(args.model, "rb") as fh:
+            model = pickle.load(fh)
+
+    server, batcher = create_server(args.panel, model, args.host, args.port)
+    print(f"Scoring service on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""One panel upload per session, shared by every page.
+
+Pages call active_dataset() instead of rendering their own uploader. The
+first upload is written once to UPLOAD_DIR under its content digest,
+parsed and indexed, and the path is kept in session state. Every page
+then reads the same path, which data_loader recognises by (size, mtime)
+without rehashing the bytes. "Replace dataset" in the sidebar clears it.
+Old uploads are pruned only once no live session holds them.
+"""
+import hashlib
+import os
+import tempfile
+import threading
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from engine.data_loader import DEFAULT_PATH, build_store, load_data
+
+UPLOAD_DIR = ".panel_uploads"
+
+# Uploaded panels kept on disk; older ones are removed first
+MAX_UPLOADS = 8
+
+_STATE_KEY = "dataset"
+
+# Session id -> upload path that session is reading. Sessions are threads
+# of one server process, so this registry sees every live holder.
+_holders = {}
+_lock = threading.Lock()
+
+
+def _session_id():
+    ctx = get_script_run_ctx()
+    return None if ctx is None else ctx.session_id
+
+
+def _hold(path):
+    session_id = _session_id()
+    if session_id is None:
+        return
+    with _lock:
+        if path is None:
+            _holders.pop(session_id, None)
+        else:
+            _holders[session_id] = path
+
+
+def _held_paths():
+    with _lock:
+        # Sessions the runtime has closed no longer pin their upload
+        if st.runtime.exists():
+            runtime = st.runtime.get_instance()
+            for session_id in list(_holders):
+                if not runtime.is_active_session(session_id):
+                    del _holders[session_id]
+        return set(_holders.values())
+
+
+def _save_upload(upload):
+    data = upload.getvalue()
+    digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    path = os.path.join(UPLOAD_DIR, digest + ".csv")
+    if not os.path.exists(path):
+        # A private temp file per call, so concurrent sessions uploading
+        # the same panel never write into one file
+        fd, tmp = tempfile.mkstemp(dir=UPLOAD_DIR, suffix=".tmp")
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp, path)
+    _hold(path)
+    _prune()
+    return path
+
+
+def _prune():
+    held = _held_paths()
+    uploads = []
+    for name in os.listdir(UPLOAD_DIR):
+        path = os.path.join(UPLOAD_DIR, name)
+        if not name.endswith(".csv") or path in held:
+            continue
+        try:
+            uploads.append((os.path.getmtime(path), path))
+        except FileNotFoundError:
+            pass
+
+    # Oldest unheld uploads go first; held ones never count against the cap
+    excess = len(uploads) + len(held) - MAX_UPLOADS
+    for _, path in sorted(uploads)[:max(excess, 0)]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def active_dataset():
+    """Path of this session's panel, or None for the bundled default."""
+    dataset = st.session_state.get(_STATE_KEY)
+    if dataset is not None and not os.path.exists(dataset["path"]):
+        # Removed outside the app (e.g. a cleared upload dir): ask again
+        del st.session_state[_STATE_KEY]
+        dataset = None
+    _hold(None if dataset is None else dataset["path"])
+
+    with st.sidebar:
+        if dataset is not None:
+            st.caption(
+                f"Dataset: **{dataset['name']}** "
+                f"({dataset['rows']:,} rows)"
+            )
+            if st.button("Replace dataset"):
+                del st.session_state[_STATE_KEY]
+                _hold(None)
+                st.rerun()
+            return dataset["path"]
+
+        upload = st.file_uploader(
+            "Upload firm-level panel data (CSV)",
+            type="csv",
+            key="dataset_upload",
+        )
+        if upload is None:
+            st.caption(f"Using the bundled sample: {DEFAULT_PATH}")
+            return None
+
+    with st.spinner("Parsing and indexing the uploaded panel..."):
+        path = _save_upload(upload)
+        rows = len(load_data(path))
+        build_store(path)
+
+    st.session_state[_STATE_KEY] = {
+        "name": upload.name,
+        "path": path,
+        "rows": rows,
+    }
+    st.rerun()
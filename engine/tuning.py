@@ -0,0 +1,207 @@
+"""Time-aware hyperparameter search for the crash model.
+
+Candidate configurations are scored on expanding-window year splits
+(train on years < v, validate on year v) and pruned by successive
+halving: every rung keeps the best 1/eta of the configurations and gives
+them eta times more boosting iterations. The winner is persisted so
+train_model picks it up. Run from the repository root:
+
+    python -m engine.tuning data/large_panel_dataset.csv --budget 3600
+"""
+import argparse
+import math
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import roc_auc_score
+
+from engine.crash_model import BACKENDS, crash_labels, save_tuned_params
+from engine.data_loader import DEFAULT_PATH, load_data
+from engine.feature_engineering import build_features
+from engine.parallel import parallel_map
+
+SEARCH_SPACES = {
+    "gbm": {
+        "learning_rate": [0.02, 0.05, 0.1, 0.2],
+        "max_depth": [2, 3, 4, 5],
+        "subsample": [0.6, 0.8, 1.0],
+        "min_samples_leaf": [1, 20, 100],
+    },
+    "hist": {
+        "learning_rate": [0.02, 0.05, 0.1, 0.2],
+        "max_leaf_nodes": [7, 15, 31, 63],
+        "min_samples_leaf": [20, 50, 200],
+        "l2_regularization": [0.0, 0.1, 1.0],
+    },
+}
+
+# Boosting iterations are the resource successive halving hands out
+RESOURCE_PARAM = {"gbm": "n_estimators", "hist": "max_iter"}
+MIN_RESOURCE = 25
+MAX_RESOURCE = 675
+
+# Training rows per split are sampled down to this many
+MAX_TRAIN_ROWS = 1_000_000
+
+
+def _evaluate(task, X, y, splits, backend, deadline):
+    params, resource = task
+    # Evaluations that start after the deadline return at once, so the
+    # pool drains quickly once the budget is spent
+    if time.time() >= deadline:
+        return None
+
+    scores = []
+    for train, valid in splits:
+        model = BACKENDS[backend]().set_params(
+            **params, **{RESOURCE_PARAM[backend]: resource}
+        )
+        if backend == "hist":
+            model.set_params(early_stopping=False)
+        model.fit(X[train], y[train])
+        prob = model.predict_proba(X[valid])[:, 1]
+        scores.append(roc_auc_score(y[valid], prob))
+    return float(np.mean(scores))
+
+
+def year_splits(years, n_splits=3, max_train_rows=MAX_TRAIN_ROWS, seed=0):
+    """Expanding-window (train, valid) row indices for the last n_splits years."""
+    rng = np.random.default_rng(seed)
+    distinct = np.unique(years)
+    # AUC is undefined on single-class folds
+    splits = []
+    for v in distinct[-n_splits:]:
+        train = np.flatnonzero(years < v)
+        valid = np.flatnonzero(years == v)
+        if len(train) == 0:
+            continue
+        if len(train) > max_train_rows:
+            train = np.sort(rng.choice(train, max_train_rows, replace=False))
+        splits.append((train, valid))
+    return splits
+
+
+def _sample_configs(space, n, rng):
+    names = sorted(space)
+    total = math.prod(len(space[k]) for k in names)
+    picks = rng.choice(total, size=min(n, total), replace=False)
+    configs = []
+    for pick in picks:
+        params = {}
+        for k in names:
+            pick, i = divmod(int(pick), len(space[k]))
+            params[k] = space[k][i]
+        configs.append(params)
+    return configs
+
+
+def tune(
+    df,
+    backend="hist",
+    n_configs=27,
+    eta=3,
+    n_splits=3,
+    budget_s=3600,
+    workers=None,
+    seed=0,
+    persist=True,
+):
+    """Successive-halving search on year splits within budget_s seconds.
+
+    No evaluation starts after the deadline; the best configuration of the
+    last fully scored rung wins. Returns (best_params, history), or
+    (None, history) if the budget ran out before the first rung finished.
+    """
+    deadline = time.time() + budget_s
+    X = build_features(df).to_numpy(dtype=np.float32)
+    y = crash_labels(df).to_numpy()
+
+    # AUC is undefined on single-class folds
+    splits = [
+        (train, valid)
+        for train, valid in year_splits(df["Year"].to_numpy(), n_splits)
+        if len(np.unique(y[train])) == 2 and len(np.unique(y[valid])) == 2
+    ]
+    if not splits:
+        raise ValueError("tune needs validation years with both classes")
+
+    rng = np.random.default_rng(seed)
+    configs = _sample_configs(SEARCH_SPACES[backend], n_configs, rng)
+    resource = MIN_RESOURCE
+    best = None
+    history = []
+
+    while configs and time.time() < deadline:
+        scores = []
+        for score in parallel_map(
+            _evaluate,
+            [(params, resource) for params in configs],
+            workers=workers,
+            shared=(X, y, splits, backend, deadline),
+        ):
+            scores.append(score)
+        if any(s is None for s in scores):
+            # Rung cut short by the deadline; its partial ranking is not
+            # comparable, so keep the previous rung's winner
+            break
+
+        for params, score in zip(configs, scores):
+            history.append({**params, "resource": resource, "auc": score})
+        ranked = sorted(range(len(configs)), key=lambda i: -scores[i])
+        best = {**configs[ranked[0]], RESOURCE_PARAM[backend]: resource}
+
+        if len(configs) == 1 or resource * eta > MAX_RESOURCE:
+            break
+        keep = max(1, len(configs) // eta)
+        configs = [configs[i] for i in ranked[:keep]]
+        resource *= eta
+
+    if best is not None and persist:
+        save_tuned_params(backend, best)
+    return best, pd.DataFrame(history)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("panel", nargs="?", default=DEFAULT_PATH)
+    parser.add_argument("--backend", choices=["gbm", "hist"], default="hist")
+    parser.add_argument("--configs", type=int, default=27)
+    parser.add_argument("--eta", type=int, default=3)
+    parser.add_argument("--splits", type=int, default=3)
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=3600,
+        help="wall-clock budget in seconds",
+    )
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="report the winner without persisting it",
+    )
+    args = parser.parse_args()
+
+    best, history = tune(
+        load_data(args.panel),
+        backend=args.backend,
+        n_configs=args.configs,
+        eta=args.eta,
+        n_splits=args.splits,
+        budget_s=args.budget,
+        workers=args.workers,
+        seed=args.seed,
+        persist=not args.dry_run,
+    )
+    if not history.empty:
+        print(history.sort_values("auc", ascending=False).to_string(index=False))
+    if best is None:
+        print("Budget ran out before the first rung finished; nothing saved")
+    else:
+        print("Best configuration:", best)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,35 +2,51 @@ import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
+from engine.aggregates import get_cube, stress_score
 from engine.data_loader import load_data
+from engine.profiling import finish_page, section, start_page
+from engine.session_dataset import active_dataset
+
+start_page("Market Overview")
 
 st.header("Market Overview")
 
-file = st.file_uploader("Upload market panel data", type="csv")
+# The session's panel, uploaded once in the sidebar
+file = active_dataset()
 df = load_data(file)
 
-df["Year"] = df["Year"].astype(int)
-latest_year = df["Year"].max()
-latest = df[df["Year"] == latest_year]
+report = df.attrs.get("memory_report")
+if report:
+    st.caption(
+        f"Panel in memory: {report['compact_bytes'] / 1e6:.1f} MB "
+        f"({report['raw_bytes'] / 1e6:.1f} MB with default dtypes)"
+    )
+
+# Industry x Year aggregates, built once per dataset and shared by pages
+cube = get_cube(file)
+latest_year = cube.latest_year
+totals = cube.totals(latest_year)
 
 # ---------------- KPI TICKER ----------------
+section("KPI Ticker")
 st.subheader("Live Market Indicators")
 
 k1, k2, k3, k4 = st.columns(4)
 
-k1.metric("Fragility Index", round(latest["Hybrid_EM"].mean() * 20, 1))
-k2.metric("Avg PEG", round(latest["PEG"].mean(), 2))
-k3.metric("Avg Leverage", round(latest["Debt_Equity"].mean(), 2))
+k1.metric("Fragility Index", round(totals["Hybrid_EM"] * 20, 1))
+k2.metric("Avg PEG", round(totals["PEG"], 2))
+k3.metric("Avg Leverage", round(totals["Debt_Equity"], 2))
 k4.metric("High Risk Firms %",
-          round((latest["Hybrid_EM"] > 2).mean() * 100, 1))
+          round(totals["high_em"] * 100, 1))
 
 # ---------------- GAUGE ----------------
+section("Gauge")
 st.subheader("Systemic Risk Gauge")
 
 gauge = go.Figure(
     go.Indicator(
         mode="gauge+number",
-        value=latest["Hybrid_EM"].mean() * 20,
+        value=totals["Hybrid_EM"] * 20,
         gauge={
             "axis": {"range": [0, 100]},
             "bar": {"color": "red"},
@@ -45,9 +61,10 @@ gauge = go.Figure(
 st.plotly_chart(gauge, use_container_width=True)
 
 # ---------------- HEATMAP ----------------
+section("Heatmap")
 st.subheader("Industry Stress Heatmap")
 
-heat = latest.groupby("Industry")[["Hybrid_EM", "PEG", "Debt_Equity"]].mean()
+heat = cube.industry(latest_year, ["Hybrid_EM", "PEG", "Debt_Equity"])
 
 st.plotly_chart(
     px.imshow(heat, color_continuous_scale="Reds", aspect="auto"),
@@ -55,9 +72,10 @@ st.plotly_chart(
 )
 
 # ---------------- TIME SERIES ----------------
+section("Time Series")
 st.subheader("Bubble Momentum Over Time")
 
-trend = df.groupby("Year")[["Hybrid_EM", "PEG"]].mean().reset_index()
+trend = cube.trend(["Hybrid_EM", "PEG"])
 
 st.plotly_chart(
     px.line(trend, x="Year", y=["Hybrid_EM", "PEG"]),
@@ -65,14 +83,11 @@ st.plotly_chart(
 )
 
 # ---------------- RANKING ----------------
+section("Ranking")
 st.subheader("Top Bubble Industries")
 
 rank = heat.copy()
-rank["Score"] = (
-    0.4 * rank["Hybrid_EM"]
-    + 0.3 * rank["PEG"]
-    + 0.3 * rank["Debt_Equity"]
-)
+rank["Score"] = stress_score(rank)
 rank = rank.sort_values("Score", ascending=False)
 
 st.plotly_chart(
@@ -80,5 +95,4 @@ st.plotly_chart(
     use_container_width=True
 )
 
-
-
+finish_page()
@@ -3,11 +3,17 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 
-from engine.data_loader import load_data
+from engine.aggregates import get_cube, stress_score
+from engine.charts import box_from_quantiles, scatter
+from engine.profiling import finish_page, section, start_page
+from engine.session_dataset import active_dataset
+
+start_page("Industry Stress Dashboard")
 
 # -------------------------------------------------
 # PAGE CONFIG
 # -------------------------------------------------
+section("Page Config")
 st.header("Industry Stress Dashboard")
 
 st.write(
@@ -18,68 +24,58 @@ st.write(
 # -------------------------------------------------
 # LOAD DATA
 # -------------------------------------------------
-file = st.file_uploader("Upload industry-level panel data", type="csv")
-df = load_data(file)
-
-df["Year"] = df["Year"].astype(int)
-
-latest_year = df["Year"].max()
-latest = df[df["Year"] == latest_year]
+section("Load Data")
+# The session's panel, uploaded once in the sidebar
+file = active_dataset()
+# Industry x Year aggregates, built once per dataset and shared by pages
+cube = get_cube(file)
+latest_year = cube.latest_year
+totals = cube.totals(latest_year)
 
 # -------------------------------------------------
 # KPI STRIP
 # -------------------------------------------------
+section("KPI Strip")
 st.subheader("Market-Wide Stress Indicators")
 
 c1, c2, c3, c4 = st.columns(4)
 
 c1.metric(
     "Avg Hybrid EM",
-    round(latest["Hybrid_EM"].mean(), 2)
+    round(totals["Hybrid_EM"], 2)
 )
 
 c2.metric(
     "Avg PEG",
-    round(latest["PEG"].mean(), 2)
+    round(totals["PEG"], 2)
 )
 
 c3.metric(
     "Avg Debt Equity",
-    round(latest["Debt_Equity"].mean(), 2)
+    round(totals["Debt_Equity"], 2)
 )
 
 c4.metric(
     "Industries in Distress (%)",
-    round((latest["Return"] < -0.30).mean() * 100, 1)
+    round(totals["distress"] * 100, 1)
 )
 
 # -------------------------------------------------
 # AGGREGATE INDUSTRY STRESS
 # -------------------------------------------------
-industry_panel = (
-    df.groupby(["Industry", "Year"])
-    .agg({
-        "Hybrid_EM": "mean",
-        "PEG": "mean",
-        "Debt_Equity": "mean",
-        "Return": "mean"
-    })
-    .reset_index()
-)
+section("Aggregate Industry Stress")
+industry_panel = cube.industry_year()
 
 latest_industry = industry_panel[
     industry_panel["Year"] == latest_year
 ].copy()
 
-latest_industry["Stress_Score"] = (
-    0.4 * latest_industry["Hybrid_EM"]
-    + 0.3 * latest_industry["PEG"]
-    + 0.3 * latest_industry["Debt_Equity"]
-)
+latest_industry["Stress_Score"] = stress_score(latest_industry)
 
 # -------------------------------------------------
 # CHART 1: INDUSTRY STRESS RANKING
 # -------------------------------------------------
+section("Chart 1: Industry Stress Ranking")
 st.subheader("Industry Bubble Stress Ranking")
 
 st.plotly_chart(
@@ -96,10 +92,11 @@ st.plotly_chart(
 # -------------------------------------------------
 # CHART 2: VALUATION VS MANIPULATION MAP
 # -------------------------------------------------
+section("Chart 2: Valuation vs Manipulation Map")
 st.subheader("Valuation Excess vs Earnings Manipulation")
 
 st.plotly_chart(
-    px.scatter(
+    scatter(
         latest_industry,
         x="PEG",
         y="Hybrid_EM",
@@ -113,14 +110,16 @@ st.plotly_chart(
 # -------------------------------------------------
 # CHART 3: LEVERAGE DISTRIBUTION
 # -------------------------------------------------
+section("Chart 3: Leverage Distribution")
 st.subheader("Industry Leverage Distribution")
 
 st.plotly_chart(
-    px.box(
-        latest,
-        x="Industry",
-        y="Debt_Equity",
-        title="Leverage Dispersion Across Industries"
+    # Quartiles come from the cube's sketches, so no firm rows are shipped
+    box_from_quantiles(
+        cube.quantiles("Debt_Equity", latest_year),
+        title="Leverage Dispersion Across Industries",
+        x_title="Industry",
+        y_title="Debt_Equity"
     ),
     use_container_width=True
 )
@@ -128,6 +127,7 @@ st.plotly_chart(
 # -------------------------------------------------
 # CHART 4: STRESS EVOLUTION OVER TIME
 # -------------------------------------------------
+section("Chart 4: Stress Evolution Over Time")
 st.subheader("Stress Evolution Over Time")
 
 stress_trend = (
@@ -150,10 +150,11 @@ st.plotly_chart(
 # -------------------------------------------------
 # CHART 5: RETURN COMPRESSION
 # -------------------------------------------------
+section("Chart 5: Return Compression")
 st.subheader("Return Compression Under Stress")
 
 st.plotly_chart(
-    px.scatter(
+    scatter(
         latest_industry,
         x="Stress_Score",
         y="Return",
@@ -165,6 +166,7 @@ st.plotly_chart(
 # -------------------------------------------------
 # HEATMAP: MULTI-DIMENSIONAL STRESS
 # -------------------------------------------------
+section("Heatmap: Multi-Dimensional Stress")
 st.subheader("Multi-Dimensional Industry Stress Heatmap")
 
 heatmap_data = (
@@ -184,6 +186,7 @@ st.plotly_chart(
 # -------------------------------------------------
 # CONCLUSION
 # -------------------------------------------------
+section("Conclusion")
 most_stressed = latest_industry.sort_values(
     "Stress_Score", ascending=False
 ).iloc[0]["Industry"]
@@ -196,3 +199,4 @@ st.write(
 )
 st.write(most_stressed)
 
+finish_page()
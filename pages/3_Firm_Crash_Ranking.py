@@ -1,10 +1,25 @@
 import streamlit as st
 import plotly.express as px
 
-from engine.data_loader import load_data
-from engine.feature_engineering import build_features
-from engine.crash_model import train_model, predict
-from engine.recommendation_engine import recommend
+from engine.charts import histogram, scatter
+from engine.data_loader import dataset_digest, load_slice, panel_partitions
+from engine.feature_store import feature_store
+from engine.confidence_scoring import bootstrap_intervals, firm_coverage
+from engine.crash_model import explain, main_driver, predict
+from engine.feature_engineering import MODEL_FEATURES
+from engine.industry_models import industry_models
+from engine.profiling import finish_page, section, start_page
+from engine.recommendation_engine import recommend_batch
+from engine.session_dataset import active_dataset
+
+start_page("Firm Crash Risk Ranking")
+
+
+@st.cache_data(max_entries=32, show_spinner="Fitting bootstrap models...")
+def risk_intervals(data_key, industry, _df, _X, _X_latest):
+    # Keyed by dataset digest and industry; the frames are not hashed
+    return bootstrap_intervals(_df, _X, _X_latest)
+
 
 st.header("Firm Crash Risk Ranking")
 
@@ -14,32 +29,39 @@ st.write(
 )
 
 # ---------------- LOAD DATA ----------------
-file = st.file_uploader("Upload firm-level panel data", type="csv")
-df = load_data(file)
-
-df["Year"] = df["Year"].astype(int)
+section("Load Data")
+# The session's panel, uploaded once in the sidebar
+file = active_dataset()
+partitions = panel_partitions(file)
 
 # ---------------- SELECT INDUSTRY ----------------
+section("Select Industry")
 industry = st.selectbox(
     "Select Industry",
-    sorted(df["Industry"].unique())
+    sorted(partitions["Industry"].unique())
 )
 
-df_i = df[df["Industry"] == industry]
+# Reads only the Industry=<industry> partitions of the columnar store
+df_i = load_slice(file, industries=[industry])
+df_i["Year"] = df_i["Year"].astype(int)
 
-# ---------------- FEATURE ENGINEERING ----------------
-X_all = build_features(df_i)
+# Features of this slice are computed once and reused across reruns
+features = feature_store(file, industries=[industry])
 
-# ---------------- TRAIN MODEL ----------------
-model = train_model(df_i, X_all)
+# ---------------- MODEL ----------------
+section("Model")
+# Every industry's model is fitted in one parallel pass on first use and
+# looked up afterwards, so switching industries does not refit
+model = industry_models(file).get(industry)
 
 # ---------------- MULTI-YEAR DATA (FOR GRAPHS) ----------------
-df_i = df_i.copy()
-df_i["Crash_Probability"] = predict(model, build_features(df_i))
+section("Multi-Year Data (for Graphs)")
+df_i["Crash_Probability"] = predict(model, features.matrix())
 
 # ---------------- AGGREGATE RISK ACROSS YEARS ----------------
+section("Aggregate Risk Across Years")
 risk_panel = (
-    df_i.groupby("Firm")
+    df_i.groupby("Firm", observed=True)
     .agg({
         "Crash_Probability": "mean",
         "Hybrid_EM": "mean",
@@ -53,6 +75,7 @@ risk_panel = (
 top10_panel = risk_panel.head(10)
 
 # ---------------- CHART 1: TOP 10 (MULTI-YEAR) ----------------
+section("Chart 1: Top 10 (Multi-Year)")
 st.subheader("Top 10 Firms by Average Crash Risk (Panel Data)")
 
 st.plotly_chart(
@@ -67,10 +90,11 @@ st.plotly_chart(
 )
 
 # ---------------- CHART 2: FRAGILITY MAP ----------------
+section("Chart 2: Fragility Map")
 st.subheader("Fragility Map (Top 10 Firms)")
 
 st.plotly_chart(
-    px.scatter(
+    scatter(
         top10_panel,
         x="Debt_Equity",
         y="Hybrid_EM",
@@ -82,51 +106,118 @@ st.plotly_chart(
 )
 
 # ---------------- CHART 3: RISK DISTRIBUTION ----------------
+section("Chart 3: Risk Distribution")
 st.subheader("Crash Risk Distribution (All Firms, All Years)")
 
 st.plotly_chart(
-    px.histogram(
-        df_i,
-        x="Crash_Probability",
-        nbins=20,
-        title="Distribution of Crash Risk"
+    histogram(
+        df_i["Crash_Probability"],
+        title="Distribution of Crash Risk",
+        x_title="Crash_Probability"
     ),
     use_container_width=True
 )
 
 # ---------------- LATEST YEAR ONLY (FINAL DECISION) ----------------
+section("Latest Year Only (Final Decision)")
 latest_year = df_i["Year"].max()
-latest = df_i[df_i["Year"] == latest_year].copy()
+is_latest = df_i["Year"] == latest_year
+latest = df_i[is_latest].copy()
+X_latest = features.matrix(rows=is_latest.to_numpy())
 
-latest["Final_Crash_Probability"] = predict(
-    model,
-    build_features(latest)
-)
+latest["Final_Crash_Probability"] = predict(model, X_latest)
+
+# Per-feature drivers of each score, cached per model and firm-year
+drivers = explain(model, X_latest, keys=latest[["Firm", "Year"]])
+drivers.index = latest.index
+latest["Main_Driver"] = main_driver(drivers)
 
 latest = latest.sort_values(
     "Final_Crash_Probability", ascending=False
 )
 
-latest["Recommendation"] = latest["Final_Crash_Probability"].apply(recommend)
+latest["Recommendation"] = recommend_batch(latest["Final_Crash_Probability"])
+
+# How much history backs each firm's score in this industry's panel
+latest["Confidence"] = (
+    firm_coverage(df_i)["Confidence"]
+    .reindex(latest["Firm"].to_numpy())
+    .to_numpy()
+)
+
+# ---------------- BOOTSTRAP INTERVALS ----------------
+section("Bootstrap Intervals")
+table_columns = [
+    "Firm",
+    "Final_Crash_Probability",
+    "Hybrid_EM",
+    "PEG",
+    "Debt_Equity",
+    "Recommendation",
+    "Confidence",
+    "Main_Driver"
+]
+
+# Fits a bag of models on firm resamples of this industry, so it runs on
+# request and is cached per dataset and industry
+if st.checkbox("Show 90% bootstrap intervals", key="show_intervals"):
+    try:
+        intervals = risk_intervals(
+            dataset_digest(file),
+            industry,
+            df_i,
+            features.matrix(),
+            X_latest
+        )
+    except ValueError as exc:
+        st.info(f"No intervals for this industry: {exc}")
+    else:
+        # Rows come back in X_latest order, i.e. before the sort above
+        intervals.index = df_i.index[is_latest]
+        latest = latest.join(
+            intervals[["Lower", "Upper"]].rename(
+                columns={"Lower": "Risk_Lower", "Upper": "Risk_Upper"}
+            )
+        )
+        table_columns[2:2] = ["Risk_Lower", "Risk_Upper"]
+        st.caption(
+            f"From {intervals.attrs['n_models']} models fitted on "
+            "firm-level resamples of this industry."
+        )
 
 # ---------------- TABLE ----------------
+section("Table")
 st.subheader("Latest Year Risk Table")
 
 st.dataframe(
-    latest[
-        [
-            "Firm",
-            "Final_Crash_Probability",
-            "Hybrid_EM",
-            "PEG",
-            "Debt_Equity",
-            "Recommendation"
-        ]
-    ],
+    latest[table_columns],
+    use_container_width=True
+)
+
+# ---------------- RISK DRIVERS ----------------
+section("Risk Drivers")
+st.subheader("What Drives the Top 10 Scores")
+
+top10_drivers = (
+    drivers.loc[latest.index[:10], MODEL_FEATURES]
+    .assign(Firm=latest["Firm"].head(10).astype(str))
+    .melt(id_vars="Firm", var_name="Feature", value_name="Contribution")
+)
+
+st.plotly_chart(
+    px.bar(
+        top10_drivers,
+        x="Contribution",
+        y="Firm",
+        color="Feature",
+        orientation="h",
+        title="Contribution of Each Feature to Crash Risk"
+    ),
     use_container_width=True
 )
 
 # ---------------- FINAL CONCLUSION ----------------
+section("Final Conclusion")
 worst_firm = latest.iloc[0]["Firm"]
 
 st.subheader("Final Prediction")
@@ -137,7 +228,4 @@ st.write(
 )
 st.write(worst_firm)
 
-
-
-
-
+finish_page()
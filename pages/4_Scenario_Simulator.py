@@ -1,14 +1,37 @@
 import streamlit as st
+import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 
-from engine.data_loader import load_data
-from engine.feature_engineering import build_features
-from engine.crash_model import train_model, predict
+from engine.charts import histogram, scatter
+from engine.data_loader import dataset_digest, load_data
+from engine.feature_store import feature_store
+from engine.crash_model import train_model
+from engine.model_store import model_digest
+from engine.profiling import finish_page, section, start_page
+from engine.scenarios import (
+    SCENARIOS,
+    SWEEP_MAX_FIRMS,
+    evaluate_scenarios,
+    scenario_matrix,
+    sweep_grid,
+)
+from engine.session_dataset import active_dataset
+
+start_page("Scenario Simulator")
+
+
+@st.cache_data(max_entries=16, show_spinner="Running the shock sweep...")
+def shock_sweep(data_key, model_key, val_axis, lev_axis, liquidity, _model, _X):
+    # Keyed by dataset digest, model digest and the grid; the underscored
+    # model and feature matrix are not hashed
+    return sweep_grid(_model, _X, val_axis, lev_axis, liquidity)
+
 
 # -------------------------------------------------
 # PAGE HEADER
 # -------------------------------------------------
+section("Page Header")
 st.header("Scenario Simulator")
 
 st.write(
@@ -19,80 +42,58 @@ st.write(
 # -------------------------------------------------
 # LOAD DATA
 # -------------------------------------------------
-file = st.file_uploader("Upload firm-level panel data", type="csv")
+section("Load Data")
+# The session's panel, uploaded once in the sidebar
+file = active_dataset()
 df = load_data(file)
 
 df["Year"] = df["Year"].astype(int)
 latest_year = df["Year"].max()
-latest = df[df["Year"] == latest_year]
+is_latest = (df["Year"] == latest_year).to_numpy()
+latest = df[is_latest]
 
 # -------------------------------------------------
 # SCENARIO SELECTION
 # -------------------------------------------------
+section("Scenario Selection")
 st.subheader("Select Crisis Scenario")
 
+scenario_names = list(SCENARIOS)
+
 scenario = st.selectbox(
     "Market Stress Scenario",
-    [
-        "Mild Correction (Valuation Reset)",
-        "Severe Market Crash (Leverage Unwind)",
-        "Liquidity Freeze (2008-style)",
-        "Sector Bubble Burst"
-    ]
+    scenario_names
 )
 
-# -------------------------------------------------
-# SCENARIO PARAMETERS
-# -------------------------------------------------
-if scenario == "Mild Correction (Valuation Reset)":
-    shock_val = 0.10
-    shock_lev = 0.05
-    shock_liq = 0.00
-
-elif scenario == "Severe Market Crash (Leverage Unwind)":
-    shock_val = 0.25
-    shock_lev = 0.20
-    shock_liq = 0.10
-
-elif scenario == "Liquidity Freeze (2008-style)":
-    shock_val = 0.30
-    shock_lev = 0.30
-    shock_liq = 0.25
-
-else:  # Sector Bubble Burst
-    shock_val = 0.35
-    shock_lev = 0.15
-    shock_liq = 0.10
+# Liquidity shock of the selected scenario anchors the shock sweep below
+shock_liq = SCENARIOS[scenario][2]
 
 # -------------------------------------------------
-# APPLY SHOCKS
+# ML CRASH PROBABILITY UNDER EVERY SCENARIO
 # -------------------------------------------------
-sim = latest.copy()
-
-sim["Valuation_Shock"] = sim["PEG"] * shock_val
-sim["Leverage_Shock"] = sim["Debt_Equity"] * shock_lev
-sim["Liquidity_Shock"] = (-sim["CFO_Growth"]) * shock_liq
-
-sim["Total_Stress"] = (
-    sim["Valuation_Shock"]
-    + sim["Leverage_Shock"]
-    + sim["Liquidity_Shock"]
-)
-
-# -------------------------------------------------
-# ML CRASH PROBABILITY
-# -------------------------------------------------
-X = build_features(df)
+section("ML Crash Probability Under Every Scenario")
+features = feature_store(file)
+X = features.matrix()
 model = train_model(df, X)
 
-sim["Crash_Probability"] = predict(
+sim = latest.copy()
+X_latest = features.matrix(rows=is_latest)
+
+# All preset scenarios are scored together; the selectbox only picks a row
+stress, probs = evaluate_scenarios(
     model,
-    build_features(sim)
+    X_latest,
+    scenario_matrix(scenario_names)
 )
 
+selected = scenario_names.index(scenario)
+sim["Total_Stress"] = stress[selected]
+sim["Crash_Probability"] = probs[selected]
+
 # -------------------------------------------------
 # KPI STRIP
 # -------------------------------------------------
+section("KPI Strip")
 st.subheader("System Impact Summary")
 
 c1, c2, c3, c4 = st.columns(4)
@@ -120,10 +121,11 @@ c4.metric(
 # -------------------------------------------------
 # CHART 1: INDUSTRY DAMAGE
 # -------------------------------------------------
+section("Chart 1: Industry Damage")
 st.subheader("Industry-Level Stress Under Scenario")
 
 industry_damage = (
-    sim.groupby("Industry")["Total_Stress"]
+    sim.groupby("Industry", observed=True)["Total_Stress"]
     .mean()
     .reset_index()
 )
@@ -142,6 +144,7 @@ st.plotly_chart(
 # -------------------------------------------------
 # CHART 2: FIRMS MOST LIKELY TO FAIL
 # -------------------------------------------------
+section("Chart 2: Firms Most Likely to Fail")
 st.subheader("Firms Most Likely to Fail First")
 
 top_failures = (
@@ -163,13 +166,15 @@ st.plotly_chart(
 # -------------------------------------------------
 # CHART 3: STRESS MAP
 # -------------------------------------------------
+section("Chart 3: Stress Map")
 st.subheader("Stress Transmission Map")
 
 st.plotly_chart(
-    px.scatter(
+    scatter(
         sim,
         x="Debt_Equity",
         y="PEG",
+        priority="Crash_Probability",
         size="Crash_Probability",
         color="Industry",
         title="Leverage vs Valuation Under Stress"
@@ -180,14 +185,77 @@ st.plotly_chart(
 # -------------------------------------------------
 # CHART 4: DISTRIBUTION
 # -------------------------------------------------
+section("Chart 4: Distribution")
 st.subheader("Crash Probability Distribution")
 
 st.plotly_chart(
-    px.histogram(
-        sim,
-        x="Crash_Probability",
-        nbins=20,
-        title="Distribution of Firm-Level Crash Risk"
+    histogram(
+        sim["Crash_Probability"],
+        title="Distribution of Firm-Level Crash Risk",
+        x_title="Crash_Probability"
+    ),
+    use_container_width=True
+)
+
+# -------------------------------------------------
+# CHART 5: SCENARIO COMPARISON
+# -------------------------------------------------
+section("Chart 5: Scenario Comparison")
+st.subheader("Scenario Comparison")
+
+st.plotly_chart(
+    px.bar(
+        x=probs.mean(axis=1),
+        y=scenario_names,
+        orientation="h",
+        labels={"x": "Avg Crash Probability", "y": "Scenario"},
+        title="Average Crash Probability by Scenario"
+    ),
+    use_container_width=True
+)
+
+# -------------------------------------------------
+# CHART 6: SHOCK SWEEP
+# -------------------------------------------------
+section("Chart 6: Shock Sweep")
+st.subheader("Valuation x Leverage Shock Sweep")
+
+grid_steps = 50
+val_axis = np.linspace(0.0, 0.5, grid_steps)
+lev_axis = np.linspace(0.0, 0.5, grid_steps)
+
+sweep = shock_sweep(
+    dataset_digest(file),
+    None if model is None else model_digest(model),
+    val_axis,
+    lev_axis,
+    shock_liq,
+    model,
+    X_latest
+)
+
+if len(X_latest) > SWEEP_MAX_FIRMS:
+    st.caption(
+        f"Each grid point averages a fixed random sample of "
+        f"{SWEEP_MAX_FIRMS:,} of the {len(X_latest):,} firms; scoring "
+        f"all {grid_steps * grid_steps:,} scenarios for every firm would "
+        "take minutes on large panels."
+    )
+
+st.plotly_chart(
+    px.imshow(
+        sweep.T,
+        x=val_axis.round(3),
+        y=lev_axis.round(3),
+        origin="lower",
+        color_continuous_scale="Reds",
+        labels={
+            "x": "Valuation Shock",
+            "y": "Leverage Shock",
+            "color": "Avg Crash Probability"
+        },
+        aspect="auto",
+        title="Average Crash Probability at Selected Liquidity Shock"
     ),
     use_container_width=True
 )
@@ -195,6 +263,7 @@ st.plotly_chart(
 # -------------------------------------------------
 # DECISION TABLE
 # -------------------------------------------------
+section("Decision Table")
 st.subheader("Actionable Firm-Level Decisions")
 
 st.dataframe(
@@ -214,6 +283,7 @@ st.dataframe(
 # -------------------------------------------------
 # FINAL RECOMMENDATION
 # -------------------------------------------------
+section("Final Recommendation")
 worst = top_failures.iloc[0]["Firm"]
 
 st.subheader("Scenario Recommendation")
@@ -229,3 +299,5 @@ st.write(
 st.write("- Reduce or exit exposure to high crash probability firms")
 st.write("- Increase hedging in affected industries")
 st.write("- Avoid leveraged firms with weak cash flows")
+
+finish_page()
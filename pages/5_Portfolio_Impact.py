@@ -2,13 +2,36 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 
+from engine.charts import scatter
 from engine.data_loader import load_data
 from engine.feature_engineering import build_features
+from engine.feature_store import feature_store
 from engine.crash_model import train_model, predict
+from engine.monte_carlo import simulate_losses
+from engine.portfolio import score_portfolios, weight_matrix
+from engine.profiling import finish_page, section, start_page
+from engine.session_dataset import active_dataset
+
+start_page("Portfolio Impact Analysis")
+
+
+@st.cache_data(max_entries=16, show_spinner="Simulating crash paths...")
+def tail_risk(probs, weights, industries):
+    # Cached on the holdings' probabilities, weights and industries, so
+    # widget reruns that leave them unchanged skip the 100k-path simulation
+    return simulate_losses(
+        probs,
+        weights,
+        industries,
+        portfolio_names=["Portfolio"],
+        n_paths=100_000
+    )
+
 
 # -------------------------------------------------
 # PAGE HEADER
 # -------------------------------------------------
+section("Page Header")
 st.header("Portfolio Impact Analysis")
 
 st.write(
@@ -20,20 +43,20 @@ st.write(
 # -------------------------------------------------
 # LOAD MARKET DATA (FOR RISK ESTIMATION)
 # -------------------------------------------------
-file_market = st.file_uploader(
-    "Upload firm-level market data (CSV)",
-    type="csv",
-    key="market"
-)
+section("Load Market Data (for Risk Estimation)")
+# The session's panel, uploaded once in the sidebar
+file_market = active_dataset()
 market_df = load_data(file_market)
 
 market_df["Year"] = market_df["Year"].astype(int)
 latest_year = market_df["Year"].max()
-latest_market = market_df[market_df["Year"] == latest_year]
+is_latest = (market_df["Year"] == latest_year).to_numpy()
+latest_market = market_df[is_latest]
 
 # -------------------------------------------------
 # SAMPLE PORTFOLIO DATA (AUTO-LOADED)
 # -------------------------------------------------
+section("Sample Portfolio Data (Auto-Loaded)")
 st.subheader("Portfolio Holdings")
 
 st.caption(
@@ -73,6 +96,7 @@ portfolio = st.data_editor(
 # -------------------------------------------------
 # MERGE PORTFOLIO WITH MARKET DATA
 # -------------------------------------------------
+section("Merge Portfolio with Market Data")
 merged = portfolio.merge(
     latest_market,
     on="Firm",
@@ -84,7 +108,9 @@ merged = merged.dropna(subset=["Hybrid_EM", "PEG", "Debt_Equity"])
 # -------------------------------------------------
 # TRAIN CRASH MODEL
 # -------------------------------------------------
-X_all = build_features(market_df)
+section("Train Crash Model")
+features = feature_store(file_market)
+X_all = features.matrix()
 model = train_model(market_df, X_all)
 
 merged["Crash_Probability"] = predict(
@@ -95,6 +121,7 @@ merged["Crash_Probability"] = predict(
 # -------------------------------------------------
 # PORTFOLIO RISK METRICS
 # -------------------------------------------------
+section("Portfolio Risk Metrics")
 merged["Weighted_Risk"] = merged["Weight"] * merged["Crash_Probability"]
 
 portfolio_crash_risk = merged["Weighted_Risk"].sum()
@@ -106,6 +133,7 @@ expected_drawdown = (
 # -------------------------------------------------
 # KPI STRIP
 # -------------------------------------------------
+section("KPI Strip")
 st.subheader("Portfolio Risk Summary")
 
 c1, c2, c3 = st.columns(3)
@@ -128,9 +156,70 @@ c3.metric(
     )
 )
 
+# -------------------------------------------------
+# MONTE CARLO TAIL RISK
+# -------------------------------------------------
+section("Monte Carlo Tail Risk")
+st.subheader("Simulated Tail Risk (Correlated Crashes)")
+
+st.caption(
+    "100,000 simulated paths with market- and industry-correlated crashes "
+    "and a random loss given crash (mean 40%)."
+)
+
+if merged.empty:
+    st.warning(
+        "None of the portfolio's firms appear in the latest year of the "
+        "market data, so there is nothing to simulate."
+    )
+else:
+    mc_summary, mc_distribution = tail_risk(
+        merged["Crash_Probability"],
+        merged["Weight"],
+        merged["Industry"]
+    )
+
+    mc_portfolio = mc_summary.loc["Portfolio"]
+
+    m1, m2, m3 = st.columns(3)
+
+    m1.metric(
+        "Simulated Expected Loss",
+        f"{round(mc_portfolio['Expected_Loss'] * 100, 1)} %"
+    )
+
+    m2.metric(
+        "99% VaR",
+        f"{round(mc_portfolio['VaR'] * 100, 1)} %"
+    )
+
+    m3.metric(
+        "99% Expected Shortfall",
+        f"{round(mc_portfolio['Expected_Shortfall'] * 100, 1)} %"
+    )
+
+    st.plotly_chart(
+        px.bar(
+            mc_distribution["Portfolio"].reset_index(),
+            x="Loss_Fraction",
+            y="Portfolio",
+            labels={"Portfolio": "Share of Paths"},
+            title="Simulated Portfolio Loss Distribution"
+        ),
+        use_container_width=True
+    )
+
+    st.dataframe(
+        mc_summary[mc_summary["Book_Type"] == "Industry"][
+            ["Expected_Loss", "VaR", "Expected_Shortfall"]
+        ],
+        use_container_width=True
+    )
+
 # -------------------------------------------------
 # CHART 1: CONTRIBUTION TO RISK
 # -------------------------------------------------
+section("Chart 1: Contribution to Risk")
 st.subheader("Contribution to Portfolio Risk")
 
 st.plotly_chart(
@@ -147,10 +236,11 @@ st.plotly_chart(
 # -------------------------------------------------
 # CHART 2: WEIGHT VS RISK MAP
 # -------------------------------------------------
+section("Chart 2: Weight vs Risk Map")
 st.subheader("Weight vs Crash Probability")
 
 st.plotly_chart(
-    px.scatter(
+    scatter(
         merged,
         x="Weight",
         y="Crash_Probability",
@@ -164,6 +254,7 @@ st.plotly_chart(
 # -------------------------------------------------
 # CHART 3: PORTFOLIO COMPOSITION
 # -------------------------------------------------
+section("Chart 3: Portfolio Composition")
 st.subheader("Portfolio Composition")
 
 st.plotly_chart(
@@ -179,6 +270,7 @@ st.plotly_chart(
 # -------------------------------------------------
 # DETAILED TABLE
 # -------------------------------------------------
+section("Detailed Table")
 st.subheader("Detailed Portfolio Risk Table")
 
 st.dataframe(
@@ -197,19 +289,54 @@ st.dataframe(
 )
 
 # -------------------------------------------------
-# FINAL RECOMMENDATION
+# BATCH SCORING OF MODEL PORTFOLIOS
 # -------------------------------------------------
-worst_firm = (
-    merged.sort_values("Weighted_Risk", ascending=False)
-    .iloc[0]["Firm"]
+section("Batch Scoring of Model Portfolios")
+st.subheader("Model Portfolio Batch Scoring")
+
+file_batch = st.file_uploader(
+    "Upload model portfolios (Portfolio, Firm, Weight)",
+    type="csv",
+    key="batch"
 )
 
+if file_batch is not None:
+    holdings = pd.read_csv(file_batch)
+
+    # The universe is scored once; every portfolio is a sparse row of weights
+    universe_prob = predict(model, features.matrix(rows=is_latest))
+    weights, portfolio_ids = weight_matrix(holdings, latest_market["Firm"])
+
+    batch_summary, batch_top = score_portfolios(
+        weights,
+        universe_prob,
+        portfolio_ids,
+        latest_market["Firm"]
+    )
+
+    st.dataframe(
+        batch_summary.sort_values("Crash_Risk", ascending=False),
+        use_container_width=True
+    )
+
+    st.dataframe(batch_top, use_container_width=True)
+
+# -------------------------------------------------
+# FINAL RECOMMENDATION
+# -------------------------------------------------
+section("Final Recommendation")
 st.subheader("Portfolio Recommendation")
 
-st.write(
-    "The largest contributor to portfolio crash risk is:"
-)
-st.write(worst_firm)
+if not merged.empty:
+    worst_firm = (
+        merged.sort_values("Weighted_Risk", ascending=False)
+        .iloc[0]["Firm"]
+    )
+
+    st.write(
+        "The largest contributor to portfolio crash risk is:"
+    )
+    st.write(worst_firm)
 
 st.write(
     "Recommended actions:"
@@ -218,3 +345,4 @@ st.write("- Reduce exposure to high-risk holdings")
 st.write("- Rebalance away from leveraged firms")
 st.write("- Increase diversification across industries")
 
+finish_page()
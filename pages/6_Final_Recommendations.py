@@ -2,14 +2,26 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 
+from engine.aggregates import get_cube
+from engine.charts import scatter
 from engine.data_loader import load_data
-from engine.feature_engineering import build_features
-from engine.crash_model import train_model, predict
-from engine.recommendation_engine import recommend
+from engine.feature_store import feature_store
+from engine.crash_model import explain, main_driver, train_model, predict
+from engine.profiling import finish_page, section, start_page
+from engine.recommendation_engine import (
+    ACTION_TIERS,
+    assign_tiers,
+    industry_action,
+    recommend_batch,
+)
+from engine.session_dataset import active_dataset
+
+start_page("Final Risk Assessment and Strategic Actions")
 
 # -------------------------------------------------
 # PAGE HEADER
 # -------------------------------------------------
+section("Page Header")
 st.header("Final Risk Assessment and Strategic Actions")
 
 st.write(
@@ -21,33 +33,38 @@ st.write(
 # -------------------------------------------------
 # LOAD DATA
 # -------------------------------------------------
-file = st.file_uploader(
-    "Upload firm-level panel data (CSV)",
-    type="csv"
-)
+section("Load Data")
+# The session's panel, uploaded once in the sidebar
+file = active_dataset()
 
 df = load_data(file)
 df["Year"] = df["Year"].astype(int)
 
 latest_year = df["Year"].max()
-latest = df[df["Year"] == latest_year]
+is_latest = (df["Year"] == latest_year).to_numpy()
+latest = df[is_latest]
 
 # -------------------------------------------------
 # TRAIN CRASH MODEL (GLOBAL)
 # -------------------------------------------------
-X_all = build_features(df)
+section("Train Crash Model (Global)")
+features = feature_store(file)
+X_all = features.matrix()
 model = train_model(df, X_all)
 
-latest["Crash_Probability"] = predict(
-    model,
-    build_features(latest)
-)
+X_latest = features.matrix(rows=is_latest)
+latest["Crash_Probability"] = predict(model, X_latest)
 
-latest["Recommendation"] = latest["Crash_Probability"].apply(recommend)
+# Per-feature drivers of each score, cached per model and firm-year
+drivers = explain(model, X_latest, keys=latest[["Firm", "Year"]])
+latest["Main_Driver"] = main_driver(drivers).to_numpy()
+
+latest["Recommendation"] = recommend_batch(latest["Crash_Probability"])
 
 # -------------------------------------------------
 # SYSTEM LEVEL METRICS
 # -------------------------------------------------
+section("System Level Metrics")
 st.subheader("System-Wide Risk Summary")
 
 c1, c2, c3, c4 = st.columns(4)
@@ -77,6 +94,7 @@ c4.metric(
 # -------------------------------------------------
 # TOP FIRMS TO ACT ON
 # -------------------------------------------------
+section("Top Firms to Act On")
 st.subheader("Top Firms Requiring Immediate Action")
 
 top_firms = (
@@ -104,7 +122,8 @@ st.dataframe(
             "Hybrid_EM",
             "PEG",
             "Debt_Equity",
-            "Recommendation"
+            "Recommendation",
+            "Main_Driver"
         ]
     ],
     use_container_width=True
@@ -113,28 +132,29 @@ st.dataframe(
 # -------------------------------------------------
 # INDUSTRY ACTION MAP
 # -------------------------------------------------
+section("Industry Action Map")
 st.subheader("Industry-Level Strategic Posture")
 
+# Fundamentals come from the shared Industry x Year cube; only the model
+# output needs a fresh aggregation
 industry_actions = (
-    latest.groupby("Industry")
-    .agg({
-        "Crash_Probability": "mean",
-        "Hybrid_EM": "mean",
-        "Debt_Equity": "mean"
-    })
+    get_cube(file)
+    .industry(latest_year, ["Hybrid_EM", "Debt_Equity"])
+    .assign(
+        Crash_Probability=latest.groupby(
+            latest["Industry"].astype(str)
+        )["Crash_Probability"].mean()
+    )
     .reset_index()
+    [["Industry", "Crash_Probability", "Hybrid_EM", "Debt_Equity"]]
 )
 
-industry_actions["Industry_Action"] = industry_actions[
-    "Crash_Probability"
-].apply(
-    lambda x: "Reduce Exposure" if x > 0.6 else
-              "Hedge Selectively" if x > 0.4 else
-              "Maintain Exposure"
+industry_actions["Industry_Action"] = industry_action(
+    industry_actions["Crash_Probability"]
 )
 
 st.plotly_chart(
-    px.scatter(
+    scatter(
         industry_actions,
         x="Debt_Equity",
         y="Hybrid_EM",
@@ -159,44 +179,32 @@ st.dataframe(
 # -------------------------------------------------
 # HIGH VALUE STRATEGIC OPTIONS
 # -------------------------------------------------
+section("High Value Strategic Options")
 st.subheader("High-Value Strategic Options")
 
 st.markdown("Recommended actions by risk tier:")
 
-st.write("1. Immediate Exit Candidates")
-exit_firms = top_firms[
-    top_firms["Crash_Probability"] > 0.75
-]["Firm"].tolist()
-if exit_firms:
-    for f in exit_firms:
-        st.write("- " + f)
-else:
-    st.write("- None identified")
-
-st.write("2. Hedge or Reduce Exposure")
-hedge_firms = top_firms[
-    (top_firms["Crash_Probability"] <= 0.75) &
-    (top_firms["Crash_Probability"] > 0.50)
-]["Firm"].tolist()
-if hedge_firms:
-    for f in hedge_firms:
-        st.write("- " + f)
-else:
-    st.write("- None identified")
-
-st.write("3. Monitor Closely")
-monitor_firms = top_firms[
-    top_firms["Crash_Probability"] <= 0.50
-]["Firm"].tolist()
-if monitor_firms:
-    for f in monitor_firms:
-        st.write("- " + f)
-else:
-    st.write("- None identified")
+action_tier = assign_tiers(top_firms["Crash_Probability"], ACTION_TIERS)
+
+headings = [
+    "1. Immediate Exit Candidates",
+    "2. Hedge or Reduce Exposure",
+    "3. Monitor Closely",
+]
+
+for code, heading in enumerate(headings):
+    st.write(heading)
+    tier_firms = top_firms["Firm"][action_tier.codes == code].tolist()
+    if tier_firms:
+        for f in tier_firms:
+            st.write("- " + f)
+    else:
+        st.write("- None identified")
 
 # -------------------------------------------------
 # FINAL VERDICT
 # -------------------------------------------------
+section("Final Verdict")
 worst_firm = top_firms.iloc[0]["Firm"]
 worst_industry = top_firms.iloc[0]["Industry"]
 
@@ -224,3 +232,5 @@ st.write("- Reduce or exit exposure to the identified firm")
 st.write("- Increase hedging in the identified industry")
 st.write("- Avoid new late-cycle investments in high-risk sectors")
 st.write("- Reassess portfolio concentration monthly")
+
+finish_page()
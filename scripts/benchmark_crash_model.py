@@ -0,0 +1,91 @@
+"""Fit/predict timing of the crash model backends.
+
+Run from the repository root:
+
+    python -m scripts.benchmark_crash_model
+    python -m scripts.benchmark_crash_model --sizes 10000,100000 --backends hist
+
+sklearn_small_ms and compiled_small_ms time one call on SMALL_BATCH rows
+through sklearn's predict_proba and through the compiled flat-array
+ensemble.
+"""
+import argparse
+import time
+
+from engine.crash_model import compile_model, train_model, predict
+from engine.feature_engineering import build_features
+from scripts.generate_large_dataset import END_YEAR, START_YEAR, generate_panel
+
+
+# Rows in the small-batch call: roughly a page's latest-year slice
+SMALL_BATCH = 300
+SMALL_REPEATS = 50
+
+
+def synthetic_panel(n_rows, seed=42):
+    years = END_YEAR - START_YEAR + 1
+    df = generate_panel(n_firms=-(-n_rows // years), seed=seed)
+    return df.head(n_rows)
+
+
+def time_backend(df, X, backend):
+    start = time.perf_counter()
+    model = train_model(df, X, backend=backend, use_store=False)
+    fit = time.perf_counter() - start
+
+    start = time.perf_counter()
+    predict(model, X)
+    pred = time.perf_counter() - start
+    return model, fit, pred
+
+
+def time_small_batch(score, X):
+    batch = X.head(SMALL_BATCH)
+    score(batch)
+    start = time.perf_counter()
+    for _ in range(SMALL_REPEATS):
+        score(batch)
+    return (time.perf_counter() - start) / SMALL_REPEATS * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10000,1000000,10000000")
+    parser.add_argument("--backends", default="gbm,hist")
+    parser.add_argument(
+        "--gbm-max-rows",
+        type=int,
+        default=1_000_000,
+        help="skip the exact-split estimator above this many rows",
+    )
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    backends = args.backends.split(",")
+
+    print(
+        f"{'rows':>10} {'backend':>8} {'fit_s':>10} {'predict_s':>10} "
+        f"{'sklearn_small_ms':>17} {'compiled_small_ms':>18}"
+    )
+    for n in sizes:
+        df = synthetic_panel(n)
+        X = build_features(df)
+        for backend in backends:
+            if backend == "gbm" and n > args.gbm_max_rows:
+                print(f"{n:>10} {backend:>8} {'skipped':>10} {'skipped':>10}")
+                continue
+            model, fit, pred = time_backend(df, X, backend)
+            if model is None:
+                print(f"{n:>10} {backend:>8} {fit:>10.3f} {pred:>10.3f}")
+                continue
+            compiled = compile_model(model)
+            native = time_small_batch(model.predict_proba, X)
+            flat = time_small_batch(compiled.predict_proba, X)
+            print(
+                f"{n:>10} {backend:>8} {fit:>10.3f} {pred:>10.3f} "
+                f"{native:>17.3f} {flat:>18.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+"""Benchmark harness for the engine package.
+
+Every (case, rows) pair runs in a fresh spawned process on a generated
+panel and records wall time, peak RSS growth and peak traced Python/NumPy
+allocations. Results are written as JSON; with --baseline they are
+compared against an earlier run and any regression exits non-zero.
+
+Run from the repository root:
+
+    python -m scripts.benchmark_engine --save-baseline
+    python -m scripts.benchmark_engine --sizes 1000,100000
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from engine.aggregates import IndustryCube
+from engine.confidence_scoring import confidence_score, firm_coverage
+from engine.crash_model import predict, train_model
+from engine.data_loader import clear_cache, load_data
+from engine.feature_engineering import build_features
+from engine.recommendation_engine import recommend, recommend_batch
+from engine.scenarios import evaluate_scenarios, scenario_matrix
+from scripts.generate_large_dataset import END_YEAR, START_YEAR, generate_panel
+
+DEFAULT_SIZES = "1000,100000,1000000,10000000"
+DEFAULT_OUTPUT = "bench_results.json"
+DEFAULT_BASELINE = "bench_baseline.json"
+
+# A case regresses when it is this much slower/larger than the baseline and
+# the absolute difference is above the noise floor
+TOLERANCE = 0.25
+MIN_WALL_DELTA_S = 0.05
+MIN_RSS_DELTA_MB = 16
+
+
+def _panel(rows):
+    years = END_YEAR - START_YEAR + 1
+    return generate_panel(n_firms=-(-rows // years)).head(rows)
+
+
+def _features(rows):
+    df = _panel(rows)
+    return df, build_features(df)
+
+
+def _trained(rows):
+    # Models for scoring cases are fitted on a bounded sample so the setup
+    # does not dominate the run at 10M rows
+    df, X = _features(rows)
+    sample = min(rows, 100_000)
+    model = train_model(
+        df.iloc[:sample], X.iloc[:sample], backend="hist", use_store=False
+    )
+    return df, X, model
+
+
+def _setup_load(rows, csv_path):
+    return csv_path
+
+
+def _run_load(csv_path):
+    clear_cache()
+    load_data(csv_path)
+
+
+def _setup_features(rows, csv_path):
+    return _panel(rows)
+
+
+def _run_features(df):
+    build_features(df)
+
+
+def _run_train(backend):
+    def run(state):
+        df, X = state
+        train_model(df, X, backend=backend, use_store=False)
+    return run
+
+
+def _setup_train(rows, csv_path):
+    return _features(rows)
+
+
+def _setup_predict(rows, csv_path):
+    _, X, model = _trained(rows)
+    return model, X
+
+
+def _run_predict(state):
+    model, X = state
+    predict(model, X)
+
+
+def _setup_probs(rows, csv_path):
+    return np.random.default_rng(0).random(rows)
+
+
+def _run_recommend_batch(probs):
+    recommend_batch(probs)
+
+
+def _run_recommend_scalar(probs):
+    [recommend(p) for p in probs]
+
+
+def _run_confidence(df):
+    confidence_score(df)
+
+
+def _run_coverage(df):
+    firm_coverage(df)
+
+
+def _run_cube(df):
+    IndustryCube.from_panel(df)
+
+
+def _setup_scenarios(rows, csv_path):
+    df, X, model = _trained(rows)
+    return model, X
+
+
+def _run_scenarios(state):
+    model, X = state
+    evaluate_scenarios(model, X, scenario_matrix())
+
+
+# name: (setup, run, max rows or None)
+CASES = {
+    "load_data": (_setup_load, _run_load, None),
+    "build_features": (_setup_features, _run_features, None),
+    "train_model[gbm]": (_setup_train, _run_train("gbm"), 100_000),
+    "train_model[hist]": (_setup_train, _run_train("hist"), None),
+    "predict": (_setup_predict, _run_predict, None),
+    "recommend_batch": (_setup_probs, _run_recommend_batch, None),
+    "recommend[scalar]": (_setup_probs, _run_recommend_scalar, 1_000_000),
+    "confidence_score": (_setup_features, _run_confidence, None),
+    "firm_coverage": (_setup_features, _run_coverage, None),
+    "industry_cube": (_setup_features, _run_cube, None),
+    "evaluate_scenarios": (_setup_scenarios, _run_scenarios, None),
+}
+
+
+def _rss_mb(field):
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # Non-Linux fallback: lifetime peak, in KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 ** 2 if sys.platform == "darwin" else 1024)
+
+
+def _reset_peak_rss():
+    try:
+        with open("/proc/self/clear_refs", "w") as fh:
+            fh.write("5")
+    except OSError:
+        pass
+
+
+def _measure(name, rows, csv_path, trace, queue):
+    setup, run, _ = CASES[name]
+    state = setup(rows, csv_path)
+
+    _reset_peak_rss()
+    rss_before = _rss_mb("VmRSS")
+    start = time.perf_counter()
+    run(state)
+    wall = time.perf_counter() - start
+    rss_peak = _rss_mb("VmHWM")
+
+    alloc_peak = None
+    if trace:
+        # Separate pass: tracemalloc slows the run down too much to time it
+        tracemalloc.start()
+        run(state)
+        alloc_peak = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+        tracemalloc.stop()
+
+    queue.put({
+        "case": name,
+        "rows": rows,
+        "wall_s": round(wall, 4),
+        "peak_rss_mb": round(max(rss_peak - rss_before, 0), 1),
+        "alloc_peak_mb": None if alloc_peak is None else round(alloc_peak, 1),
+    })
+
+
+def run_case(name, rows, csv_path, trace=True):
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_measure, args=(name, rows, csv_path, trace, queue))
+    proc.start()
+    proc.join()
+    if proc.exitcode != 0:
+        return {"case": name, "rows": rows, "error": f"exit code {proc.exitcode}"}
+    return queue.get()
+
+
+def compare(results, baseline):
+    known = {(r["case"], r["rows"]): r for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        base = known.get((r["case"], r["rows"]))
+        if base is None or "error" in base:
+            continue
+        # A case that used to finish and now crashes or runs out of memory
+        # is the worst regression of all, not a missing measurement
+        if "error" in r:
+            regressions.append((r["case"], r["rows"], "error", "ok", r["error"]))
+            continue
+        for key, floor in (
+            ("wall_s", MIN_WALL_DELTA_S),
+            ("peak_rss_mb", MIN_RSS_DELTA_MB),
+        ):
+            old, new = base[key], r[key]
+            if new > old * (1 + TOLERANCE) and new - old > floor:
+                regressions.append((r["case"], r["rows"], key, old, new))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default=DEFAULT_SIZES)
+    parser.add_argument("--cases", default=",".join(CASES))
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="write this run as the new baseline instead of comparing",
+    )
+    parser.add_argument(
+        "--no-alloc",
+        action="store_true",
+        help="skip the tracemalloc pass",
+    )
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    cases = args.cases.split(",")
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'case':<22} {'rows':>10} {'wall_s':>9} "
+              f"{'rss_mb':>9} {'alloc_mb':>9}")
+        for rows in sizes:
+            csv_path = os.path.join(tmp, f"panel_{rows}.csv")
+            if "load_data" in cases:
+                _panel(rows).to_csv(csv_path, index=False)
+
+            for name in cases:
+                if CASES[name][2] is not None and rows > CASES[name][2]:
+                    continue
+                r = run_case(name, rows, csv_path, trace=not args.no_alloc)
+                results.append(r)
+                if "error" in r:
+                    print(f"{name:<22} {rows:>10} {r['error']}")
+                else:
+                    alloc = "-" if r["alloc_peak_mb"] is None else r["alloc_peak_mb"]
+                    print(f"{name:<22} {rows:>10} {r['wall_s']:>9} "
+                          f"{r['peak_rss_mb']:>9} {alloc:>9}")
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+    target = args.baseline if args.save_baseline else args.output
+    with open(target, "w") as fh:
+        json.dump(report, fh, indent=2)
+    print("Results written to", target)
+
+    if args.save_baseline or not os.path.exists(args.baseline):
+        return
+
+    with open(args.baseline) as fh:
+        regressions = compare(results, json.load(fh))
+    if regressions:
+        print(f"\nREGRESSIONS against {args.baseline}:")
+        for case, rows, key, old, new in regressions:
+            print(f"  {case} @ {rows} rows: {key} {old} -> {new}")
+        sys.exit(1)
+    print("No regressions against", args.baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,28 @@
-import pandas as pd
+"""Synthetic firm-year panel generator.
+
+Without --firms it writes the original named 39-firm universe. With
+--firms it builds a synthetic universe of that many firms, generated in
+firm chunks across worker processes with one seed per chunk, so the
+output does not depend on the worker count.
+
+Run from the repository root:
+
+    python -m scripts.generate_large_dataset
+    python -m scripts.generate_large_dataset --firms 1000000 \\
+        --output data/panel_1m.csv
+    python -m scripts.generate_large_dataset --firms 1000000 \\
+        --format parquet --output data/panel_1m
+"""
+import argparse
+import os
+
 import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
 
-np.random.seed(42)
+from engine.data_loader import PARTITIONING
+from engine.parallel import parallel_map
 
 industries = {
     "AI": ["NVIDIA", "Palantir", "AMD", "Snowflake", "C3AI"],
@@ -14,38 +35,163 @@ industries = {
     "Energy": ["Exxon", "Chevron", "BP", "Shell", "ONGC"]
 }
 
-years = range(2014, 2025)
-rows = []
-
-for industry, firms in industries.items():
-    for firm in firms:
-        base_em = np.random.uniform(0.8, 1.6)
-        base_peg = np.random.uniform(1.2, 2.8)
-        base_de = np.random.uniform(0.3, 2.0)
-
-        for year in years:
-            cycle = (year - 2014) / 10
-            em = base_em + np.random.normal(0, 0.25) + cycle
-            peg = base_peg + np.random.normal(0, 0.5) + cycle * 1.2
-            fscore = max(2, 9 - em - np.random.uniform(0, 2))
-            de = base_de + np.random.normal(0, 0.4) + cycle
-            cfo = np.random.normal(0.08 - cycle * 0.1, 0.08)
-
-            crash_prob = (0.3*em + 0.3*peg + 0.3*de - 0.3*cfo) / 6
-            crash = np.random.rand() < crash_prob
-
-            ret = np.random.uniform(-0.65, -0.25) if crash else np.random.uniform(-0.05, 0.35)
-
-            rows.append([
-                firm, industry, year,
-                round(em,2), round(peg,2), int(fscore),
-                round(de,2), round(cfo,2), round(ret,2)
-            ])
-
-df = pd.DataFrame(rows, columns=[
-    "Firm","Industry","Year","Hybrid_EM","PEG","F_Score",
-    "Debt_Equity","CFO_Growth","Return"
-])
-
-df.to_csv("data/large_panel_dataset.csv", index=False)
-print("Large dataset created:", len(df), "rows")
+COLUMNS = [
+    "Firm", "Industry", "Year", "Hybrid_EM", "PEG", "F_Score",
+    "Debt_Equity", "CFO_Growth", "Return"
+]
+
+START_YEAR = 2014
+END_YEAR = 2024
+
+# Firms per worker task; a chunk of 11 years is ~1.1M rows
+CHUNK_FIRMS = 100_000
+
+
+def industry_labels(n_industries):
+    labels = list(industries)
+    labels += [f"Sector{i:03d}" for i in range(len(labels), n_industries)]
+    return labels[:n_industries]
+
+
+def firm_names(start, stop, n_industries):
+    # Synthetic firms are dealt round-robin across industries
+    idx = np.arange(start, stop)
+    labels = industry_labels(n_industries)
+    industry = np.asarray(labels)[idx % n_industries]
+    names = np.char.add(
+        np.char.add(industry.astype(str), "_"),
+        np.char.zfill(idx.astype(str), 7),
+    )
+    return names, industry
+
+
+def generate_chunk(firms, firm_industry, years, seed):
+    """Panel rows for a block of firms over all years, firm-major order."""
+    rng = np.random.default_rng(seed)
+    n, n_years = len(firms), len(years)
+    shape = (n, n_years)
+
+    base_em = rng.uniform(0.8, 1.6, (n, 1))
+    base_peg = rng.uniform(1.2, 2.8, (n, 1))
+    base_de = rng.uniform(0.3, 2.0, (n, 1))
+
+    cycle = (np.asarray(years) - START_YEAR) / 10
+    em = base_em + rng.normal(0, 0.25, shape) + cycle
+    peg = base_peg + rng.normal(0, 0.5, shape) + cycle * 1.2
+    fscore = np.maximum(2, 9 - em - rng.uniform(0, 2, shape))
+    de = base_de + rng.normal(0, 0.4, shape) + cycle
+    cfo = rng.normal(0.08 - cycle * 0.1, 0.08, shape)
+
+    crash_prob = (0.3*em + 0.3*peg + 0.3*de - 0.3*cfo) / 6
+    crash = rng.random(shape) < crash_prob
+
+    ret = np.where(
+        crash,
+        rng.uniform(-0.65, -0.25, shape),
+        rng.uniform(-0.05, 0.35, shape),
+    )
+
+    return pd.DataFrame({
+        "Firm": np.repeat(firms, n_years),
+        "Industry": np.repeat(firm_industry, n_years),
+        "Year": np.tile(np.asarray(years, dtype=np.int16), n),
+        "Hybrid_EM": em.ravel().round(2),
+        "PEG": peg.ravel().round(2),
+        "F_Score": fscore.ravel().astype(np.int8),
+        "Debt_Equity": de.ravel().round(2),
+        "CFO_Growth": cfo.ravel().round(2),
+        "Return": ret.ravel().round(2),
+    }, columns=COLUMNS)
+
+
+def generate_panel(n_firms=None, n_industries=8, seed=42,
+                   start_year=START_YEAR, end_year=END_YEAR):
+    """Whole panel in memory, for benchmarks and small universes."""
+    years = np.arange(start_year, end_year + 1)
+    if n_firms is None:
+        firm_industry = np.array(
+            [ind for ind, names in industries.items() for _ in names]
+        )
+        firms = np.array([f for names in industries.values() for f in names])
+    else:
+        firms, firm_industry = firm_names(0, n_firms, n_industries)
+    return generate_chunk(firms, firm_industry, years, seed)
+
+
+def _generate_task(task):
+    index, start, stop, n_industries, years, seed, fmt, output = task
+    firms, firm_industry = firm_names(start, stop, n_industries)
+    df = generate_chunk(firms, firm_industry, years, seed)
+
+    if fmt == "csv":
+        return df
+
+    # Parquet chunks are written by the worker straight into the dataset
+    ds.write_dataset(
+        pa.Table.from_pandas(df, preserve_index=False),
+        output,
+        format="parquet",
+        partitioning=PARTITIONING,
+        basename_template=f"chunk-{index:05d}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        max_partitions=1_000_000,
+    )
+    return len(df)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--firms", type=int, default=None)
+    parser.add_argument("--industries", type=int, default=len(industries))
+    parser.add_argument("--start-year", type=int, default=START_YEAR)
+    parser.add_argument("--end-year", type=int, default=END_YEAR)
+    parser.add_argument("--chunk-firms", type=int, default=CHUNK_FIRMS)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--output", default="data/large_panel_dataset.csv")
+    args = parser.parse_args()
+
+    if args.firms is None:
+        df = generate_panel(
+            seed=args.seed,
+            start_year=args.start_year,
+            end_year=args.end_year,
+        )
+        df.to_csv(args.output, index=False)
+        print("Large dataset created:", len(df), "rows")
+        return
+
+    years = np.arange(args.start_year, args.end_year + 1)
+    bounds = range(0, args.firms, args.chunk_firms)
+    seeds = np.random.SeedSequence(args.seed).spawn(len(bounds))
+    tasks = [
+        (
+            i,
+            start,
+            min(start + args.chunk_firms, args.firms),
+            args.industries,
+            years,
+            seeds[i],
+            args.format,
+            args.output,
+        )
+        for i, start in enumerate(bounds)
+    ]
+
+    rows = 0
+    if args.format == "csv":
+        with open(args.output, "w", newline="") as fh:
+            chunks = parallel_map(_generate_task, tasks, args.workers)
+            for i, df in enumerate(chunks):
+                df.to_csv(fh, header=(i == 0), index=False)
+                rows += len(df)
+    else:
+        os.makedirs(args.output, exist_ok=True)
+        rows = sum(parallel_map(_generate_task, tasks, args.workers))
+
+    print("Large dataset created:", rows, "rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from engine import aggregates
+from engine.aggregates import METRICS, IndustryCube, clear_cubes, get_cube
+from engine.data_loader import clear_cache, load_data
+from scripts.generate_large_dataset import generate_panel
+
+
+@pytest.fixture(autouse=True)
+def empty_caches():
+    clear_cubes()
+    clear_cache()
+    yield
+    clear_cubes()
+    clear_cache()
+
+
+@pytest.fixture(scope="module")
+def panel():
+    # Written year by year, so dropping the last year is a byte prefix
+    return generate_panel(n_firms=60).sort_values("Year", kind="stable")
+
+
+def _assert_same_cube(a, b):
+    pd.testing.assert_frame_equal(
+        a.stats.sort_index(), b.stats.sort_index(), rtol=1e-6
+    )
+    for metric in METRICS:
+        pd.testing.assert_frame_equal(
+            a.sketches[metric].sort_index(), b.sketches[metric].sort_index()
+        )
+
+
+def test_means_match_groupby(panel):
+    cube = IndustryCube.from_panel(panel)
+    expected = panel.groupby(["Industry", "Year"])[METRICS].mean()
+    got = cube.industry_year().set_index(["Industry", "Year"])
+    np.testing.assert_allclose(
+        got.loc[expected.index, METRICS].to_numpy(),
+        expected.to_numpy(),
+        rtol=1e-9,
+    )
+
+    trend = cube.trend().set_index("Year")
+    np.testing.assert_allclose(
+        trend[METRICS].to_numpy(),
+        panel.groupby("Year")[METRICS].mean().to_numpy(),
+        rtol=1e-9,
+    )
+
+
+def test_update_matches_rebuild(panel):
+    last = panel["Year"].max()
+    old, new = panel[panel["Year"] < last], panel[panel["Year"] == last]
+    merged = IndustryCube.from_panel(old).update(new)
+    _assert_same_cube(merged, IndustryCube.from_panel(panel))
+    # Counts stay integers after the merge
+    for col in ["rows", "PEG_count", "distress"]:
+        assert merged.stats[col].dtype == np.int64
+
+
+def test_appended_file_updates_the_cube(panel, tmp_path, monkeypatch):
+    last = panel["Year"].max()
+    path = str(tmp_path / "panel.csv")
+    panel[panel["Year"] < last].to_csv(path, index=False)
+    get_cube(path)
+
+    with open(path, "a") as fh:
+        panel[panel["Year"] == last].to_csv(fh, index=False, header=False)
+
+    def no_full_read(*args, **kwargs):
+        raise AssertionError("the whole panel was reloaded")
+
+    monkeypatch.setattr(aggregates, "load_data", no_full_read)
+    appended = get_cube(path)
+    monkeypatch.undo()
+
+    assert last in appended.years
+    _assert_same_cube(appended, IndustryCube.from_panel(load_data(path)))
+
+
+def test_rewritten_file_is_rebuilt(panel, tmp_path):
+    path = str(tmp_path / "panel.csv")
+    panel.to_csv(path, index=False)
+    get_cube(path)
+    # Same rows with different values: not an append
+    panel.assign(PEG=panel["PEG"] * 2).to_csv(path, index=False)
+    _assert_same_cube(get_cube(path), IndustryCube.from_panel(load_data(path)))
+
+
+def test_cache_stays_within_budget(tmp_path, monkeypatch):
+    paths = []
+    for seed in range(3):
+        path = str(tmp_path / f"{seed}.csv")
+        generate_panel(n_firms=20, seed=seed).to_csv(path, index=False)
+        paths.append(path)
+
+    size = aggregates._cube_size(get_cube(paths[0]))
+    clear_cubes()
+    monkeypatch.setattr(aggregates, "CUBE_BUDGET_BYTES", int(size * 2.5))
+    cubes = [get_cube(path) for path in paths]
+
+    assert len(aggregates._cubes) == 2
+    assert aggregates._cube_bytes <= aggregates.CUBE_BUDGET_BYTES
+    # Evicted cubes take their append record with them
+    assert set(aggregates._sources) == set(paths[1:])
+    assert get_cube(paths[2]) is cubes[2]
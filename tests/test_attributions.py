@@ -0,0 +1,133 @@
+import itertools
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import (
+    GradientBoostingClassifier,
+    HistGradientBoostingClassifier,
+)
+
+from engine import crash_model
+from engine.crash_model import (
+    explain,
+    fallback_score,
+    iter_trees,
+    main_driver,
+)
+from engine.feature_engineering import MODEL_FEATURES
+
+
+def _panel(n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(
+        rng.normal(size=(n, len(MODEL_FEATURES))),
+        columns=MODEL_FEATURES,
+    ).astype(np.float32)
+    y = (X.iloc[:, 0] - X.iloc[:, 2] * X.iloc[:, 3] + rng.normal(size=n) > 0.5)
+    return X, y.astype(int)
+
+
+@pytest.fixture(scope="module", params=["gbm", "hist"])
+def fitted(request):
+    X, y = _panel()
+    if request.param == "gbm":
+        model = GradientBoostingClassifier(n_estimators=8, random_state=0)
+    else:
+        X.iloc[::7, 1] = np.nan
+        model = HistGradientBoostingClassifier(max_iter=8, random_state=0)
+    return model.fit(X, y), X.head(25)
+
+
+def _expected_value(tree, x, known, node=0):
+    # Conditional expectation with the unknown features following the
+    # training cover down both branches
+    if tree.leaf[node]:
+        return tree.value[node]
+    feature = tree.feature[node]
+    left, right = tree.left[node], tree.right[node]
+    if feature in known:
+        value = x[feature]
+        if np.isnan(value):
+            go_left = tree.missing_left[node]
+        else:
+            go_left = value <= tree.threshold[node]
+        return _expected_value(tree, x, known, left if go_left else right)
+    return (
+        tree.cover[left] * _expected_value(tree, x, known, left)
+        + tree.cover[right] * _expected_value(tree, x, known, right)
+    ) / tree.cover[node]
+
+
+def _brute_force_shapley(model, x):
+    # Shapley values over every subset of every feature, one row at a time
+    trees = list(iter_trees(model))
+    m = len(x)
+
+    def v(known):
+        return sum(_expected_value(tree, x, set(known)) for tree in trees)
+
+    phi = np.zeros(m)
+    for i in range(m):
+        others = [j for j in range(m) if j != i]
+        for size in range(m):
+            weight = math.factorial(size) * math.factorial(m - size - 1)
+            weight /= math.factorial(m)
+            for subset in itertools.combinations(others, size):
+                phi[i] += weight * (v(subset + (i,)) - v(subset))
+    return phi
+
+
+def _margin(model, X):
+    prob = model.predict_proba(X)[:, 1]
+    return np.log(prob / (1 - prob))
+
+
+def test_exact_matches_brute_force_shapley(fitted):
+    model, X = fitted
+    got = explain(model, X.head(5), method="exact")
+    x = np.asarray(X.head(5), dtype=np.float64)
+    for row in range(5):
+        np.testing.assert_allclose(
+            got[MODEL_FEATURES].iloc[row],
+            _brute_force_shapley(model, x[row]),
+            atol=1e-9,
+        )
+
+
+@pytest.mark.parametrize("method", ["exact", "approx"])
+def test_attributions_sum_to_margin(fitted, method):
+    model, X = fitted
+    got = explain(model, X, method=method)
+    np.testing.assert_allclose(got.sum(axis=1), _margin(model, X), atol=1e-9)
+
+
+def test_wide_trees_fall_back_to_approx(fitted, monkeypatch):
+    model, X = fitted
+    monkeypatch.setattr(crash_model, "EXACT_MAX_TREE_FEATURES", 0)
+    pd.testing.assert_frame_equal(
+        explain(model, X, method="exact"),
+        explain(model, X, method="approx"),
+    )
+
+
+def test_keyed_results_are_cached_per_firm_year(fitted):
+    model, X = fitted
+    keys = pd.DataFrame({
+        "Firm": [f"F{i}" for i in range(len(X))],
+        "Year": 2020,
+    })
+    first = explain(model, X, keys=keys, method="approx")
+    # A reordered subset is looked up, not recomputed, and keeps X's index
+    subset = X.iloc[[5, 1, 3]]
+    again = explain(model, subset, keys=keys.iloc[[5, 1, 3]], method="approx")
+    pd.testing.assert_frame_equal(again, first.loc[subset.index])
+
+
+def test_fallback_attributions_are_linear():
+    X, _ = _panel(n=50)
+    got = explain(None, X)
+    score = fallback_score(X) / fallback_score(X).max()
+    np.testing.assert_allclose(got.sum(axis=1), score, atol=1e-6)
+    assert set(main_driver(got)) <= set(MODEL_FEATURES)
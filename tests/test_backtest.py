@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.metrics import roc_auc_score
+
+from engine.backtest import (
+    _fold_auc,
+    _lead_times,
+    _precision_at_k,
+    walk_forward,
+)
+from scripts.generate_large_dataset import generate_panel
+
+
+def _folds(seed=0, n=3000, n_folds=5):
+    rng = np.random.default_rng(seed)
+    fold = np.sort(rng.integers(n_folds, size=n))
+    # Rounded, so there are many tied scores
+    prob = np.round(rng.random(n), 2)
+    label = (rng.random(n) < prob).astype(float)
+    return fold, prob, label, n_folds
+
+
+def test_auc_matches_sklearn_with_ties():
+    fold, prob, label, n_folds = _folds()
+    expected = [
+        roc_auc_score(label[fold == f], prob[fold == f]) for f in range(n_folds)
+    ]
+    np.testing.assert_allclose(_fold_auc(fold, prob, label, n_folds), expected)
+
+
+def test_auc_is_nan_for_single_class_folds():
+    fold = np.array([0, 0, 1, 1])
+    prob = np.array([0.1, 0.9, 0.2, 0.8])
+    label = np.array([0.0, 1.0, 1.0, 1.0])
+    auc = _fold_auc(fold, prob, label, 2)
+    assert auc[0] == 1.0
+    assert np.isnan(auc[1])
+
+
+def test_precision_at_k_matches_pandas():
+    fold, prob, label, n_folds = _folds(seed=1)
+    # Distinct scores, so the top k is unambiguous
+    prob = prob + np.random.default_rng(2).random(len(prob)) * 1e-6
+    frame = pd.DataFrame({"fold": fold, "prob": prob, "label": label})
+    expected = (
+        frame.sort_values("prob", ascending=False)
+        .groupby("fold")
+        .head(10)
+        .groupby("fold")["label"]
+        .mean()
+    )
+    np.testing.assert_allclose(
+        _precision_at_k(fold, prob, label, n_folds, 10), expected
+    )
+
+
+def test_lead_times():
+    firm = np.array(["A", "A", "A", "A", "B", "B", "B"])
+    year = np.array([2001, 2002, 2003, 2005, 2001, 2002, 2003])
+    flagged = np.array([True, True, True, True, False, True, False])
+    # A: flagged three years in a row, then again after a gap; B: one year
+    expected = [0, 1, 2, 0, np.nan, 0, np.nan]
+    # Row order must not matter
+    order = np.random.default_rng(0).permutation(len(firm))
+    np.testing.assert_array_equal(
+        _lead_times(firm[order], year[order], flagged[order]),
+        np.array(expected)[order],
+    )
+
+
+@pytest.fixture(scope="module")
+def panel():
+    return generate_panel(n_firms=120)
+
+
+def test_walk_forward_folds_agree_with_scores(panel):
+    folds, scores = walk_forward(panel, workers=1, use_store=False)
+
+    years = np.sort(panel["Year"].unique())
+    assert list(folds.index) == list(years[1:])
+    assert folds["Test_Rows"].sum() == len(scores)
+    assert (folds["Train_Rows"].diff().dropna() > 0).all()
+
+    by_year = scores.groupby("Year")
+    flagged = scores["Crash_Probability"] >= 0.5
+    caught = (flagged & scores["Crashed"]).groupby(scores["Year"]).sum()
+    np.testing.assert_array_equal(folds["Crashes"], by_year["Crashed"].sum())
+    np.testing.assert_array_equal(
+        folds["Flagged"], flagged.groupby(scores["Year"]).sum()
+    )
+    np.testing.assert_allclose(
+        folds["Hit_Rate"], caught / by_year["Crashed"].sum()
+    )
+
+
+def test_walk_forward_is_independent_of_workers(panel):
+    one = walk_forward(panel, workers=1, use_store=False)
+    many = walk_forward(panel, workers=3, use_store=False)
+    pd.testing.assert_frame_equal(one[0], many[0])
+    pd.testing.assert_frame_equal(one[1], many[1])
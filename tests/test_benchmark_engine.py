@@ -0,0 +1,45 @@
+from scripts.benchmark_engine import MIN_WALL_DELTA_S, TOLERANCE, compare
+
+
+def _result(case, wall, rss=100.0, rows=1000):
+    return {"case": case, "rows": rows, "wall_s": wall, "peak_rss_mb": rss}
+
+
+def _baseline(*results):
+    return {"meta": {}, "results": list(results)}
+
+
+def test_slowdowns_beyond_tolerance_and_noise_regress():
+    baseline = _baseline(_result("slow", 1.0), _result("noisy", 0.01))
+    results = [
+        _result("slow", 1.0 * (1 + TOLERANCE) + 0.1),
+        # Relatively much slower, but under the absolute noise floor
+        _result("noisy", 0.01 + MIN_WALL_DELTA_S / 2),
+    ]
+    assert compare(results, baseline) == [
+        ("slow", 1000, "wall_s", 1.0, results[0]["wall_s"])
+    ]
+
+
+def test_memory_growth_regresses():
+    baseline = _baseline(_result("case", 1.0, rss=100.0))
+    regressions = compare([_result("case", 1.0, rss=200.0)], baseline)
+    assert regressions == [("case", 1000, "peak_rss_mb", 100.0, 200.0)]
+
+
+def test_new_failures_regress():
+    baseline = _baseline(_result("case", 1.0))
+    failed = {"case": "case", "rows": 1000, "error": "exit code -9"}
+    assert compare([failed], baseline) == [
+        ("case", 1000, "error", "ok", "exit code -9")
+    ]
+
+
+def test_unknown_or_already_failing_cases_are_skipped():
+    baseline = _baseline({"case": "broken", "rows": 1000, "error": "x"})
+    results = [
+        _result("new", 5.0),
+        {"case": "broken", "rows": 1000, "error": "x"},
+        _result("broken", 9.0, rows=10),
+    ]
+    assert compare(results, baseline) == []
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.api.types import is_numeric_dtype
+
+from engine.data_loader import clear_cache, iter_chunks, load_data
+from scripts.generate_large_dataset import generate_panel
+
+
+@pytest.fixture
+def csv(tmp_path):
+    path = tmp_path / "panel.csv"
+    generate_panel(n_firms=50).to_csv(path, index=False)
+    clear_cache()
+    yield str(path)
+    clear_cache()
+
+
+def test_compact_load_matches_read_csv(csv):
+    raw = pd.read_csv(csv)
+    # Small chunks, so categories have to be merged across chunks
+    df = load_data(csv, chunksize=97)
+
+    assert list(df.columns) == list(raw.columns)
+    assert len(df) == len(raw)
+    assert df["Year"].dtype == np.int16
+    for col in raw.columns:
+        if not is_numeric_dtype(raw[col]):
+            assert isinstance(df[col].dtype, pd.CategoricalDtype)
+            assert list(df[col].astype(str)) == list(raw[col].astype(str))
+        elif col == "Return":
+            # The crash label threshold needs full precision
+            np.testing.assert_array_equal(df[col], raw[col])
+        else:
+            np.testing.assert_allclose(
+                df[col].to_numpy(dtype=float), raw[col], rtol=1e-6
+            )
+    report = df.attrs["memory_report"]
+    assert report["compact_bytes"] < report["raw_bytes"]
+
+
+def test_chunks_cover_the_panel_in_order(csv):
+    raw = pd.read_csv(csv)
+    chunks = list(iter_chunks(csv, chunksize=100))
+    assert [len(c) for c in chunks[:-1]] == [100] * (len(chunks) - 1)
+    firms = np.concatenate([c["Firm"].astype(str).to_numpy() for c in chunks])
+    np.testing.assert_array_equal(firms, raw["Firm"].astype(str))
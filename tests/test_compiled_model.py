@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import (
+    GradientBoostingClassifier,
+    HistGradientBoostingClassifier,
+)
+
+from engine.compiled_model import CompiledEnsemble
+from engine.crash_model import COMPILED_MAX_STEPS, compile_model, predict
+from engine.feature_engineering import MODEL_FEATURES
+
+
+def _panel(n=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    X = pd.DataFrame(
+        rng.normal(size=(n, len(MODEL_FEATURES))),
+        columns=MODEL_FEATURES,
+    ).astype(np.float32)
+    y = (X.iloc[:, 0] + X.iloc[:, 1] ** 2 + rng.normal(size=n) > 1).astype(int)
+    return X, y
+
+
+def _with_nans(X, seed=1):
+    # A NaN in every model feature, on different rows
+    X = X.copy()
+    rng = np.random.default_rng(seed)
+    for col in X.columns:
+        X.loc[rng.random(len(X)) < 0.1, col] = np.nan
+    return X
+
+
+@pytest.fixture(scope="module", params=["gbm", "hist"])
+def fitted(request):
+    X, y = _panel()
+    if request.param == "gbm":
+        model = GradientBoostingClassifier(random_state=0).fit(X, y)
+    else:
+        # Fitted with NaNs so every split learns a missing direction
+        X = _with_nans(X)
+        model = HistGradientBoostingClassifier(random_state=0).fit(X, y)
+    return model, X
+
+
+def test_matches_sklearn(fitted):
+    model, X = fitted
+    expected = model.predict_proba(X)[:, 1]
+    np.testing.assert_allclose(
+        compile_model(model).predict_proba(X)[:, 1], expected, atol=1e-12
+    )
+
+
+def test_matches_sklearn_with_nan_in_every_feature(fitted):
+    model, X = fitted
+    if isinstance(model, GradientBoostingClassifier):
+        pytest.skip("GradientBoostingClassifier rejects NaN")
+    X_nan = _with_nans(X, seed=2)
+    # NaN in every column of one row as well
+    X_nan.iloc[0] = np.nan
+    np.testing.assert_allclose(
+        compile_model(model).predict_proba(X_nan)[:, 1],
+        model.predict_proba(X_nan)[:, 1],
+        atol=1e-12,
+    )
+
+
+@pytest.mark.parametrize("rows", [1, 7, 3000])
+def test_predict_nan_same_on_both_paths(fitted, rows):
+    # Small batches take the compiled path inside predict(), the full
+    # panel goes to sklearn; a row with NaN must fare the same on both
+    model, X = fitted
+    X_nan = _with_nans(X, seed=3).head(rows)
+    X_nan.iloc[0] = np.nan
+    if isinstance(model, GradientBoostingClassifier):
+        with pytest.raises(ValueError, match="NaN"):
+            predict(model, X_nan)
+    else:
+        np.testing.assert_allclose(
+            predict(model, X_nan), model.predict_proba(X_nan)[:, 1], atol=1e-12
+        )
+
+
+def test_both_paths_are_taken(fitted):
+    model, X = fitted
+    steps = compile_model(model).steps_per_row
+    assert steps <= COMPILED_MAX_STEPS
+    assert len(X) * steps > COMPILED_MAX_STEPS
+
+
+def test_save_load_roundtrip(fitted, tmp_path):
+    model, X = fitted
+    path = tmp_path / "model.npz"
+    compile_model(model).save(path)
+    loaded = CompiledEnsemble.load(path)
+    if isinstance(model, HistGradientBoostingClassifier):
+        X = _with_nans(X, seed=4)
+    else:
+        with pytest.raises(ValueError, match="NaN"):
+            loaded.predict_proba(_with_nans(X, seed=4))
+    np.testing.assert_allclose(
+        loaded.predict_proba(X[X.columns[::-1]])[:, 1],
+        model.predict_proba(X)[:, 1],
+        atol=1e-12,
+    )
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from engine.confidence_scoring import (
+    CONFIDENCE_TIERS,
+    RAW_INPUTS,
+    bootstrap_intervals,
+    firm_coverage,
+)
+from engine.feature_engineering import build_features
+from scripts.generate_large_dataset import generate_panel
+
+
+@pytest.fixture(scope="module")
+def panel():
+    df = generate_panel(n_firms=80)
+    rng = np.random.default_rng(0)
+    # Uneven histories and missing inputs
+    df = df[rng.random(len(df)) > 0.3].copy()
+    for col in RAW_INPUTS:
+        df.loc[rng.random(len(df)) < 0.05, col] = np.nan
+    return df.sample(frac=1, random_state=0).reset_index(drop=True)
+
+
+def _label(years):
+    for threshold, label in CONFIDENCE_TIERS:
+        if threshold is None or years >= threshold:
+            return label
+
+
+def test_coverage_matches_groupby(panel):
+    got = firm_coverage(panel)
+    g = panel.groupby("Firm")
+    missing = panel[RAW_INPUTS].isna().groupby(panel["Firm"]).sum().sum(axis=1)
+    expected = pd.DataFrame({
+        "Years": g["Year"].nunique(),
+        "First_Year": g["Year"].min(),
+        "Last_Year": g["Year"].max(),
+        "Missing_Share": missing / (g.size() * len(RAW_INPUTS)),
+    })
+
+    got = got.loc[expected.index]
+    np.testing.assert_array_equal(got["Years"], expected["Years"])
+    np.testing.assert_array_equal(got["First_Year"], expected["First_Year"])
+    np.testing.assert_array_equal(got["Last_Year"], expected["Last_Year"])
+    np.testing.assert_allclose(got["Missing_Share"], expected["Missing_Share"])
+    np.testing.assert_allclose(
+        got["Coverage"], expected["Years"] / panel["Year"].nunique()
+    )
+    assert list(got["Confidence"]) == [_label(y) for y in expected["Years"]]
+
+
+def test_intervals_bracket_the_mean(panel):
+    X = build_features(panel)
+    latest = (panel["Year"] == panel["Year"].max()).to_numpy()
+    intervals = bootstrap_intervals(
+        panel, X, X_score=X[latest], n_models=6, workers=1
+    )
+
+    assert intervals.index.equals(X[latest].index)
+    assert intervals.attrs["n_models"] == 6
+    assert (intervals["Lower"] <= intervals["Mean"] + 1e-6).all()
+    assert (intervals["Mean"] <= intervals["Upper"] + 1e-6).all()
+    assert intervals[["Lower", "Upper"]].stack().between(0, 1).all()
+
+    again = bootstrap_intervals(
+        panel, X, X_score=X[latest], n_models=6, workers=2
+    )
+    pd.testing.assert_frame_equal(intervals, again)
+
+
+def test_intervals_need_both_classes(panel):
+    calm = panel.assign(Return=0.05)
+    with pytest.raises(ValueError, match="both crash classes"):
+        bootstrap_intervals(calm, build_features(calm), n_models=2, workers=1)
@@ -0,0 +1,82 @@
+import pandas as pd
+import pytest
+
+from engine import data_loader
+from engine.data_loader import cache_info, clear_cache, load_data
+from scripts.generate_large_dataset import generate_panel
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    clear_cache()
+    yield
+    clear_cache()
+
+
+def _csv(tmp_path, name, n_firms, seed=0):
+    path = tmp_path / name
+    generate_panel(n_firms=n_firms, seed=seed).to_csv(path, index=False)
+    return str(path)
+
+
+def test_same_content_is_parsed_once(tmp_path):
+    a = _csv(tmp_path, "a.csv", 20)
+    b = tmp_path / "copy.csv"
+    b.write_bytes(open(a, "rb").read())
+
+    first = load_data(a)
+    assert cache_info()["entries"] == 1
+    # A copy under another name has the same content key
+    pd.testing.assert_frame_equal(load_data(str(b)), first)
+    assert cache_info()["entries"] == 1
+
+
+def test_edits_never_reach_the_cached_frame(tmp_path):
+    path = _csv(tmp_path, "a.csv", 20)
+    original = load_data(path)
+    expected = original.copy(deep=True)
+
+    # The page-level edits every page makes to its frame
+    df = load_data(path)
+    df["Year"] = df["Year"].astype(int) + 1
+    df.loc[df.index[0], "PEG"] = -999.0
+    df["Extra"] = 1
+
+    pd.testing.assert_frame_equal(load_data(path), expected)
+
+
+def test_changed_file_is_reparsed(tmp_path):
+    path = _csv(tmp_path, "a.csv", 20)
+    before = load_data(path)
+    generate_panel(n_firms=30).to_csv(path, index=False)
+    assert len(load_data(path)) > len(before)
+
+
+def test_least_recently_used_is_evicted(tmp_path, monkeypatch):
+    paths = [_csv(tmp_path, f"{n}.csv", 20, seed=n) for n in range(3)]
+    sizes = []
+    for path in paths:
+        load_data(path)
+        sizes.append(cache_info()["bytes"] - sum(sizes))
+    clear_cache()
+
+    # Room for two of the three panels
+    monkeypatch.setattr(data_loader, "CACHE_BUDGET_BYTES", sum(sizes) - 1)
+    load_data(paths[0])
+    load_data(paths[1])
+    load_data(paths[0])  # now the most recently used
+    load_data(paths[2])
+
+    info = cache_info()
+    assert info["entries"] == 2
+    assert info["bytes"] <= info["budget_bytes"]
+    cached = {key[0] for key in data_loader._cache}
+    digests = [data_loader.dataset_digest(p) for p in paths]
+    assert cached == {digests[0], digests[2]}
+
+
+def test_frames_over_budget_are_not_cached(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_loader, "CACHE_BUDGET_BYTES", 1)
+    df = load_data(_csv(tmp_path, "a.csv", 20))
+    assert len(df) > 0
+    assert cache_info()["entries"] == 0
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from engine.feature_engineering import (
+    TEMPORAL_INPUTS,
+    WINDOW,
+    build_features,
+    firm_layout,
+)
+
+
+@pytest.fixture(scope="module")
+def panel():
+    rng = np.random.default_rng(0)
+    rows = []
+    for firm in range(60):
+        # Gaps in the years and missing values in the inputs
+        n_years = rng.integers(1, 12)
+        years = np.sort(
+            rng.choice(np.arange(2000, 2015), n_years, replace=False)
+        )
+        for year in years:
+            rows.append({"Firm": f"F{firm}", "Year": int(year), **{
+                col: np.nan if rng.random() < 0.1 else rng.normal()
+                for col in TEMPORAL_INPUTS
+            }})
+    # Shuffled, so nothing relies on the file being sorted
+    shuffled = pd.DataFrame(rows).sample(frac=1, random_state=1)
+    return shuffled.reset_index(drop=True)
+
+
+def _reference(df, col):
+    # Same definitions, one firm at a time with pandas
+    ordered = df.sort_values(["Firm", "Year"])
+    g = ordered.groupby("Firm")
+    consecutive = g["Year"].diff() == 1
+    lag = g[col].shift(1).where(consecutive)
+    out = pd.DataFrame({
+        f"{col}_Lag1": lag,
+        f"{col}_YoY": ordered[col] - lag,
+        f"{col}_Mean{WINDOW}": g[col].transform(
+            lambda s: s.rolling(WINDOW, min_periods=1).mean()
+        ),
+        f"{col}_Vol{WINDOW}": g[col].transform(
+            lambda s: s.rolling(WINDOW, min_periods=2).std()
+        ),
+    })
+    return out.loc[df.index]
+
+
+@pytest.mark.parametrize("col", TEMPORAL_INPUTS)
+def test_temporal_features_match_groupby(panel, col):
+    expected = _reference(panel, col)
+    got = build_features(panel, list(expected.columns))
+    np.testing.assert_allclose(
+        got.to_numpy(dtype=float),
+        expected.to_numpy(dtype=float),
+        rtol=1e-5,
+        atol=1e-6,
+    )
+
+
+def test_layout_groups_firms_by_year(panel):
+    order, start, prev_ok = firm_layout(panel)
+    firm = panel["Firm"].to_numpy()[order]
+    year = panel["Year"].to_numpy()[order]
+
+    np.testing.assert_array_equal(np.sort(order), np.arange(len(panel)))
+    # Each firm is one contiguous run starting at start[j], years ascending
+    assert (firm == firm[start]).all()
+    assert len(np.unique(start)) == panel["Firm"].nunique()
+    same = firm[1:] == firm[:-1]
+    assert (year[1:][same] > year[:-1][same]).all()
+    np.testing.assert_array_equal(
+        prev_ok[1:], same & (year[1:] == year[:-1] + 1)
+    )
+    assert not prev_ok[0]
+
+
+def test_layout_follows_the_frame(panel):
+    order = firm_layout(panel)[0]
+    other = panel.iloc[::-1].reset_index(drop=True)
+    assert not np.array_equal(firm_layout(other)[0], order)
+    # The original frame gets its own layout back, not the last one seen
+    np.testing.assert_array_equal(firm_layout(panel)[0], order)
@@ -0,0 +1,79 @@
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import HistGradientBoostingClassifier
+
+from engine import model_store
+from engine.model_store import fingerprint, load_model, model_digest, save_model
+
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_store, "STORE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def _files(store):
+    return sorted(name for name in os.listdir(store) if name.endswith(".pkl"))
+
+
+def test_roundtrip_and_miss():
+    assert load_model("missing") is None
+    save_model("key", {"coef": [1, 2, 3]})
+    assert load_model("key") == {"coef": [1, 2, 3]}
+
+
+def test_fingerprint_follows_data_and_params():
+    X = pd.DataFrame({"a": [0.0, 1.0, 2.0], "b": [1.0, 0.0, 1.0]})
+    y = np.array([0, 1, 0])
+    base = fingerprint(X, y, HistGradientBoostingClassifier())
+    assert fingerprint(X.copy(), y.copy(), HistGradientBoostingClassifier()) == base
+    assert fingerprint(X, 1 - y, HistGradientBoostingClassifier()) != base
+    assert fingerprint(X * 2, y, HistGradientBoostingClassifier()) != base
+    tuned = HistGradientBoostingClassifier(max_iter=50)
+    assert fingerprint(X, y, tuned) != base
+
+
+def test_model_digest_is_content_based():
+    a = HistGradientBoostingClassifier(max_iter=5)
+    b = HistGradientBoostingClassifier(max_iter=5)
+    assert model_digest(a) == model_digest(b)
+    assert model_digest(a) != model_digest(HistGradientBoostingClassifier())
+
+
+def test_least_recently_used_is_evicted(store, monkeypatch):
+    payload = b"x" * 10_000
+    for n, key in enumerate(["a", "b", "c"]):
+        save_model(key, payload)
+        os.utime(store / f"{key}.pkl", (n, n))
+    size = os.path.getsize(store / "a.pkl")
+
+    # Reading "a" makes it the most recently used entry
+    assert load_model("a") == payload
+    monkeypatch.setattr(model_store, "STORE_BUDGET_BYTES", 3 * size)
+    save_model("d", payload)
+
+    assert _files(store) == ["a.pkl", "c.pkl", "d.pkl"]
+
+
+def test_corrupt_entries_are_dropped(store):
+    save_model("key", [1, 2, 3])
+    (store / "key.pkl").write_bytes(b"not a pickle")
+    assert load_model("key") is None
+    assert _files(store) == []
+
+    save_model("key", [1, 2, 3])
+    blob = pickle.dumps([1, 2, 3])
+    (store / "key.pkl").write_bytes(blob[: len(blob) // 2])
+    assert load_model("key") is None
+    assert _files(store) == []
+
+
+def test_no_temp_files_left_behind(store):
+    save_model("key", list(range(100)))
+    with pytest.raises((pickle.PicklingError, AttributeError)):
+        save_model("bad", lambda: None)
+    assert sorted(os.listdir(store)) == ["key.pkl"]
@@ -0,0 +1,81 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from engine import monte_carlo
+from engine.monte_carlo import LGC_ALPHA, LGC_BETA, simulate_losses
+
+
+def _book(n_firms, seed=0):
+    rng = np.random.default_rng(seed)
+    probs = rng.uniform(0.02, 0.4, n_firms)
+    weights = np.vstack([
+        np.full(n_firms, 1 / n_firms),
+        rng.dirichlet(np.ones(n_firms)),
+    ])
+    industries = np.array(["Banks", "Tech", "Energy"])[np.arange(n_firms) % 3]
+    return probs, weights, industries
+
+
+def test_results_do_not_depend_on_workers(monkeypatch):
+    # Small blocks, so the paths are split across several pool tasks
+    monkeypatch.setattr(monte_carlo, "BLOCK_ELEMENTS", 20_000)
+    probs, weights, industries = _book(40)
+    runs = [
+        simulate_losses(probs, weights, industries, n_paths=5_000, workers=w)
+        for w in (1, 3)
+    ]
+    pd.testing.assert_frame_equal(runs[0][0], runs[1][0])
+    pd.testing.assert_frame_equal(runs[0][1], runs[1][1])
+
+
+def test_expected_loss_matches_probability_times_lgc():
+    probs, weights, industries = _book(30)
+    summary, distribution = simulate_losses(
+        probs, weights, industries, n_paths=200_000
+    )
+    mean_lgc = LGC_ALPHA / (LGC_ALPHA + LGC_BETA)
+    expected = weights @ probs * mean_lgc
+    np.testing.assert_allclose(
+        summary["Expected_Loss"].iloc[:2], expected, rtol=0.02
+    )
+
+    books = summary.index
+    assert (summary["VaR"] >= summary["Expected_Loss"]).all()
+    assert (summary["Expected_Shortfall"] >= summary["VaR"]).all()
+    np.testing.assert_allclose(distribution[books].sum(), 1.0)
+
+
+def test_interleaved_in_process_runs_stay_separate(monkeypatch):
+    # Sessions are threads, and single-block runs stay in the calling
+    # process: another session's run starting between setup and the block
+    # must not change this one's result
+    book, other = _book(3), _book(7, seed=1)
+    expected = simulate_losses(*book, n_paths=5_000, workers=1)[0]
+    block = monte_carlo._simulate_block
+    started = []
+
+    def interleaved(*args):
+        if not started:
+            started.append(True)
+            thread = threading.Thread(
+                target=simulate_losses,
+                args=other,
+                kwargs={"n_paths": 5_000, "workers": 1},
+            )
+            thread.start()
+            thread.join()
+        return block(*args)
+
+    monkeypatch.setattr(monte_carlo, "_simulate_block", interleaved)
+    got = simulate_losses(*book, n_paths=5_000, workers=1)[0]
+    pd.testing.assert_frame_equal(got, expected)
+
+
+def test_rejects_invalid_inputs():
+    with pytest.raises(ValueError):
+        simulate_losses([], [], [])
+    with pytest.raises(ValueError):
+        simulate_losses([0.1], [1.0], ["A"], market_corr=0.6, industry_corr=0.4)
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+
+from engine.portfolio import (
+    HIGH_RISK_THRESHOLD,
+    LOSS_GIVEN_CRASH,
+    score_portfolios,
+    weight_matrix,
+)
+
+
+def _book(seed=0, n_firms=200, n_portfolios=30):
+    rng = np.random.default_rng(seed)
+    firms = pd.Index([f"F{i:03d}" for i in range(n_firms)])
+    probs = rng.random(n_firms)
+    holdings = pd.DataFrame({
+        "Portfolio": rng.choice([f"P{i}" for i in range(n_portfolios)], 600),
+        "Firm": rng.choice(list(firms) + ["Unknown"], 600),
+        "Weight": rng.random(600),
+    })
+    return firms, probs, holdings
+
+
+def _pandas_scores(holdings, firms, probs, top_n):
+    # Row-by-row reference: merge, then group per portfolio
+    universe = pd.DataFrame({"Firm": firms, "Crash_Probability": probs})
+    positions = (
+        holdings.groupby(["Portfolio", "Firm"], as_index=False)["Weight"].sum()
+        .merge(universe, on="Firm", how="inner")
+    )
+    positions["Weighted_Risk"] = (
+        positions["Weight"] * positions["Crash_Probability"]
+    )
+    grouped = positions.groupby("Portfolio")
+    summary = pd.DataFrame({
+        "Holdings": grouped.size(),
+        "Crash_Risk": grouped["Weighted_Risk"].sum(),
+        "High_Risk_Exposure": grouped["Crash_Probability"].apply(
+            lambda p: (p > HIGH_RISK_THRESHOLD).mean()
+        ),
+    })
+    top = (
+        positions.sort_values(
+            ["Portfolio", "Weighted_Risk"], ascending=[True, False]
+        )
+        .groupby("Portfolio")
+        .head(top_n)
+    )
+    return summary, top
+
+
+def test_matches_pandas():
+    firms, probs, holdings = _book()
+    weights, portfolios = weight_matrix(holdings, firms)
+    summary, top = score_portfolios(weights, probs, portfolios, firms, top_n=3)
+    expected, expected_top = _pandas_scores(holdings, firms, probs, top_n=3)
+
+    got = summary.loc[expected.index]
+    np.testing.assert_array_equal(got["Holdings"], expected["Holdings"])
+    np.testing.assert_allclose(got["Crash_Risk"], expected["Crash_Risk"])
+    np.testing.assert_allclose(
+        got["Expected_Drawdown"], expected["Crash_Risk"] * LOSS_GIVEN_CRASH
+    )
+    np.testing.assert_allclose(
+        got["High_Risk_Exposure"], expected["High_Risk_Exposure"]
+    )
+
+    got_top = top.sort_values(["Portfolio", "Rank"])
+    assert list(got_top["Firm"]) == list(expected_top["Firm"])
+    np.testing.assert_allclose(
+        got_top["Weighted_Risk"], expected_top["Weighted_Risk"]
+    )
+    assert got_top.groupby("Portfolio")["Rank"].max().le(3).all()
+
+
+def test_unknown_only_portfolio_is_empty():
+    firms = pd.Index(["A", "B"])
+    holdings = pd.DataFrame({
+        "Portfolio": ["P1", "P1", "P2"],
+        "Firm": ["A", "A", "Nobody"],
+        "Weight": [0.25, 0.25, 1.0],
+    })
+    weights, portfolios = weight_matrix(holdings, firms)
+    summary, top = score_portfolios(weights, [0.8, 0.1], portfolios, firms)
+
+    # Repeated lines add up to one position
+    assert summary.loc["P1", "Holdings"] == 1
+    assert summary.loc["P1", "Crash_Risk"] == 0.5 * 0.8
+    assert summary.loc["P2", "Holdings"] == 0
+    assert summary.loc["P2", "High_Risk_Exposure"] == 0.0
+    assert list(top["Portfolio"]) == ["P1"]
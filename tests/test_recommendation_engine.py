@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from engine.recommendation_engine import (
+    ACTION_TIERS,
+    FIRM_TIERS,
+    INDUSTRY_TIERS,
+    assign_tiers,
+    industry_action,
+    recommend,
+    recommend_batch,
+)
+
+
+def _scalar(p, table):
+    # The if/elif chain the tier tables replace
+    for threshold, label in table[:-1]:
+        if p > threshold:
+            return label
+    return table[-1][1]
+
+
+def _probabilities():
+    rng = np.random.default_rng(0)
+    thresholds = [
+        t
+        for table in (FIRM_TIERS, INDUSTRY_TIERS, ACTION_TIERS)
+        for t, _ in table[:-1]
+    ]
+    # Every threshold exactly, just either side of it, and the extremes
+    edges = [t + d for t in thresholds for d in (-1e-12, 0.0, 1e-12)]
+    return np.concatenate([rng.random(1000), edges, [0.0, 1.0]])
+
+
+def test_batch_matches_scalar_recommend():
+    p = _probabilities()
+    assert list(recommend_batch(p)) == [recommend(x) for x in p]
+
+
+@pytest.mark.parametrize("table", [FIRM_TIERS, INDUSTRY_TIERS, ACTION_TIERS])
+def test_tables_match_if_chain(table):
+    p = _probabilities()
+    assert list(assign_tiers(p, table)) == [_scalar(x, table) for x in p]
+
+
+def test_thresholds_are_strict():
+    assert recommend(0.70) == "🟠 Reduce / Hedge"
+    assert recommend(0.40) == "🟢 Monitor"
+    assert list(industry_action([0.60, 0.61])) == [
+        "Hedge Selectively",
+        "Reduce Exposure",
+    ]
+
+
+def test_categories_keep_table_order():
+    tiers = recommend_batch([0.1])
+    assert list(tiers.categories) == [label for _, label in FIRM_TIERS]
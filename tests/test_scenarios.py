@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from engine import scenarios
+from engine.crash_model import fallback_score, predict, train_model
+from engine.feature_engineering import build_features
+from engine.scenarios import (
+    SHOCK_FEATURES,
+    evaluate_scenarios,
+    scenario_matrix,
+    shock_grid,
+    sweep_grid,
+)
+from scripts.generate_large_dataset import generate_panel
+
+
+@pytest.fixture(scope="module")
+def fitted():
+    df = generate_panel(n_firms=150)
+    X = build_features(df)
+    model = train_model(df, X, backend="hist", use_store=False)
+    latest = (df["Year"] == df["Year"].max()).to_numpy()
+    return model, X[latest].reset_index(drop=True)
+
+
+def _one_at_a_time(model, X, shock):
+    # The per-scenario loop the stacked evaluation replaces
+    shocked = X.astype(np.float64)
+    for feature, size in zip(SHOCK_FEATURES, shock):
+        shocked[feature] += shocked[feature] * size
+    stress = sum(
+        X[f].astype(np.float64) * s for f, s in zip(SHOCK_FEATURES, shock)
+    )
+    if model is None:
+        return stress, fallback_score(shocked)
+    return stress, predict(model, shocked)
+
+
+@pytest.mark.parametrize("with_model", [True, False])
+def test_stacked_matches_per_scenario(fitted, with_model, monkeypatch):
+    model, X = fitted
+    model = model if with_model else None
+    shocks = np.vstack([scenario_matrix(), shock_grid([0.0, 0.4], [0.1])])
+    # Several predict calls, so blocks are stitched back together
+    monkeypatch.setattr(scenarios, "MAX_PREDICT_ROWS", 3 * len(X))
+    stress, probs = evaluate_scenarios(model, X, shocks)
+
+    expected = [_one_at_a_time(model, X, s) for s in shocks]
+    np.testing.assert_allclose(stress, [s for s, _ in expected], rtol=1e-6)
+    ref = np.vstack([p for _, p in expected])
+    if model is None:
+        # The heuristic is normalised once over every scenario and firm
+        ref = ref / ref.max()
+    np.testing.assert_allclose(probs, ref, rtol=1e-5, atol=1e-7)
+
+
+def test_shock_grid_layout():
+    grid = shock_grid([0.1, 0.2, 0.3], [0.0, 0.5], liquidity=0.25)
+    assert grid.shape == (6, 3)
+    np.testing.assert_array_equal(grid[:, 2], 0.25)
+    np.testing.assert_array_equal(grid[1], [0.1, 0.5, 0.25])
+
+
+def test_sweep_averages_a_fixed_sample(fitted):
+    model, X = fitted
+    val, lev = np.linspace(0, 0.5, 4), np.linspace(0, 0.5, 3)
+
+    full = sweep_grid(model, X, val, lev, 0.1, max_firms=len(X))
+    _, probs = evaluate_scenarios(model, X, shock_grid(val, lev, 0.1))
+    np.testing.assert_allclose(full, probs.mean(axis=1).reshape(4, 3))
+
+    sampled = sweep_grid(model, X, val, lev, 0.1, max_firms=50)
+    assert sampled.shape == (4, 3)
+    np.testing.assert_array_equal(
+        sampled, sweep_grid(model, X, val, lev, 0.1, max_firms=50)
+    )
@@ -0,0 +1,93 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from engine.crash_model import train_model
+from engine.data_loader import load_data
+from engine.feature_engineering import build_features
+from engine.scoring_service import create_server
+from scripts.generate_large_dataset import generate_panel
+
+
+@pytest.fixture(scope="module")
+def service(tmp_path_factory):
+    path = tmp_path_factory.mktemp("panel") / "panel.csv"
+    generate_panel(n_firms=40).to_csv(path, index=False)
+    df = load_data(str(path))
+    model = train_model(df, build_features(df), backend="hist", use_store=False)
+
+    server, batcher = create_server(str(path), model, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    latest = df[df["Year"] == df["Year"].max()]
+    yield f"http://127.0.0.1:{server.server_port}", str(latest["Firm"].iloc[0])
+    server.shutdown()
+    server.server_close()
+    batcher.close()
+
+
+def _request(url, body=None):
+    data = None if body is None else json.dumps(body).encode()
+    try:
+        with urllib.request.urlopen(url, data=data, timeout=30) as resp:
+            return resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as exc:
+        return exc.code, json.loads(exc.read())
+
+
+def test_score_known_firm_and_raw_inputs(service):
+    url, firm = service
+    status, body = _request(url + "/score", {"firms": [
+        {"Firm": firm},
+        {
+            "Firm": "New",
+            "Hybrid_EM": 2.5,
+            "PEG": 3.0,
+            "F_Score": 2,
+            "Debt_Equity": 4.0,
+            "CFO_Growth": -0.3,
+        },
+    ]})
+    assert status == 200
+    scores = body["scores"]
+    assert [s["Firm"] for s in scores] == [firm, "New"]
+    for s in scores:
+        assert 0.0 <= s["Crash_Probability"] <= 1.0
+        assert isinstance(s["Recommendation"], str)
+
+
+@pytest.mark.parametrize("body", [
+    {"firms": ["AI_0000000"]},
+    {"firms": [1]},
+    {"firms": "AI_0000000"},
+    {"firms": {"Firm": "AI_0000000"}},
+    {"firms": [{"Firm": "not a firm in the panel"}]},
+    {"firms": [{"Firm": "x", "Hybrid_EM": "high", "PEG": 1, "F_Score": 1,
+                "Debt_Equity": 1, "CFO_Growth": 1}]},
+    {"companies": []},
+    [1, 2],
+])
+def test_malformed_requests_get_400(service, body):
+    url, _ = service
+    status, reply = _request(url + "/score", body)
+    assert status == 400
+    assert "error" in reply
+
+
+def test_unknown_path_is_404(service):
+    url, _ = service
+    assert _request(url + "/nothing")[0] == 404
+
+
+def test_metrics_count_requests(service):
+    url, firm = service
+    before = _request(url + "/metrics")[1]["requests"]
+    for _ in range(3):
+        assert _request(url + "/score", {"firms": [{"Firm": firm}]})[0] == 200
+    status, metrics = _request(url + "/metrics")
+    assert status == 200
+    assert metrics["requests"] == before + 3
+    assert metrics["latency_p99_ms"] >= metrics["latency_p50_ms"] >= 0